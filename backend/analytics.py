@@ -0,0 +1,149 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Scorecard, ScorecardHole
+
+# Score relative to par, clipped into these buckets; index = clip(diff, -2, 3) + 2
+DISTRIBUTION_BUCKETS = ("eagle_or_better", "birdie", "par", "bogey", "double_bogey", "triple_or_worse")
+
+# Columns of the flat hole array built by load_hole_data; ROUND indexes into rounds
+ROUND, HOLE_NUMBER, PAR, SCORE = range(4)
+
+def _int_column(joined: Optional[str]) -> np.ndarray:
+    # One group_concat column ("4,5,3,...") parsed in C
+    if not joined:
+        return np.empty(0, dtype=np.int64)
+    return np.fromstring(joined, dtype=np.int64, sep=",")
+
+async def load_hole_data(db: AsyncSession, user_id: int) -> Tuple[list, np.ndarray]:
+    # Rounds in date order, plus every hole as one int row of a flat array.
+    # The holes come from hole_scores as one row of comma-joined columns, so
+    # nothing in Python touches a hole; aggregates in a single query step
+    # through rows in the same order, which keeps the columns aligned.
+    result = await db.execute(
+        select(
+            Scorecard.id,
+            Scorecard.course_id,
+            Scorecard.course_name,
+            Scorecard.date_played,
+            Scorecard.relative_to_par,
+        )
+        .where(Scorecard.user_id == user_id)
+        .order_by(Scorecard.date_played, Scorecard.id)
+    )
+    rounds = result.all()
+    result = await db.execute(
+        select(
+            func.group_concat(ScorecardHole.scorecard_id),
+            func.group_concat(ScorecardHole.hole_number),
+            func.group_concat(ScorecardHole.par),
+            func.group_concat(ScorecardHole.score),
+        )
+        .select_from(Scorecard)
+        .join(ScorecardHole, ScorecardHole.scorecard_id == Scorecard.id)
+        .where(Scorecard.user_id == user_id)
+    )
+    scorecard_ids, hole_numbers, pars, scores = (_int_column(column) for column in result.one())
+
+    # Position of each hole's round in the date-ordered list
+    round_ids = np.fromiter((r.id for r in rounds), dtype=np.int64, count=len(rounds))
+    by_id = np.argsort(round_ids)
+    round_index = by_id[np.searchsorted(round_ids, scorecard_ids, sorter=by_id)]
+    return rounds, np.column_stack((round_index, hole_numbers, pars, scores))
+
+def _averages(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.round(np.divide(sums, counts, out=np.zeros(len(sums)), where=counts > 0), 2)
+
+def scoring_by_par(holes: np.ndarray) -> List[dict]:
+    pars, par_codes = np.unique(holes[:, PAR], return_inverse=True)
+    counts = np.bincount(par_codes, minlength=len(pars))
+    score_sums = np.bincount(par_codes, weights=holes[:, SCORE], minlength=len(pars))
+    avg_scores = _averages(score_sums, counts)
+    return [
+        {
+            "par": int(par),
+            "holes_played": int(count),
+            "avg_score": float(avg_score),
+            "avg_to_par": round(float(avg_score) - int(par), 2),
+        }
+        for par, count, avg_score in zip(pars, counts, avg_scores)
+    ]
+
+def score_distribution(holes: np.ndarray) -> dict:
+    buckets = np.clip(holes[:, SCORE] - holes[:, PAR], -2, 3) + 2
+    counts = np.bincount(buckets, minlength=len(DISTRIBUTION_BUCKETS))
+    return {name: int(count) for name, count in zip(DISTRIBUTION_BUCKETS, counts)}
+
+def course_hole_averages(rounds: list, holes: np.ndarray) -> List[dict]:
+    # Map every hole to a dense course code and reduce over a
+    # (course, hole_number) grid with a single bincount per measure
+    course_ids, first_rounds, course_codes = np.unique(
+        np.fromiter((r.course_id for r in rounds), dtype=np.int64, count=len(rounds)),
+        return_index=True, return_inverse=True,
+    )
+    hole_numbers, hole_codes = np.unique(holes[:, HOLE_NUMBER], return_inverse=True)
+    grid = (len(course_ids), len(hole_numbers))
+    cells = course_codes[holes[:, ROUND]] * grid[1] + hole_codes
+
+    size = grid[0] * grid[1]
+    counts = np.bincount(cells, minlength=size)
+    avg_scores = _averages(np.bincount(cells, weights=holes[:, SCORE], minlength=size), counts).reshape(grid)
+    avg_to_par = _averages(
+        np.bincount(cells, weights=holes[:, SCORE] - holes[:, PAR], minlength=size), counts
+    ).reshape(grid)
+    counts = counts.reshape(grid)
+    rounds_per_course = np.bincount(course_codes, minlength=grid[0])
+
+    return [
+        {
+            "course_id": int(course_ids[c]),
+            "course_name": rounds[first_rounds[c]].course_name,
+            "rounds": int(rounds_per_course[c]),
+            "holes": [
+                {
+                    "hole_number": int(hole_numbers[h]),
+                    "times_played": int(counts[c, h]),
+                    "avg_score": float(avg_scores[c, h]),
+                    "avg_to_par": float(avg_to_par[c, h]),
+                }
+                for h in np.flatnonzero(counts[c])
+            ],
+        }
+        for c in range(grid[0])
+    ]
+
+def scoring_trend(rounds: list, window: int) -> Tuple[List[dict], float]:
+    relative = np.array([r.relative_to_par for r in rounds], dtype=np.float64)
+    # Trailing moving average from a cumulative sum; early rounds average what they have
+    cumulative = np.concatenate(([0.0], np.cumsum(relative)))
+    end = np.arange(1, len(relative) + 1)
+    start = np.maximum(0, end - window)
+    rolling = np.round((cumulative[end] - cumulative[start]) / (end - start), 2)
+    slope = float(np.polyfit(np.arange(len(relative)), relative, 1)[0]) if len(relative) > 1 else 0.0
+
+    trend = [
+        {
+            "scorecard_id": r.id,
+            "date_played": r.date_played,
+            "relative_to_par": r.relative_to_par,
+            "rolling_avg": float(avg),
+        }
+        for r, avg in zip(rounds, rolling)
+    ]
+    return trend, round(slope, 4)
+
+def compute_analytics(rounds: list, holes: np.ndarray, window: int) -> dict:
+    trend, slope = scoring_trend(rounds, window) if rounds else ([], 0.0)
+    has_holes = len(holes) > 0
+    return {
+        "total_rounds": len(rounds),
+        "total_holes": len(holes),
+        "scoring_by_par": scoring_by_par(holes) if has_holes else [],
+        "score_distribution": score_distribution(holes) if has_holes else {name: 0 for name in DISTRIBUTION_BUCKETS},
+        "courses": course_hole_averages(rounds, holes) if has_holes else [],
+        "trend": trend,
+        "trend_slope_per_round": slope,
+    }
@@ -0,0 +1,134 @@
+"""Hole analytics: NumPy grouped reductions versus a naive pure-Python version.
+
+Seeds a scratch SQLite database with one user's rounds, then times loading and
+computing the /scorecards/analytics payload both ways. The naive version loads
+whole scorecards, lets SQLAlchemy decode each holes blob and loops per hole.
+
+    python benchmarks/bench_analytics.py --rounds 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-analytics-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+
+from analytics import DISTRIBUTION_BUCKETS, load_hole_data, compute_analytics
+from database import async_session, init_db, normalize_course_name, User, Scorecard, Course
+from holes import record_hole_scores
+
+PARS = [4, 5, 3, 4, 4, 3, 4, 5, 4] * 2
+COURSES = ["Pebble Beach", "St Andrews", "Augusta", "Bethpage Black", "Torrey Pines", "Muirfield"]
+
+async def seed(rounds: int) -> int:
+    await init_db()
+    rng = random.Random(42)
+    async with async_session() as db:
+        result = await db.execute(insert(User).returning(User.id), {
+            "username": "analyst", "email": "analyst@example.com", "friend_code": "ANLYST",
+            "hashed_password": "x", "created_at": datetime.utcnow(),
+        })
+        user_id = result.scalar_one()
+        result = await db.execute(insert(Course).returning(Course.id, sort_by_parameter_order=True), [
+            {"name": name, "normalized_name": normalize_course_name(name), "hole_pars": PARS,
+             "created_at": datetime.utcnow()}
+            for name in COURSES
+        ])
+        course_ids = result.scalars().all()
+        start = datetime(2010, 1, 1)
+        rows = []
+        for i in range(rounds):
+            holes = [
+                {"hole_number": n, "par": par, "score": max(1, par + rng.choice((-1, 0, 0, 1, 1, 2, 3)))}
+                for n, par in enumerate(PARS, start=1)
+            ]
+            total_score = sum(h["score"] for h in holes)
+            rows.append({
+                "user_id": user_id, "course_id": course_ids[i % len(COURSES)],
+                "course_name": COURSES[i % len(COURSES)],
+                "date_played": start + timedelta(days=i), "holes": holes,
+                "total_score": total_score, "total_par": sum(PARS),
+                "relative_to_par": total_score - sum(PARS), "created_at": datetime.utcnow(),
+            })
+        result = await db.execute(insert(Scorecard).returning(Scorecard.id, sort_by_parameter_order=True), rows)
+        await record_hole_scores(db, user_id, [
+            {"id": scorecard_id, "holes": row["holes"]} for scorecard_id, row in zip(result.scalars(), rows)
+        ])
+        await db.commit()
+    return user_id
+
+async def naive_analytics(user_id: int, window: int) -> dict:
+    async with async_session() as db:
+        result = await db.execute(
+            select(Scorecard).where(Scorecard.user_id == user_id).order_by(Scorecard.date_played, Scorecard.id)
+        )
+        scorecards = result.scalars().all()
+
+    by_par = defaultdict(lambda: [0, 0])
+    distribution = dict.fromkeys(DISTRIBUTION_BUCKETS, 0)
+    by_course_hole = defaultdict(lambda: [0, 0, 0])
+    total_holes = 0
+    for sc in scorecards:
+        for hole in sc.holes:
+            total_holes += 1
+            by_par[hole["par"]][0] += 1
+            by_par[hole["par"]][1] += hole["score"]
+            diff = min(max(hole["score"] - hole["par"], -2), 3)
+            distribution[DISTRIBUTION_BUCKETS[diff + 2]] += 1
+            cell = by_course_hole[(sc.course_id, hole["hole_number"])]
+            cell[0] += 1
+            cell[1] += hole["score"]
+            cell[2] += hole["score"] - hole["par"]
+
+    trend = []
+    for i, sc in enumerate(scorecards):
+        recent = scorecards[max(0, i + 1 - window):i + 1]
+        trend.append(round(sum(r.relative_to_par for r in recent) / len(recent), 2))
+    return {"total_holes": total_holes, "by_par": dict(by_par), "distribution": distribution,
+            "cells": len(by_course_hole), "trend": trend}
+
+async def vectorized_analytics(user_id: int, window: int) -> dict:
+    async with async_session() as db:
+        rounds, holes = await load_hole_data(db, user_id)
+    return compute_analytics(rounds, holes, window)
+
+async def timed(label: str, func, *args, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await func(*args)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<11} {best * 1000:8.1f} ms (best of {repeat})")
+    return result
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    user_id = await seed(args.rounds)
+    print(f"{args.rounds} rounds, {args.rounds * len(PARS)} holes")
+    naive = await timed("naive", naive_analytics, user_id, args.window, repeat=args.repeat)
+    vectorized = await timed("vectorized", vectorized_analytics, user_id, args.window, repeat=args.repeat)
+
+    assert naive["total_holes"] == vectorized["total_holes"]
+    assert naive["distribution"] == vectorized["score_distribution"]
+    assert naive["trend"] == [point["rolling_avg"] for point in vectorized["trend"]]
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
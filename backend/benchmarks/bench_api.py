@@ -0,0 +1,360 @@
+"""Load test every API route in-process and write the results as JSON.
+
+Seeds a scratch SQLite database with synthetic users, rounds and a random
+friend graph, then drives each route with concurrent requests through an
+in-process ASGI client and reports throughput and p50/p95/p99 latency. Two
+micro-benchmarks follow: stats aggregation and holes JSON decoding.
+
+Results go to --output (default benchmarks/results/<git sha>.json); pass
+--compare with an earlier file to print the change per route.
+
+    python benchmarks/bench_api.py --users 200 --rounds-per-user 50 --friend-density 0.05
+    python benchmarks/bench_api.py --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-api-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+# Every request comes from one client; throttling it would time the limiter, not the routes
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+from sqlalchemy import insert, select, type_coerce, String
+
+import main
+from database import async_session, engine, User, Scorecard, Friendship
+from feed import record_friendship
+from hashing import hash_password_sync
+
+PASSWORD = "bench-password"
+PARS = [4, 5, 3, 4, 4, 3, 4, 5, 4] * 2
+COURSES = ["Pebble Beach", "St Andrews", "Augusta", "Bethpage Black", "Torrey Pines", "Muirfield", "Carnoustie"]
+
+def make_round(rng: random.Random, day: int) -> dict:
+    return {
+        "course_name": rng.choice(COURSES),
+        "date_played": (datetime(2015, 1, 1) + timedelta(days=day)).isoformat(),
+        "holes": [
+            {"hole_number": n, "par": par, "score": max(1, par + rng.choice((-1, 0, 0, 1, 1, 2)))}
+            for n, par in enumerate(PARS, start=1)
+        ],
+        "weather": rng.choice(("sunny", "windy", "rain")),
+    }
+
+async def seed(args, rng: random.Random) -> dict:
+    # Users share one precomputed hash so seeding doesn't run bcrypt per user.
+    # Rounds go through the bulk import path so every derived table is filled.
+    await main.startup_event()
+    hashed = hash_password_sync(PASSWORD)
+    async with async_session() as db:
+        result = await db.execute(insert(User).returning(User.id, User.username, User.friend_code), [
+            {
+                "username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}",
+                "friend_code": f"B{i:05d}", "hashed_password": hashed, "created_at": datetime.utcnow(),
+            }
+            for i in range(args.users)
+        ])
+        users = result.all()
+
+        for user in users:
+            batch = [
+                main.scorecard_values(user.id, main.ScorecardCreate.model_validate(make_round(rng, day)))
+                for day in range(args.rounds_per_user)
+            ]
+            await main.insert_scorecard_batch(db, user.id, batch)
+
+        pairs = [
+            (a.id, b.id) for i, a in enumerate(users) for b in users[i + 1:]
+            if rng.random() < args.friend_density
+        ]
+        if pairs:
+            await db.execute(insert(Friendship), [
+                {"user_id": u, "friend_id": f, "created_at": datetime.utcnow()}
+                for a, b in pairs for u, f in ((a, b), (b, a))
+            ])
+        for a, b in pairs:
+            await record_friendship(db, a, b)
+
+        # A separate heavy user for the micro-benchmarks
+        result = await db.execute(insert(User).returning(User.id), {
+            "username": "micro", "email": "micro@example.com", "friend_code": "MICRO1",
+            "hashed_password": hashed, "created_at": datetime.utcnow(),
+        })
+        micro_user_id = result.scalar_one()
+        batch = [
+            main.scorecard_values(micro_user_id, main.ScorecardCreate.model_validate(make_round(rng, day)))
+            for day in range(args.micro_rounds)
+        ]
+        await main.insert_scorecard_batch(db, micro_user_id, batch)
+        await db.commit()
+    # Finish the feed fan-out and backfill jobs before anything is timed
+    await main.job_queue.run_pending()
+
+    friends = set(pairs) | {(b, a) for a, b in pairs}
+    return {
+        "users": users,
+        "micro_user_id": micro_user_id,
+        "tokens": {
+            user.id: {"Authorization": f"Bearer {main.create_access_token({'sub': user.username}, timedelta(hours=1))}"}
+            for user in users
+        },
+        "non_friends": [
+            (a, b) for i, a in enumerate(users) for b in users[i + 1:]
+            if (a.id, b.id) not in friends
+        ],
+    }
+
+def route_scenarios(data: dict, rng: random.Random) -> dict:
+    # name -> function(i) returning (method, url, request kwargs)
+    users, tokens = data["users"], data["tokens"]
+    non_friends = data["non_friends"]
+    rng.shuffle(non_friends)
+    run_id = rng.randrange(10 ** 6)
+
+    def any_user():
+        user = rng.choice(users)
+        return user, tokens[user.id]
+
+    def authed_get(url, **params):
+        def request(i):
+            _, headers = any_user()
+            return "GET", url, {"headers": headers, "params": params}
+        return request
+
+    def register(i):
+        name = f"new{run_id}_{i}"
+        return "POST", "/auth/register", {"json": {"username": name, "email": f"{name}@example.com", "password": PASSWORD}}
+
+    def login(i):
+        user, _ = any_user()
+        return "POST", "/auth/login", {"data": {"username": user.username, "password": PASSWORD}}
+
+    def create_scorecard(i):
+        _, headers = any_user()
+        return "POST", "/scorecards", {"headers": headers, "json": make_round(rng, 4000 + i)}
+
+    def bulk_import(i):
+        _, headers = any_user()
+        body = "\n".join(json.dumps(make_round(rng, 5000 + i * 10 + n)) for n in range(10))
+        return "POST", "/scorecards/bulk", {
+            "headers": {**headers, "Content-Type": "application/x-ndjson"}, "content": body,
+        }
+
+    def add_friend(i):
+        user, friend = non_friends.pop()
+        return "POST", "/friends", {"headers": tokens[user.id], "json": {"friend_code": friend.friend_code}}
+
+    return {
+        "POST /auth/register": register,
+        "POST /auth/login": login,
+        "GET /auth/me": authed_get("/auth/me"),
+        "POST /scorecards": create_scorecard,
+        "POST /scorecards/bulk (10 rounds)": bulk_import,
+        "GET /scorecards": authed_get("/scorecards"),
+        "GET /scorecards?fields=summary": authed_get("/scorecards", fields="summary", limit=50),
+        "GET /scorecards/stats": authed_get("/scorecards/stats"),
+        "GET /scorecards/analytics": authed_get("/scorecards/analytics"),
+        "GET /scorecards/holes": authed_get("/scorecards/holes"),
+        "GET /handicap": authed_get("/handicap"),
+        "GET /courses?q=": authed_get("/courses", q="pe"),
+        "GET /feed": authed_get("/feed"),
+        "GET /dashboard": authed_get("/dashboard"),
+        "POST /friends": add_friend,
+        "GET /friends": authed_get("/friends"),
+        "GET /friends/leaderboard": authed_get("/friends/leaderboard"),
+        "GET /health": lambda i: ("GET", "/health", {}),
+    }
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+def summarize(latencies: list, errors: int, elapsed: float, concurrency: int) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+async def drive(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start, concurrency)
+
+async def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+async def micro_benchmarks(user_id: int, repeat: int) -> dict:
+    # Per-user stats from the maintained aggregates vs. scanning every round
+    # (the original get_golf_stats), and three ways to decode holes JSON
+    async def stats_from_aggregates():
+        async with async_session() as db:
+            await main.build_stats(db, user_id)
+
+    async def stats_from_full_scan():
+        async with async_session() as db:
+            result = await db.execute(select(Scorecard).where(Scorecard.user_id == user_id))
+            scorecards = result.scalars().all()
+        relative = [sc.relative_to_par for sc in scorecards]
+        min(scorecards, key=lambda sc: sc.relative_to_par)
+        max(scorecards, key=lambda sc: sc.relative_to_par)
+        courses = {}
+        for sc in scorecards:
+            courses[sc.course_name] = courses.get(sc.course_name, 0) + 1
+        round(sum(relative) / len(relative), 2)
+
+    async with async_session() as db:
+        result = await db.execute(
+            select(type_coerce(Scorecard.holes, String)).where(Scorecard.user_id == user_id)
+        )
+        blobs = result.scalars().all()
+
+    async def decode_per_row():
+        [json.loads(blob) for blob in blobs]
+
+    async def decode_joined():
+        json.loads("[" + ",".join(blobs) + "]")
+
+    async def decode_via_orm():
+        async with async_session() as db:
+            result = await db.execute(select(Scorecard.holes).where(Scorecard.user_id == user_id))
+            result.scalars().all()
+
+    return {
+        "rounds": len(blobs),
+        "stats_from_aggregates_ms": await best_of(stats_from_aggregates, repeat),
+        "stats_from_full_scan_ms": await best_of(stats_from_full_scan, repeat),
+        "holes_decode_per_row_ms": await best_of(decode_per_row, repeat),
+        "holes_decode_joined_ms": await best_of(decode_joined, repeat),
+        "holes_decode_via_orm_query_ms": await best_of(decode_via_orm, repeat),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_comparison(previous: dict, current: dict) -> None:
+    print(f"\nvs {previous['meta']['commit']}:")
+    for name, result in current["routes"].items():
+        before = previous["routes"].get(name)
+        if before is None:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(f"  {name:<36} p95 {before['p95_ms']:8.2f} -> {result['p95_ms']:8.2f} ms ({change:+.0f}%)")
+
+async def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds-per-user", type=int, default=50)
+    parser.add_argument("--friend-density", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--auth-requests", type=int, default=40, help="requests for bcrypt-bound auth routes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--micro-rounds", type=int, default=2000, help="rounds of the micro-benchmark user")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per micro-benchmark")
+    parser.add_argument("--log-slow", action="store_true", help="keep the slow request log on")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    if not args.log_slow:
+        logging.getLogger("golf.metrics").setLevel(logging.ERROR)
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    data = await seed(args, rng)
+    print(f"Seeded {args.users} users x {args.rounds_per_user} rounds in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        print(f"{'route':<36} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}  errors")
+        for name, make_request in route_scenarios(data, rng).items():
+            requests = args.auth_requests if name.startswith("POST /auth") else args.requests
+            if name == "POST /friends":
+                requests = min(requests, len(data["non_friends"]))
+            result = await drive(client, make_request, requests, args.concurrency)
+            results[name] = result
+            print(
+                f"{name:<36} {result['throughput_rps']:>8} {result['p50_ms']:>8} "
+                f"{result['p95_ms']:>8} {result['p99_ms']:>8}  {result['errors']}"
+            )
+
+    micro = await micro_benchmarks(data["micro_user_id"], args.repeat)
+    print("\nmicro-benchmarks (best of %d):" % args.repeat)
+    for name, value in micro.items():
+        print(f"  {name:<36} {value}")
+    await main.shutdown_event()
+    await engine.dispose()
+
+    commit = git_commit()
+    output = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "routes": results,
+        "micro": micro,
+    }
+    path = args.output or os.path.join(BACKEND_DIR, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nWrote {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), output)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main_bench())
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
@@ -0,0 +1,83 @@
+"""Import N rounds through POST /scorecards/bulk versus one POST /scorecards each.
+
+Runs the app in-process against a scratch SQLite database. The per-round path
+is timed on a sample and extrapolated, since 10k single requests mostly
+measures the same thing 10k times.
+
+    python benchmarks/bench_bulk_import.py --rounds 10000 --sample 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-bulk-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+
+COURSES = ["Pebble Beach", "St Andrews", "Augusta", "Bethpage Black", "Torrey Pines"]
+
+def make_round(i: int) -> dict:
+    rng = random.Random(i)
+    holes = [
+        {"hole_number": n, "par": par, "score": par + rng.choice((-1, 0, 0, 1, 1, 2))}
+        for n, par in enumerate([4, 5, 3, 4, 4, 3, 4, 5, 4] * 2, start=1)
+    ]
+    return {
+        "course_name": COURSES[i % len(COURSES)],
+        "date_played": f"20{10 + i % 14}-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00",
+        "holes": holes,
+        "weather": "sunny",
+    }
+
+async def login(client: httpx.AsyncClient, name: str) -> dict:
+    await client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "bench"})
+    response = await client.post("/auth/login", data={"username": name, "password": "bench"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def main_bench() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        headers = await login(client, "single")
+        start = time.perf_counter()
+        for i in range(args.sample):
+            response = await client.post("/scorecards", json=make_round(i), headers=headers)
+            response.raise_for_status()
+        per_round = (time.perf_counter() - start) / args.sample
+        print(f"single POST  {per_round * 1000:.2f} ms/round -> ~{per_round * args.rounds:.1f}s for {args.rounds}")
+
+        headers = await login(client, "bulk")
+        body = "\n".join(json.dumps(make_round(i)) for i in range(args.rounds))
+        start = time.perf_counter()
+        response = await client.post(
+            "/scorecards/bulk", content=body,
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+        elapsed = time.perf_counter() - start
+        result = response.json()
+        print(
+            f"bulk NDJSON  {elapsed:.2f}s for {result['imported']} rounds "
+            f"({result['imported'] / elapsed:.0f} rounds/s, {result['failed']} failed), "
+            f"speedup ~{per_round * args.rounds / elapsed:.0f}x"
+        )
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main_bench())
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
@@ -0,0 +1,163 @@
+"""Peak memory and throughput of GET /scorecards/export for a large history.
+
+Seeds a scratch SQLite database with a user holding --rounds rounds and one
+holding a hundredth as many, then downloads every export format through the
+ASGI app directly, discarding each chunk as it arrives (httpx's ASGI transport
+would buffer the whole body). Python heap use is tracked with tracemalloc; the
+small export is the baseline, and the run fails if the large export's peak
+exceeds --max-memory-mb, which only buffering the history could cause.
+
+    python benchmarks/bench_export.py --rounds 100000 --max-memory-mb 32
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-export-")
+DB_PATH = os.path.join(TMP_DIR, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ.setdefault("JOB_CONCURRENCY", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from database import engine
+
+PARS = [4, 5, 3, 4, 4, 3, 4, 5, 4] * 2
+COURSES = ["Pebble Beach", "St Andrews", "Augusta", "Bethpage Black", "Torrey Pines", "Muirfield"]
+FORMATS = ("csv", "ndjson", "columnar")
+
+def seed_rounds(user_id: int, rounds: int, first_id: int) -> None:
+    # Straight through sqlite3, holes JSON and hole_scores rows alike
+    rng = random.Random(3)
+    start = datetime(2000, 1, 1)
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        for first in range(0, rounds, 10000):
+            scorecards, holes_rows = [], []
+            for i in range(first, min(first + 10000, rounds)):
+                holes = [
+                    {"hole_number": n, "par": par, "score": max(1, par + rng.choice((-1, 0, 0, 1, 1, 2)))}
+                    for n, par in enumerate(PARS, start=1)
+                ]
+                total_score = sum(h["score"] for h in holes)
+                played = (start + timedelta(hours=i)).isoformat(sep=" ")
+                scorecards.append((
+                    first_id + i, user_id, rng.choice(COURSES), played, json.dumps(holes), rng.choice(("sunny", "windy", None)),
+                    None, total_score, sum(PARS), total_score - sum(PARS), played,
+                ))
+                holes_rows += [(first_id + i, user_id, h["hole_number"], h["par"], h["score"]) for h in holes]
+            conn.executemany(
+                "INSERT INTO scorecards (id, user_id, course_name, date_played, holes, weather, notes, "
+                "total_score, total_par, relative_to_par, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                scorecards,
+            )
+            conn.executemany(
+                "INSERT INTO hole_scores (scorecard_id, user_id, hole_number, par, score) VALUES (?, ?, ?, ?, ?)",
+                holes_rows,
+            )
+    conn.close()
+
+async def download(path: str, token: str) -> tuple:
+    # Minimal ASGI client that counts body bytes without keeping them
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": url_path, "raw_path": url_path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    received = {"status": None, "bytes": 0, "lines": 0}
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # The request once, then block: Starlette polls receive for a disconnect
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["lines"] += body.count(b"\n")
+            if not message.get("more_body", False):
+                finished.set()
+
+    await main.app(scope, receive, send)
+    return received["status"], received["bytes"], received["lines"]
+
+async def measure(fmt: str, token: str) -> tuple:
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    status, size, lines = await download(f"/scorecards/export?format={fmt}", token)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    if status != 200:
+        raise RuntimeError(f"export {fmt} returned {status}")
+    return (peak - baseline) / 2 ** 20, size, lines, elapsed
+
+async def run(args) -> int:
+    # Every large export is a "slow request"; the log would bury the results
+    logging.getLogger("golf.metrics").setLevel(logging.ERROR)
+    await main.startup_event()
+    users = sqlite3.connect(DB_PATH)
+    with users:
+        for user_id, name in ((1, "small"), (2, "large")):
+            users.execute(
+                "INSERT INTO users (id, username, email, friend_code, hashed_password, friend_count, created_at) "
+                "VALUES (?, ?, ?, ?, 'x', 0, ?)",
+                (user_id, name, f"{name}@example.com", f"EXPRT{user_id}", datetime.utcnow().isoformat(sep=" ")),
+            )
+    users.close()
+    small_rounds = max(1, args.rounds // 100)
+    seed_rounds(1, small_rounds, 1)
+    seed_rounds(2, args.rounds, small_rounds + 1)
+    tokens = {
+        name: main.create_access_token({"sub": name}, timedelta(hours=1)) for name in ("small", "large")
+    }
+    print(f"Seeded {args.rounds} rounds (baseline user: {small_rounds})\n")
+
+    tracemalloc.start()
+    failures = 0
+    for fmt in FORMATS:
+        small_peak, _, _, _ = await measure(fmt, tokens["small"])
+        peak, size, lines, elapsed = await measure(fmt, tokens["large"])
+        ok = peak <= args.max_memory_mb
+        failures += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {fmt:9} {size / 2 ** 20:8.1f} MB in {elapsed:6.2f} s "
+              f"({args.rounds / elapsed:7.0f} rounds/s, {lines} lines)   "
+              f"peak heap {peak:6.2f} MB vs {small_peak:6.2f} MB for {small_rounds} rounds")
+    tracemalloc.stop()
+    await main.shutdown_event()
+    await engine.dispose()
+    return 1 if failures else 0
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=100_000)
+    parser.add_argument("--max-memory-mb", type=float, default=32)
+    args = parser.parse_args()
+    try:
+        return asyncio.run(run(args))
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,129 @@
+"""Registration throughput: random-and-check friend codes versus the allocator.
+
+Seeds a scratch SQLite database with --existing users holding random codes,
+the way register used to issue them, and times the reserve_legacy_friend_codes
+migration over them. Then registers --registrations users each way, with
+--concurrency registrations in flight:
+
+  random     generate a code, SELECT to see if it is taken, retry if so
+  allocator  friend_code_allocator.allocate(), a block reservation per 100
+
+bcrypt and the email/username checks are identical in both and left out, so
+each registration is the friend code step, the INSERT and the commit.
+
+    python benchmarks/bench_friend_codes.py --existing 1000000 --registrations 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-friend-codes-")
+DB_PATH = os.path.join(TMP_DIR, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+
+from database import async_session, engine, init_db, reserve_legacy_friend_codes, User
+from friend_codes import FRIEND_CODE_ALPHABET, FRIEND_CODE_LENGTH, FRIEND_CODE_SPACE, friend_code_allocator
+
+def random_code() -> str:
+    return "".join(secrets.choice(FRIEND_CODE_ALPHABET) for _ in range(FRIEND_CODE_LENGTH))
+
+def seed_users(count: int) -> None:
+    # Straight through sqlite3: a million ORM inserts would dominate the run
+    rng = random.Random(11)
+    codes = set()
+    while len(codes) < count:
+        codes.add("".join(rng.choice(FRIEND_CODE_ALPHABET) for _ in range(FRIEND_CODE_LENGTH)))
+    now = datetime.utcnow().isoformat(sep=" ")
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (username, email, friend_code, hashed_password, friend_count, created_at) "
+            "VALUES (?, ?, ?, 'x', 0, ?)",
+            ((f"seed{i}", f"seed{i}@example.com", code, now) for i, code in enumerate(codes)),
+        )
+    conn.close()
+
+def user_row(name: str, friend_code: str) -> dict:
+    return {
+        "username": name, "email": f"{name}@example.com", "friend_code": friend_code,
+        "hashed_password": "x", "created_at": datetime.utcnow(),
+    }
+
+async def register_random(name: str, lookups: list) -> None:
+    async with async_session() as db:
+        friend_code = random_code()
+        lookups.append(1)
+        while (await db.execute(select(User.id).where(User.friend_code == friend_code))).first():
+            friend_code = random_code()
+            lookups.append(1)
+        await db.execute(insert(User).values(user_row(name, friend_code)))
+        await db.commit()
+
+async def register_allocated(name: str, lookups: list) -> None:
+    friend_code = await friend_code_allocator.allocate()
+    async with async_session() as db:
+        await db.execute(insert(User).values(user_row(name, friend_code)))
+        await db.commit()
+
+async def run_registrations(label: str, register, args) -> None:
+    lookups: list = []
+    queue = iter(range(args.registrations))
+
+    async def worker():
+        for i in queue:
+            await register(f"{label}{i}", lookups)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:10} {args.registrations / elapsed:8.0f} registrations/s   "
+          f"{len(lookups) / args.registrations:.4f} code lookups per registration")
+
+async def run(args) -> int:
+    await init_db()
+    start = time.perf_counter()
+    seed_users(args.existing)
+    print(f"Seeded {args.existing} users with random codes in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(reserve_legacy_friend_codes)
+    print(f"reserve_legacy_friend_codes over {args.existing} codes: {time.perf_counter() - start:.1f} s")
+    filled = args.existing / FRIEND_CODE_SPACE
+    print(f"Code space {filled:.4%} full: random codes expect {1 / (1 - filled):.4f} tries each\n")
+
+    await run_registrations("random", register_random, args)
+    await run_registrations("allocator", register_allocated, args)
+    print(f"allocator reserved {friend_code_allocator.blocks} blocks of {friend_code_allocator.block_size}")
+
+    conn = sqlite3.connect(DB_PATH)
+    total, distinct = conn.execute("SELECT count(*), count(DISTINCT friend_code) FROM users").fetchone()
+    conn.close()
+    await engine.dispose()
+    print(f"{total} users, {distinct} distinct friend codes")
+    return 0 if total == distinct else 1
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--existing", type=int, default=1_000_000)
+    parser.add_argument("--registrations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    try:
+        return asyncio.run(run(args))
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
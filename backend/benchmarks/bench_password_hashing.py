@@ -0,0 +1,70 @@
+"""Event-loop responsiveness while bcrypt runs for a burst of concurrent logins.
+
+Compares hashing inline on the loop (the old behaviour) with PasswordHasher.
+A ticker task sleeps for TICK seconds in a loop and records how late it wakes
+up; that lag is what every other request on the worker would see.
+
+    python benchmarks/bench_password_hashing.py --logins 32 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import PasswordHasher, hash_password_sync, verify_password_sync
+
+TICK = 0.005
+
+async def ticker(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+async def inline_login(hashed: str) -> None:
+    verify_password_sync("correct horse", hashed)
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+async def run(label: str, logins: int, make_call) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    lags_ms = [lag * 1000 for lag in lags] or [0.0]
+    print(
+        f"{label:<10} logins={logins} wall={elapsed:.2f}s "
+        f"loop_lag_ms p50={statistics.median(lags_ms):.1f} "
+        f"p99={percentile(lags_ms, 0.99):.1f} max={max(lags_ms):.1f} ticks={len(lags)}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    hashed = hash_password_sync("correct horse")
+    await run("inline", args.logins, lambda: inline_login(hashed))
+
+    hasher = PasswordHasher(max_workers=args.workers, executor=args.executor)
+    await run("pooled", args.logins, lambda: hasher.verify("correct horse", hashed))
+    print(f"hasher metrics: {hasher.metrics()}")
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
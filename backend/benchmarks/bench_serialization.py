@@ -0,0 +1,145 @@
+"""Scorecard list serialization: pydantic response models versus FAST_JSON.
+
+Seeds a scratch SQLite database with one user's rounds, then times turning a
+--rounds long GET /scorecards page into bytes both ways:
+
+  models     rows -> ScorecardResponse objects -> response_model validation
+             -> JSON, which is what FastAPI does by default
+  fast_json  rows (holes as raw text) -> dicts -> one fast_json.dumps call
+
+Times exclude the query itself but include row decoding, since the default
+path also lets SQLAlchemy json-decode every holes blob. Finally both modes
+are requested end to end and the response bodies must match byte for byte.
+
+    python benchmarks/bench_serialization.py --rounds 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Union
+
+TMP_DIR = tempfile.mkdtemp(prefix="golf-bench-serialization-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+import fast_json
+import main
+from database import async_session, engine, User
+
+PARS = [4, 5, 3, 4, 4, 3, 4, 5, 4] * 2
+COURSES = ["Pebble Beach", "St Andrews", "Augusta", "Bethpage Black", "Torrey Pines", "Muirfield"]
+RESPONSE_ADAPTER = TypeAdapter(List[Union[main.ScorecardResponse, main.ScorecardSummaryResponse]])
+
+def make_round(rng: random.Random, day: int) -> dict:
+    return {
+        "course_name": rng.choice(COURSES),
+        "date_played": (datetime(2015, 1, 1) + timedelta(days=day)).isoformat(),
+        "holes": [
+            {"hole_number": n, "par": par, "score": max(1, par + rng.choice((-1, 0, 0, 1, 1, 2)))}
+            for n, par in enumerate(PARS, start=1)
+        ],
+        "weather": rng.choice(("sunny", "windy", "rain")),
+        "notes": rng.choice((None, "Played with Zoë", "Greens were quick")),
+        "course_rating": rng.choice((None, 71.3, 72.0)),
+        "slope_rating": rng.choice((None, 113, 131)),
+    }
+
+async def seed(rounds: int) -> int:
+    await main.startup_event()
+    rng = random.Random(7)
+    async with async_session() as db:
+        result = await db.execute(insert(User).returning(User.id), {
+            "username": "bench", "email": "bench@example.com", "friend_code": "BENCH1",
+            "hashed_password": "x", "created_at": datetime.utcnow(),
+        })
+        user_id = result.scalar_one()
+        batch = [
+            main.scorecard_values(user_id, main.ScorecardCreate.model_validate(make_round(rng, day)))
+            for day in range(rounds)
+        ]
+        await main.insert_scorecard_batch(db, user_id, batch)
+        await db.commit()
+    return user_id
+
+async def time_mode(user_id: int, rounds: int, fast: bool, repeat: int) -> List[float]:
+    fast_json.FAST_JSON = fast
+    query, to_response = main.scorecards_query(user_id, None, "full")
+    samples = []
+    async with async_session() as db:
+        for _ in range(repeat):
+            result = await db.execute(query.limit(rounds))
+            start = time.perf_counter()
+            rows = result.all()
+            if fast:
+                body = fast_json.dumps([to_response(row) for row in rows])
+            else:
+                value = RESPONSE_ADAPTER.validate_python([to_response(row) for row in rows])
+                body = RESPONSE_ADAPTER.dump_json(value)
+            samples.append(time.perf_counter() - start)
+    assert body
+    return samples
+
+async def fetch_bodies(rounds: int) -> dict:
+    token = main.create_access_token({"sub": "bench"}, timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    bodies = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for fast in (False, True):
+            fast_json.FAST_JSON = fast
+            for url, params in (("/scorecards", {"limit": rounds}), ("/scorecards", {"fields": "summary"}),
+                                ("/dashboard", {})):
+                response = await client.get(url, headers=headers, params=params)
+                response.raise_for_status()
+                bodies[(fast, url, tuple(params))] = (response.content, response.headers.get("etag"))
+    return bodies
+
+def report(name: str, samples: List[float], rounds: int) -> float:
+    median = statistics.median(samples)
+    print(f"{name:10} median {median * 1000:8.2f} ms   best {min(samples) * 1000:8.2f} ms"
+          f"   {rounds / median:10.0f} rounds/s")
+    return median
+
+async def run(args) -> int:
+    user_id = await seed(args.rounds)
+    print(f"{args.rounds} rounds, {args.repeat} runs each, fast_json encoder: {fast_json.backend()}\n")
+    models = report("models", await time_mode(user_id, args.rounds, False, args.repeat), args.rounds)
+    fast = report("fast_json", await time_mode(user_id, args.rounds, True, args.repeat), args.rounds)
+    print(f"\nfast_json is {models / fast:.1f}x faster")
+
+    bodies = await fetch_bodies(args.rounds)
+    mismatches = 0
+    for (is_fast, url, params), (body, etag) in bodies.items():
+        if not is_fast:
+            continue
+        expected, expected_etag = bodies[(False, url, params)]
+        same = body == expected and etag == expected_etag
+        mismatches += not same
+        print(f"[{'ok' if same else 'FAIL'}] GET {url} {list(params) or ''}: {len(body)} bytes, identical in both modes"
+              if same else f"[FAIL] GET {url} {list(params) or ''}: response differs between modes")
+    await engine.dispose()
+    return 1 if mismatches else 0
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    try:
+        return asyncio.run(run(args))
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,107 @@
+"""Write and read throughput of the SQLite engine profiles under uvicorn workers.
+
+For each DATABASE_PROFILE ("default" = SQLite defaults, "production" = WAL and
+the pragmas in database.py) this starts uvicorn with --workers N on a fresh
+database, then runs concurrent POST /scorecards and GET /scorecards clients.
+
+    python benchmarks/bench_sqlite_profile.py --workers 4 --clients 32 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOLES = [{"hole_number": n, "par": 4, "score": 5} for n in range(1, 19)]
+
+def prepare_database(env: dict) -> None:
+    # Create tables once up front so workers don't race on create_all
+    subprocess.run(
+        [sys.executable, "-c", "import asyncio, database; asyncio.run(database.init_db())"],
+        cwd=BACKEND_DIR, env=env, check=True,
+    )
+
+async def wait_until_up(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/health")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("uvicorn did not start")
+
+async def register_users(client: httpx.AsyncClient, count: int) -> list:
+    tokens = []
+    for i in range(count):
+        await client.post("/auth/register", json={
+            "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "bench-password",
+        })
+        response = await client.post("/auth/login", data={"username": f"bench{i}", "password": "bench-password"})
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+async def drive(client: httpx.AsyncClient, token: str, kind: str, deadline: float, counts: dict) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"course_name": "Bench Links", "date_played": "2024-05-01T09:00:00", "holes": HOLES}
+    while time.perf_counter() < deadline:
+        if kind == "write":
+            response = await client.post("/scorecards", json=body, headers=headers)
+        else:
+            response = await client.get("/scorecards", params={"limit": 20}, headers=headers)
+        counts[kind if response.status_code == 200 else "errors"] += 1
+
+async def run_profile(profile: str, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/bench.db",
+            DATABASE_PROFILE=profile,
+            RATE_LIMIT_ENABLED="false",
+        )
+        prepare_database(env)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            limits = httpx.Limits(max_connections=args.clients)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+                await wait_until_up(client)
+                tokens = await register_users(client, args.users)
+                counts = {"write": 0, "read": 0, "errors": 0}
+                deadline = time.perf_counter() + args.seconds
+                await asyncio.gather(*(
+                    drive(client, tokens[i % len(tokens)], "write" if i % 2 == 0 else "read", deadline, counts)
+                    for i in range(args.clients)
+                ))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(
+        f"{profile:<10} workers={args.workers} clients={args.clients} "
+        f"writes/s={counts['write'] / args.seconds:.0f} reads/s={counts['read'] / args.seconds:.0f} "
+        f"errors={counts['errors']}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        await run_profile(profile, args)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+import csv
+import json
+from typing import AsyncIterator, Tuple
+
+# Content types accepted by POST /scorecards/bulk
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+class ImportFormatError(ValueError):
+    pass
+
+# Each parser yields (row_number, record) where record is a dict ready for
+# ScorecardCreate validation, or an ImportFormatError for a row that could not
+# be parsed at all. Row numbers are 1-based data rows (the CSV header is not a
+# row). A body that is unusable as a whole raises ImportFormatError instead.
+
+def decode_line(line: bytes) -> str:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise ImportFormatError("Body is not valid UTF-8")
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield decode_line(line)
+    if buffer:
+        yield decode_line(buffer)
+
+async def parse_json_array(body: bytes) -> AsyncIterator[Tuple[int, object]]:
+    try:
+        records = json.loads(body)
+    except ValueError as e:
+        raise ImportFormatError(f"Invalid JSON: {e}")
+    if not isinstance(records, list):
+        raise ImportFormatError("Expected a JSON array of scorecards")
+    for row_number, record in enumerate(records, start=1):
+        yield row_number, record
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ImportFormatError(f"Invalid JSON: {e}")
+
+def csv_record(row: dict) -> dict:
+    # Holes are flattened as hole_<n>_par / hole_<n>_score columns, the same
+    # layout the CSV export writes
+    holes = []
+    hole_number = 1
+    while f"hole_{hole_number}_par" in row:
+        par = row.get(f"hole_{hole_number}_par")
+        score = row.get(f"hole_{hole_number}_score")
+        if par or score:
+            holes.append({"hole_number": hole_number, "par": par, "score": score})
+        hole_number += 1
+    return {
+        "course_name": row.get("course_name"),
+        "date_played": row.get("date_played"),
+        "weather": row.get("weather") or None,
+        "notes": row.get("notes") or None,
+        "course_rating": row.get("course_rating") or None,
+        "slope_rating": row.get("slope_rating") or None,
+        "holes": holes,
+    }
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    header = None
+    row_number = 0
+    pending = ""
+    async for line in iter_lines(chunks):
+        # A quoted field may contain newlines; keep joining until quotes balance
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ImportFormatError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row_number, csv_record(dict(zip(header, values)))
+    if pending:
+        yield row_number + 1, ImportFormatError("Unterminated quoted field")
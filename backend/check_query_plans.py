@@ -0,0 +1,230 @@
+"""Fail if any query issued by an API route falls back to a full table scan.
+
+Seeds a throwaway SQLite database, drives every route in-process, captures the
+SQL each one issues and runs EXPLAIN QUERY PLAN on it. Also counts statements
+per request against STATEMENT_BUDGETS. Exits non-zero when a plan contains a
+SCAN step or a request goes over budget, so it can gate CI:
+
+    python check_query_plans.py
+
+tests/test_query_plans.py runs the same checks as assertions against the test
+suite's database.
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from collections import defaultdict
+
+if __name__ == "__main__":
+    # Imported by the tests, the suite's conftest has already set these
+    TMP_DIR = tempfile.mkdtemp(prefix="golf-query-plans-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'query_plans.db')}"
+    # A background revocation sync mid-request would be counted against that route
+    os.environ["REVOCATION_SYNC_SECONDS"] = "3600"
+    # Jobs run inline below, under their own label, instead of on background workers
+    os.environ["JOB_CONCURRENCY"] = "0"
+
+import httpx
+from sqlalchemy import event
+
+import main
+from database import engine
+from rate_limit import RATE_LIMIT_USER_BURST
+
+DB_PATH = engine.url.database
+
+HOLES = [{"hole_number": n, "par": 4, "score": 4 + n % 2} for n in range(1, 19)]
+SKIPPED_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "CREATE", "SAVEPOINT", "RELEASE")
+
+# Most statements a single request may issue, including the user lookup on a
+# cold user cache
+STATEMENT_BUDGETS = {
+    "POST /scorecards": 11,
+    "GET /scorecards": 3,
+    "GET /scorecards/stats": 4,
+    "GET /scorecards/holes": 3,
+    "GET /courses": 2,
+    "GET /feed": 2,
+    "GET /scorecards/export": 3,
+    "GET /handicap": 3,
+    "GET /friends": 3,
+    "GET /friends/leaderboard": 2,
+    "GET /dashboard": 6,
+    "GET /dashboard (304)": 2,
+    "GET /auth/me": 1,
+    "POST /auth/refresh": 2,
+    "POST /auth/logout": 2,
+    "POST /auth/login (429)": 0,
+}
+
+captured = defaultdict(list)
+statement_counts = defaultdict(list)
+current_route = None
+request_statements = 0
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def capture_statement(conn, cursor, statement, parameters, context, executemany):
+    global request_statements
+    if current_route is None or statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+        return
+    request_statements += 1
+    # executemany inserts have no plan worth checking; repeats add nothing
+    seen = [s for s, _ in captured[current_route]]
+    if not executemany and statement not in seen:
+        captured[current_route].append((statement, parameters))
+
+async def call(client, route, method, url, **kwargs):
+    global current_route, request_statements
+    current_route = route
+    request_statements = 0
+    try:
+        response = await client.request(method, url, **kwargs)
+    finally:
+        current_route = None
+    statement_counts[route].append(request_statements)
+    expected = int(route[-4:-1]) if route.endswith(("(304)", "(429)")) else None
+    if response.status_code != expected and (expected or response.status_code >= 400):
+        raise RuntimeError(f"{route} returned {response.status_code}: {response.text}")
+    return response
+
+async def exercise_routes(client: httpx.AsyncClient) -> None:
+    friend_codes, tokens = [], []
+    for i in range(3):
+        response = await call(client, "POST /auth/register", "POST", "/auth/register", json={
+            "username": f"plan{i}", "email": f"plan{i}@example.com", "password": "plan-password",
+        })
+        friend_codes.append(response.json()["friend_code"])
+        response = await call(client, "POST /auth/login", "POST", "/auth/login",
+                              data={"username": f"plan{i}", "password": "plan-password"})
+        tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+    headers = tokens[0]
+    for day in range(1, 6):
+        await call(client, "POST /scorecards", "POST", "/scorecards", headers=headers, json={
+            "course_name": f"Course {day % 2}", "date_played": f"2024-06-0{day}T08:00:00", "holes": HOLES,
+        })
+    response = await call(client, "GET /scorecards", "GET", "/scorecards", headers=headers, params={"limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+    await call(client, "GET /scorecards?cursor", "GET", "/scorecards", headers=headers,
+               params={"limit": 2, "cursor": cursor})
+    await call(client, "GET /scorecards?fields=summary", "GET", "/scorecards", headers=headers,
+               params={"fields": "summary"})
+    await call(client, "GET /scorecards/stats", "GET", "/scorecards/stats", headers=headers)
+    await call(client, "GET /scorecards/analytics", "GET", "/scorecards/analytics", headers=headers)
+    await call(client, "GET /scorecards/holes", "GET", "/scorecards/holes", headers=headers)
+    for export_format in ("csv", "ndjson", "columnar"):
+        await call(client, "GET /scorecards/export", "GET", "/scorecards/export",
+                   headers=headers, params={"format": export_format})
+    await call(client, "GET /handicap", "GET", "/handicap", headers=headers)
+    await call(client, "GET /courses", "GET", "/courses", headers=headers, params={"q": "cour"})
+    await call(client, "GET /scorecards/holes", "GET", "/scorecards/holes",
+               headers=headers, params={"course_name": "Course 1", "hole_number": 1})
+    await call(client, "GET /scorecards/holes", "GET", "/scorecards/holes",
+               headers=headers, params={"since": "2024-01-01T00:00:00"})
+
+    for code in friend_codes[1:]:
+        await call(client, "POST /friends", "POST", "/friends", headers=headers, json={"friend_code": code})
+    await call(client, "GET /friends", "GET", "/friends", headers=headers)
+    await run_jobs("jobs")
+    for day in range(1, 4):
+        await call(client, "POST /scorecards", "POST", "/scorecards", headers=tokens[1], json={
+            "course_name": "Course 1", "date_played": f"2024-07-0{day}T08:00:00", "holes": HOLES,
+        })
+    await run_jobs("jobs")
+    response = await call(client, "GET /feed", "GET", "/feed", headers=headers, params={"limit": 2})
+    await call(client, "GET /feed", "GET", "/feed", headers=headers,
+               params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+    await call(client, "GET /friends/leaderboard", "GET", "/friends/leaderboard", headers=headers)
+    response = await call(client, "GET /dashboard", "GET", "/dashboard", headers=headers)
+    await call(client, "GET /dashboard (304)", "GET", "/dashboard",
+               headers={**headers, "If-None-Match": response.headers["ETag"]})
+    await call(client, "GET /auth/me", "GET", "/auth/me", headers=headers)
+    response = await call(client, "POST /auth/login", "POST", "/auth/login",
+                          data={"username": "plan2", "password": "plan-password"})
+    response = await call(client, "POST /auth/refresh", "POST", "/auth/refresh",
+                          json={"refresh_token": response.json()["refresh_token"]})
+    await call(client, "POST /auth/logout", "POST", "/auth/logout",
+               headers={"Authorization": f"Bearer {response.json()['access_token']}"},
+               json={"refresh_token": response.json()["refresh_token"]})
+
+    # Failed logins drain the account's bucket; the throttled one must not query
+    limiter_enabled = main.auth_rate_limiter.enabled
+    main.auth_rate_limiter.enabled = True
+    try:
+        for _ in range(RATE_LIMIT_USER_BURST):
+            await client.post("/auth/login", data={"username": "plan1", "password": "wrong"})
+        await call(client, "POST /auth/login (429)", "POST", "/auth/login",
+                   data={"username": "plan1", "password": "wrong"})
+    finally:
+        main.auth_rate_limiter.enabled = limiter_enabled
+
+async def run_routes() -> None:
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        await exercise_routes(client)
+    await main.shutdown_event()
+    await engine.dispose()
+
+async def run_jobs(label):
+    global current_route
+    current_route = label
+    try:
+        await main.job_queue.run_pending()
+    finally:
+        current_route = None
+
+def is_bounded_scan(detail: str) -> bool:
+    # Scanning a VALUES row or a subquery's already-limited result is not a table scan
+    return detail == "SCAN CONSTANT ROW" or detail.startswith("SCAN anon_")
+
+def find_scans() -> list:
+    failures = []
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        for route, statements in captured.items():
+            for statement, parameters in statements:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+                details = [row[-1] for row in plan]
+                if not details:
+                    continue
+                scans = [d for d in details if d.startswith("SCAN") and not is_bounded_scan(d)]
+                status = "FAIL" if scans else "ok"
+                print(f"[{status}] {route}: {' '.join(statement.split())[:120]}")
+                for detail in details:
+                    print(f"         {detail}")
+                if scans:
+                    failures.append((route, statement, scans))
+    finally:
+        conn.close()
+    return failures
+
+def find_over_budget() -> list:
+    failures = []
+    print()
+    for route, budget in STATEMENT_BUDGETS.items():
+        worst = max(statement_counts[route], default=0)
+        status = "FAIL" if worst > budget else "ok"
+        print(f"[{status}] {route}: at most {worst} statements per request (budget {budget})")
+        if worst > budget:
+            failures.append((route, worst, budget))
+    return failures
+
+def main_check() -> int:
+    try:
+        asyncio.run(run_routes())
+        scans = find_scans()
+        over_budget = find_over_budget()
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+    if scans or over_budget:
+        print(f"\n{len(scans)} queries fall back to a table scan, {len(over_budget)} routes over statement budget")
+        return 1
+    print(f"\nAll queries for {len(captured)} routes use indexes and stay within budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_check())
@@ -0,0 +1,58 @@
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Hashable
+
+from fastapi import Response
+
+class RequestCoalescer:
+    # Identical GETs in flight at the same time share one computation: the
+    # first runs the route, later ones await its result. Routes opt in with
+    # @coalesce below conditional_get, and are keyed by the ETag it set,
+    # which already names the user, data version, path and query. A write
+    # committed meanwhile bumps the version, so a request arriving after it
+    # never joins a computation that started before it.
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            # The leader's own session does the work, so if the leader is
+            # cancelled, the computation is cancelled with it
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+            self.computed += 1
+            return await task
+        self.coalesced += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The leader went away; unless this request did too, compute again
+            if not task.cancelled() or asyncio.current_task().cancelling():
+                raise
+        return await self.run(key, compute)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def coalesce(self, func):
+        # The route must take `response: Response` for the ETag; without one
+        # (conditional_get not applied) every request computes on its own
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            response = kwargs.get("response")
+            etag = response.headers.get("etag") if isinstance(response, Response) else None
+            if etag is None:
+                return await func(*args, **kwargs)
+            return await self.run((func.__name__, etag), lambda: func(*args, **kwargs))
+        return wrapper
+
+    def metrics(self) -> dict:
+        return {"in_flight": len(self._inflight), "computed": self.computed, "coalesced": self.coalesced}
+
+request_coalescer = RequestCoalescer()
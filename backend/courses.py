@@ -0,0 +1,168 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Course, normalize_course_name
+
+COURSE_CACHE_MAX_SIZE = int(os.getenv("COURSE_CACHE_MAX_SIZE", "10000"))
+
+@dataclass(frozen=True)
+class CourseInfo:
+    id: int
+    name: str
+    normalized_name: str
+    hole_pars: Optional[Tuple[int, ...]]
+
+    @classmethod
+    def from_row(cls, row) -> "CourseInfo":
+        return cls(
+            id=row.id,
+            name=row.name,
+            normalized_name=row.normalized_name,
+            hole_pars=tuple(row.hole_pars) if row.hole_pars is not None else None
+        )
+
+class CourseCache:
+    # Bounded LRU of course metadata keyed by normalized name. Courses are
+    # never renamed or deleted, so entries need no TTL. Only committed rows
+    # are cached: courses a transaction inserts are held in its session and
+    # cached when it commits, since a rollback frees their ids for reuse.
+
+    def __init__(self, max_size: int = COURSE_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CourseInfo]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, normalized_name: str) -> Optional[CourseInfo]:
+        course = self._entries.get(normalized_name)
+        if course is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(normalized_name)
+        self.hits += 1
+        return course
+
+    def set(self, course: CourseInfo) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[course.normalized_name] = course
+        self._entries.move_to_end(course.normalized_name)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+course_cache = CourseCache()
+
+COURSE_COLUMNS = (Course.id, Course.name, Course.normalized_name, Course.hole_pars)
+
+def _pending_courses(db: AsyncSession) -> dict:
+    # Courses inserted by this session's open transaction
+    pending = db.info.get("pending_courses")
+    if pending is None:
+        pending = db.info["pending_courses"] = {}
+        event.listen(db.sync_session, "after_commit", _cache_pending_courses, once=True)
+        event.listen(db.sync_session, "after_rollback", _drop_pending_courses, once=True)
+    return pending
+
+def _cache_pending_courses(session) -> None:
+    for course in session.info.pop("pending_courses", {}).values():
+        course_cache.set(course)
+
+def _drop_pending_courses(session) -> None:
+    session.info.pop("pending_courses", None)
+
+async def _load_courses(db: AsyncSession, keys: Iterable[str]) -> dict:
+    result = await db.execute(select(*COURSE_COLUMNS).where(Course.normalized_name.in_(list(keys))))
+    pending = db.info.get("pending_courses", {})
+    courses = {}
+    for row in result.all():
+        course = CourseInfo.from_row(row)
+        if course.normalized_name not in pending:
+            course_cache.set(course)
+        courses[course.normalized_name] = course
+    return courses
+
+async def find_course(db: AsyncSession, name: str) -> Optional[CourseInfo]:
+    key = normalize_course_name(name)
+    course = course_cache.get(key)
+    if course is None:
+        course = (await _load_courses(db, [key])).get(key)
+    return course
+
+async def assign_courses(db: AsyncSession, rounds: List[Mapping]) -> None:
+    # Point each new round at its catalog course, creating courses on first
+    # use, and replace its course_name with the course's display name. Costs
+    # nothing when every course is cached, otherwise one SELECT plus one
+    # INSERT ... RETURNING for courses not seen before.
+    keys = {}
+    for r in rounds:
+        keys.setdefault(normalize_course_name(r["course_name"]), r)
+
+    pending = db.info.get("pending_courses", {})
+    courses = {}
+    missing = []
+    for key in keys:
+        course = pending.get(key) or course_cache.get(key)
+        if course is None:
+            missing.append(key)
+        else:
+            courses[key] = course
+    if missing:
+        courses.update(await _load_courses(db, missing))
+
+    new_courses = [
+        {
+            "name": " ".join(keys[key]["course_name"].split()),
+            "normalized_name": key,
+            "hole_pars": [hole["par"] for hole in sorted(keys[key]["holes"], key=lambda hole: hole["hole_number"])],
+            "created_at": datetime.utcnow(),
+        }
+        for key in missing
+        if key not in courses
+    ]
+    if new_courses:
+        stmt = (
+            insert(Course).values(new_courses)
+            .on_conflict_do_nothing(index_elements=[Course.normalized_name])
+            .returning(*COURSE_COLUMNS)
+        )
+        pending = _pending_courses(db)
+        for row in (await db.execute(stmt)).all():
+            courses[row.normalized_name] = pending[row.normalized_name] = CourseInfo.from_row(row)
+        # Created concurrently by another request between our SELECT and INSERT
+        raced = [course["normalized_name"] for course in new_courses if course["normalized_name"] not in courses]
+        if raced:
+            courses.update(await _load_courses(db, raced))
+
+    for r in rounds:
+        course = courses[normalize_course_name(r["course_name"])]
+        r["course_id"] = course.id
+        r["course_name"] = course.name
+
+async def search_courses(db: AsyncSession, prefix: str, limit: int) -> List[CourseInfo]:
+    # Prefix match as a range scan on the normalized_name index
+    key = normalize_course_name(prefix)
+    query = select(*COURSE_COLUMNS).order_by(Course.normalized_name).limit(limit)
+    if key:
+        query = query.where(Course.normalized_name >= key, Course.normalized_name < key + "\U0010ffff")
+    result = await db.execute(query)
+    return [CourseInfo.from_row(row) for row in result.all()]
@@ -0,0 +1,39 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import UserDataVersion
+
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(select(UserDataVersion.version).where(UserDataVersion.user_id == user_id))
+    return result.scalar() or 0
+
+async def bump_data_versions(db: AsyncSession, *user_ids: int) -> None:
+    # Runs in the caller's transaction so the new version commits with the data
+    stmt = insert(UserDataVersion)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserDataVersion.user_id],
+            set_={"version": UserDataVersion.version + 1},
+        ),
+        [{"user_id": user_id, "version": 1} for user_id in user_ids],
+    )
+
+def make_etag(request: Request, user_id: int, version: int) -> str:
+    # Path and query are part of the tag: each page or fieldset is its own representation
+    representation = f"{request.url.path}?{request.url.query}"
+    digest = hashlib.sha1(representation.encode()).hexdigest()[:16]
+    return f'W/"{user_id}-{version}-{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
@@ -1,15 +1,54 @@
+import json
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import create_engine, event, text, Column, Integer, Float, String, DateTime, ForeignKey, JSON, Text, Index
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from datetime import datetime
 
 # Database URL - SQLite for local development
-DATABASE_URL = "sqlite+aiosqlite:///./golf_tracker.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./golf_tracker.db")
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "false").lower() in ("1", "true", "yes")
+
+# "production" applies the SQLite pragmas below on every new connection,
+# "default" leaves SQLite's own defaults (rollback journal, synchronous=FULL)
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "production")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+SQLITE_PRAGMAS = {
+    # WAL lets readers proceed while a writer commits
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    # NORMAL is durable across app crashes in WAL mode, only an OS crash can lose the last commits
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Negative cache_size is in KiB: 64 MiB page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": DATABASE_ECHO}
+    parsed = make_url(url)
+    # In-memory SQLite uses a single shared connection, there is no pool to size
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
 
 # Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+if engine.dialect.name == "sqlite" and DATABASE_PROFILE == "production":
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
 # Create async session
 async_session = sessionmaker(
@@ -31,6 +70,8 @@ class User(Base):
     full_name = Column(String(100), nullable=True)
     friend_code = Column(String(6), unique=True, index=True, nullable=False)
     hashed_password = Column(String(128), nullable=False)
+    # Denormalized friendship count; decides fan-out-on-write vs on-read for the feed
+    friend_count = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -41,6 +82,9 @@ class Scorecard(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Nullable only because SQLite can't ADD COLUMN ... NOT NULL; always set on insert
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=True)
+    # The course's display name, kept so listings don't need a join
     course_name = Column(String(100), nullable=False)
     date_played = Column(DateTime, nullable=False)
     holes = Column(JSON, nullable=False)  # Store hole data as JSON
@@ -49,11 +93,38 @@ class Scorecard(Base):
     total_score = Column(Integer, nullable=False)
     total_par = Column(Integer, nullable=False)
     relative_to_par = Column(Integer, nullable=False)
+    course_rating = Column(Float, nullable=True)
+    slope_rating = Column(Integer, nullable=True)
+    # Handicap score differential; NULL for rounds that don't count (see handicap.py)
+    differential = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     owner = relationship("User", back_populates="scorecards")
 
+    __table_args__ = (
+        # Serves per-user listing in (date_played, id) order, keyset cursors and stats rebuilds
+        Index("ix_scorecards_user_date_id", "user_id", "date_played", "id"),
+        Index("ix_scorecards_user_course_id", "user_id", "course_id"),
+        # Newest-first by id per user, for the feed's fan-out-on-read branch
+        Index("ix_scorecards_user_id", "user_id", "id"),
+    )
+
+def normalize_course_name(name: str) -> str:
+    # Case- and whitespace-insensitive key: "Pebble Beach" == " pebble  beach "
+    return " ".join(name.split()).casefold()
+
+class Course(Base):
+    __tablename__ = "courses"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    # Unique index doubles as the prefix-search index for autocomplete
+    normalized_name = Column(String(100), unique=True, index=True, nullable=False)
+    # Par of holes 1..n as first recorded for the course
+    hole_pars = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class Friendship(Base):
     __tablename__ = "friendships"
 
@@ -62,12 +133,313 @@ class Friendship(Base):
     friend_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("ux_friendships_user_friend", "user_id", "friend_id", unique=True),
+    )
+
+# Materialized friend timelines: one row per (reader, friend's scorecard),
+# written when the scorecard is created. Feed pages are a keyset range on the
+# primary key.
+class FeedEntry(Base):
+    __tablename__ = "feed_entries"
+
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    scorecard_id = Column(Integer, ForeignKey("scorecards.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+# One row per hole, written alongside Scorecard.holes so hole-level questions
+# are answered by indexed GROUP BY queries instead of decoding JSON blobs
+class ScorecardHole(Base):
+    __tablename__ = "hole_scores"
+
+    id = Column(Integer, primary_key=True)
+    scorecard_id = Column(Integer, ForeignKey("scorecards.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    hole_number = Column(Integer, nullable=False)
+    par = Column(Integer, nullable=False)
+    score = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_hole_scores_scorecard_hole", "scorecard_id", "hole_number", "par", "score"),
+        # Covering index for per-user, per-hole aggregates across all rounds
+        Index("ix_hole_scores_user_hole", "user_id", "hole_number", "par", "score"),
+    )
+
+# Aggregates maintained incrementally by stats.py on every scorecard write
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_rounds = Column(Integer, default=0, nullable=False)
+    sum_relative_to_par = Column(Integer, default=0, nullable=False)
+    best_scorecard_id = Column(Integer, nullable=True)
+    best_course_name = Column(String(100), nullable=True)
+    best_date_played = Column(DateTime, nullable=True)
+    best_relative_to_par = Column(Integer, nullable=True)
+    best_total_score = Column(Integer, nullable=True)
+    worst_scorecard_id = Column(Integer, nullable=True)
+    worst_course_name = Column(String(100), nullable=True)
+    worst_date_played = Column(DateTime, nullable=True)
+    worst_relative_to_par = Column(Integer, nullable=True)
+    worst_total_score = Column(Integer, nullable=True)
+
+class CourseStats(Base):
+    __tablename__ = "course_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    rounds_played = Column(Integer, default=0, nullable=False)
+
+# Current handicap index plus the sliding window of the latest differentials
+# it was computed from, so a new round never re-reads the user's history
+class UserHandicap(Base):
+    __tablename__ = "user_handicaps"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    handicap_index = Column(Float, nullable=True)
+    # [[date_played isoformat, scorecard_id, differential], ...] oldest first
+    differentials = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# Token ids revoked before they expire: logged-out access tokens and refresh
+# tokens already exchanged. Workers poll new rows by id; expired rows are pruned.
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    # Workers sync by id, so ids must never be reused once the newest rows
+    # are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# Friend codes are a keyed permutation of this counter (see friend_codes.py),
+# so two allocations can never produce the same code. Single row, id 1.
+class FriendCodeSequence(Base):
+    __tablename__ = "friend_code_sequence"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String(64), nullable=False)
+    next_value = Column(Integer, nullable=False)
+
+# Counter values whose code was already handed out at random before the
+# permutation existed; the allocator skips them
+class ReservedFriendCode(Base):
+    __tablename__ = "reserved_friend_codes"
+
+    value = Column(Integer, primary_key=True)
+
+# Durable background work, run by jobs.JobQueue. run_at is when the job can
+# next be claimed: its due time while pending, its lease expiry while running.
+# Finished jobs are deleted; failed ones stay for inspection.
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(10), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
 # Database dependency
 async def get_db():
     async with async_session() as session:
         yield session
 
+# Bumped on every write that changes what a user's read endpoints return;
+# ETags are derived from it so conditional GETs cost one primary-key lookup
+class UserDataVersion(Base):
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# Data migrations for databases created by older versions, applied in order
+# once each. Each takes a sync connection inside init_db's transaction.
+MIGRATIONS = []
+
+def migration(version: int, name: str):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+@migration(1, "dedupe_friendships")
+def dedupe_friendships(conn):
+    # Concurrent add_friend calls could insert the same pair twice before
+    # ux_friendships_user_friend existed; keep the oldest row of each pair
+    conn.execute(text(
+        "DELETE FROM friendships WHERE id NOT IN "
+        "(SELECT MIN(id) FROM friendships GROUP BY user_id, friend_id)"
+    ))
+
+HOLE_SCORES_FROM_JSON = (
+    "INSERT INTO hole_scores (scorecard_id, user_id, hole_number, par, score) "
+    "SELECT s.id, s.user_id, json_extract(h.value, '$.hole_number'), "
+    "json_extract(h.value, '$.par'), json_extract(h.value, '$.score') "
+    "FROM scorecards s, json_each(s.holes) h"
+)
+
+def rebuild_hole_scores(conn):
+    # Recreate every hole_scores row from the scorecards' holes JSON
+    conn.execute(text("DELETE FROM hole_scores"))
+    conn.execute(text(HOLE_SCORES_FROM_JSON))
+
+@migration(2, "backfill_hole_scores")
+def backfill_hole_scores(conn):
+    conn.execute(text(
+        HOLE_SCORES_FROM_JSON
+        + " WHERE NOT EXISTS (SELECT 1 FROM hole_scores hs WHERE hs.scorecard_id = s.id)"
+    ))
+
+@migration(3, "add_scorecard_ratings")
+def add_scorecard_ratings(conn):
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(scorecards)"))}
+    for name, type_ in (("course_rating", "FLOAT"), ("slope_rating", "INTEGER"), ("differential", "FLOAT")):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE scorecards ADD COLUMN {name} {type_}"))
+    # Older rounds have no rating, so par stands in for it at the standard slope
+    conn.execute(text(
+        "UPDATE scorecards SET differential = total_score - total_par "
+        "WHERE differential IS NULL AND json_array_length(holes) = 18"
+    ))
+
+@migration(4, "link_scorecards_to_courses")
+def link_scorecards_to_courses(conn):
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(scorecards)"))}
+    if "course_id" not in columns:
+        conn.execute(text("ALTER TABLE scorecards ADD COLUMN course_id INTEGER REFERENCES courses(id)"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_scorecards_user_course"))
+
+    # One course per normalized name, named and laid out after its first round
+    rows = conn.execute(text(
+        "SELECT course_name, holes FROM scorecards WHERE course_id IS NULL ORDER BY id"
+    )).all()
+    courses = {}
+    for course_name, holes in rows:
+        key = normalize_course_name(course_name)
+        if key not in courses:
+            holes = sorted(json.loads(holes), key=lambda hole: hole["hole_number"])
+            courses[key] = (" ".join(course_name.split()), [hole["par"] for hole in holes])
+    for key, (name, hole_pars) in courses.items():
+        conn.execute(
+            text(
+                "INSERT INTO courses (name, normalized_name, hole_pars, created_at) "
+                "VALUES (:name, :key, :hole_pars, :now) ON CONFLICT (normalized_name) DO NOTHING"
+            ),
+            {"name": name, "key": key, "hole_pars": json.dumps(hole_pars), "now": datetime.utcnow()},
+        )
+    course_ids = dict(conn.execute(text("SELECT normalized_name, id FROM courses")).all())
+    names = dict(conn.execute(text("SELECT id, name FROM courses")).all())
+    for course_name in {course_name for course_name, _ in rows}:
+        course_id = course_ids[normalize_course_name(course_name)]
+        params = {"course_id": course_id, "name": names[course_id], "raw": course_name}
+        conn.execute(text(
+            "UPDATE scorecards SET course_id = :course_id, course_name = :name "
+            "WHERE course_name = :raw AND course_id IS NULL"
+        ), params)
+        for prefix in ("best", "worst"):
+            conn.execute(text(
+                f"UPDATE user_stats SET {prefix}_course_name = :name WHERE {prefix}_course_name = :raw"
+            ), params)
+
+    # course_stats is now keyed by course_id; regroup it from the scorecards
+    conn.execute(text("DROP TABLE IF EXISTS course_stats"))
+    CourseStats.__table__.create(conn)
+    conn.execute(text(
+        "INSERT INTO course_stats (user_id, course_id, rounds_played) "
+        "SELECT user_id, course_id, count(*) FROM scorecards GROUP BY user_id, course_id"
+    ))
+
+@migration(5, "fill_friend_counts_and_feeds")
+def fill_friend_counts_and_feeds(conn):
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
+    if "friend_count" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN friend_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "UPDATE users SET friend_count = "
+        "(SELECT count(*) FROM friendships WHERE friendships.user_id = users.id)"
+    ))
+    conn.execute(text(
+        "INSERT OR IGNORE INTO feed_entries (owner_id, scorecard_id) "
+        "SELECT f.user_id, s.id FROM friendships f JOIN scorecards s ON s.user_id = f.friend_id"
+    ))
+
+@migration(6, "reserve_legacy_friend_codes")
+def reserve_legacy_friend_codes(conn):
+    # Imported here: friend_codes imports this module
+    from friend_codes import code_to_value, new_key
+
+    key = conn.execute(text("SELECT key FROM friend_code_sequence WHERE id = 1")).scalar()
+    if key is None:
+        key = new_key()
+        conn.execute(text(
+            "INSERT INTO friend_code_sequence (id, key, next_value) VALUES (1, :key, 0)"
+        ), {"key": key})
+    key_bytes = bytes.fromhex(key)
+    codes = conn.execute(text("SELECT friend_code FROM users")).scalars()
+    values = [value for value in (code_to_value(code, key_bytes) for code in codes) if value is not None]
+    if values:
+        conn.execute(
+            text("INSERT OR IGNORE INTO reserved_friend_codes (value) VALUES (:value)"),
+            [{"value": value} for value in values],
+        )
+
+@migration(7, "autoincrement_revoked_tokens")
+def autoincrement_revoked_tokens(conn):
+    # SQLite can only add AUTOINCREMENT by rebuilding the table
+    sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'revoked_tokens'"
+    )).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return
+    conn.execute(text("ALTER TABLE revoked_tokens RENAME TO revoked_tokens_old"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_revoked_tokens_expires_at"))
+    RevokedToken.__table__.create(conn)
+    conn.execute(text(
+        "INSERT INTO revoked_tokens (id, jti, user_id, expires_at, revoked_at) "
+        "SELECT id, jti, user_id, expires_at, revoked_at FROM revoked_tokens_old"
+    ))
+    conn.execute(text("DROP TABLE revoked_tokens_old"))
+
+def run_migrations(conn):
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    for version, name, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        func(conn)
+        conn.execute(SchemaMigration.__table__.insert().values(
+            version=version, name=name, applied_at=datetime.utcnow()
+        ))
+
+def create_missing_indexes(conn):
+    # create_all skips tables that already exist, so indexes added to a model
+    # later have to be created separately
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
 # Initialize database
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+        await conn.run_sync(create_missing_indexes)
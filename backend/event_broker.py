@@ -0,0 +1,42 @@
+"""Minimal event broker for running several uvicorn workers with EVENT_BUS_BACKEND=broker.
+
+Every JSON line a connected worker sends is relayed to all connected workers,
+the sender included. It keeps no history; it stands in for Redis pub/sub or a
+similar broker in local and single-host deployments.
+
+    python event_broker.py            # listens on EVENT_BROKER_URL
+"""
+import asyncio
+import logging
+from typing import Set
+from urllib.parse import urlparse
+
+from events import EVENT_BROKER_URL
+
+logger = logging.getLogger("event_broker")
+
+clients: Set[asyncio.StreamWriter] = set()
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    clients.add(writer)
+    try:
+        while line := await reader.readline():
+            for client in list(clients):
+                client.write(line)
+            await asyncio.gather(*(client.drain() for client in list(clients)), return_exceptions=True)
+    except OSError:
+        pass
+    finally:
+        clients.discard(writer)
+        writer.close()
+
+async def serve(url: str = EVENT_BROKER_URL) -> None:
+    parsed = urlparse(url)
+    server = await asyncio.start_server(handle_client, parsed.hostname, parsed.port)
+    logger.info("Event broker listening on %s:%s", parsed.hostname, parsed.port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# "local" delivers within this process only; "broker" relays every event
+# through event_broker.py so all uvicorn workers see it
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "local")
+EVENT_BROKER_URL = os.getenv("EVENT_BROKER_URL", "tcp://127.0.0.1:8765")
+# Events buffered per subscriber; a client that falls further behind loses events
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+# Events waiting to go out to the broker; while it reads slower than this
+# worker publishes, the overflow is dropped instead of buffered
+EVENT_BROKER_OUTBOX_SIZE = int(os.getenv("EVENT_BROKER_OUTBOX_SIZE", "1000"))
+
+# Channels: "user:<id>" for events addressed to one user, "rounds:<id>" for
+# rounds posted by a user, which their friends subscribe to
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def rounds_channel(user_id: int) -> str:
+    return f"rounds:{user_id}"
+
+# Queued after a subscription's last event when the bus ends its streams
+_END = object()
+
+class Subscription:
+    def __init__(self, bus: "LocalEventBus", channels: Iterable[str]):
+        self.bus = bus
+        self.channels: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.ended = False
+        for channel in channels:
+            self.add(channel)
+        if bus.ending:
+            self.end()
+
+    def add(self, channel: str) -> None:
+        if channel not in self.channels:
+            self.channels.add(channel)
+            self.bus._subscribers.setdefault(channel, set()).add(self)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        # Next event, or None if nothing arrived within timeout or the
+        # subscription has ended; streams stop once ended is set
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return None if event is _END else event
+
+    def end(self) -> None:
+        # Wake the reader with a marker, displacing the oldest event if full
+        self.ended = True
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_END)
+
+    def close(self) -> None:
+        for channel in self.channels:
+            subscribers = self.bus._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self.bus._subscribers[channel]
+        self.channels.clear()
+
+class LocalEventBus:
+    # In-process pub/sub over asyncio queues. publish never blocks: a full
+    # subscriber queue drops the event rather than stalling the publisher.
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.ending = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        self.ending = False
+
+    async def close(self) -> None:
+        self.end_streams()
+
+    def end_streams(self) -> None:
+        # Shutting down: every open subscription, and any opened from now
+        # on, ends so the streams reading them can finish
+        self.ending = True
+        for subscription in {s for subs in self._subscribers.values() for s in subs}:
+            subscription.end()
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        return Subscription(self, channels)
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.published += 1
+        self._dispatch(channel, event)
+
+    def _dispatch(self, channel: str, event: dict) -> None:
+        for subscription in self._subscribers.get(channel, ()):
+            try:
+                subscription.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def metrics(self) -> dict:
+        return {
+            "backend": "local",
+            "channels": len(self._subscribers),
+            "subscriptions": len({s for subs in self._subscribers.values() for s in subs}),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+class BrokerEventBus(LocalEventBus):
+    # Publishes go to the broker as JSON lines and come back to every
+    # connected worker, this one included, which then dispatches locally.
+    # publish only queues the line; a sender task writes it and waits for
+    # the socket to drain, so a slow broker fills the bounded outbox rather
+    # than the transport buffer. Events published while the broker is
+    # unreachable are dropped; the connection is retried in the background.
+
+    def __init__(self, url: str = EVENT_BROKER_URL, reconnect_seconds: float = 1.0,
+                 outbox_size: int = EVENT_BROKER_OUTBOX_SIZE):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port
+        self.reconnect_seconds = reconnect_seconds
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_size)
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        await super().close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.published += 1
+        if self._writer is None:
+            self.dropped += 1
+            return
+        try:
+            self._outbox.put_nowait(json.dumps({"channel": channel, "event": event}, default=str).encode() + b"\n")
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _send(self, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                writer.write(await self._outbox.get())
+                await writer.drain()
+        except OSError as e:
+            # The read loop sees the connection close and reconnects
+            logger.warning("Event broker write failed: %s", e)
+            writer.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logger.warning("Event broker %s:%s unreachable: %s", self.host, self.port, e)
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            self._writer = writer
+            sender = asyncio.create_task(self._send(writer))
+            try:
+                while line := await reader.readline():
+                    message = json.loads(line)
+                    self._dispatch(message["channel"], message["event"])
+            except (OSError, ValueError) as e:
+                logger.warning("Event broker connection lost: %s", e)
+            finally:
+                self._writer = None
+                sender.cancel()
+                writer.close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def metrics(self) -> dict:
+        return {
+            **super().metrics(),
+            "backend": "broker",
+            "connected": self._writer is not None,
+            "outbox": self._outbox.qsize(),
+        }
+
+def create_event_bus(backend: str = EVENT_BUS_BACKEND) -> LocalEventBus:
+    if backend == "local":
+        return LocalEventBus()
+    if backend == "broker":
+        return BrokerEventBus()
+    raise ValueError(f"Unknown EVENT_BUS_BACKEND: {backend}")
+
+def end_streams_on_server_exit(bus: LocalEventBus) -> None:
+    # uvicorn sends the lifespan shutdown only after every connection has
+    # closed, which an open event stream never does, so graceful shutdown
+    # would wait on connected clients forever. Called from the lifespan,
+    # once uvicorn has installed its exit signal handlers: chain onto them
+    # so the streams end as soon as the server is told to exit.
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous) or getattr(previous, "ends_event_streams", False):
+            continue
+
+        def handle_exit(signum, frame, previous=previous) -> None:
+            loop.call_soon_threadsafe(bus.end_streams)
+            previous(signum, frame)
+
+        handle_exit.ends_event_streams = True
+        signal.signal(sig, handle_exit)
+
+event_bus = create_event_bus()
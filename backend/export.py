@@ -0,0 +1,105 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from sqlalchemy import Text, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import fast_json
+from database import async_session, Scorecard, ScorecardHole
+from holes import MAX_HOLE_NUMBER
+
+# Rows fetched from SQLite and formatted per chunk; bounds export memory
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Flat scorecard columns, followed in every format by hole_<n>_par and
+# hole_<n>_score for n = 1..the user's highest hole number. The CSV layout is
+# the one POST /scorecards/bulk reads back.
+EXPORT_COLUMNS = (
+    Scorecard.id,
+    Scorecard.course_id,
+    Scorecard.course_name,
+    Scorecard.date_played,
+    Scorecard.weather,
+    Scorecard.notes,
+    Scorecard.total_score,
+    Scorecard.total_par,
+    Scorecard.relative_to_par,
+    Scorecard.course_rating,
+    Scorecard.slope_rating,
+    Scorecard.differential,
+    Scorecard.created_at,
+)
+
+def export_query(user_id: int):
+    # Holes stay raw JSON text so SQLAlchemy doesn't decode them into dicts first
+    return (
+        select(*EXPORT_COLUMNS, type_coerce(Scorecard.holes, Text).label("holes"))
+        .where(Scorecard.user_id == user_id)
+        .order_by(Scorecard.date_played.desc(), Scorecard.id.desc())
+    )
+
+async def max_hole_number(db: AsyncSession, user_id: int) -> int:
+    # Read off ix_hole_scores_user_hole, so the column set is known up front
+    # without a pass over the rounds
+    result = await db.execute(
+        select(func.max(ScorecardHole.hole_number)).where(ScorecardHole.user_id == user_id)
+    )
+    return min(result.scalar() or 0, MAX_HOLE_NUMBER)
+
+def export_column_names(hole_count: int) -> List[str]:
+    names = [column.key for column in EXPORT_COLUMNS]
+    for n in range(1, hole_count + 1):
+        names += [f"hole_{n}_par", f"hole_{n}_score"]
+    return names
+
+def flatten_row(row, hole_count: int) -> list:
+    *values, holes = row
+    hole_values = [None] * (2 * hole_count)
+    for hole in fast_json.loads(holes):
+        # Rounds saved before hole numbers were validated may hold ones
+        # outside 1..hole_count or repeats; only the first valid one of each
+        # number gets a column
+        n = hole["hole_number"]
+        if not 1 <= n <= hole_count or hole_values[2 * n - 1] is not None:
+            continue
+        hole_values[2 * n - 2] = hole["par"]
+        hole_values[2 * n - 1] = hole["score"]
+    return values + hole_values
+
+async def stream_batches(user_id: int) -> AsyncIterator[list]:
+    # Own session: the request-scoped one may be closed before the body is sent
+    async with async_session() as db:
+        result = await db.stream(export_query(user_id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+async def stream_csv(user_id: int, hole_count: int) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export_column_names(hole_count))
+    yield buffer.getvalue()
+    async for rows in stream_batches(user_id):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in flatten_row(row, hole_count)
+            ])
+        yield buffer.getvalue()
+
+async def stream_columnar(user_id: int, hole_count: int) -> AsyncIterator[bytes]:
+    # Parquet-style layout as NDJSON: a schema line, then one row group per
+    # batch holding an array of values for each column
+    names = export_column_names(hole_count)
+    types = [column.type.python_type.__name__ for column in EXPORT_COLUMNS] + ["int"] * (2 * hole_count)
+    yield fast_json.dumps({"schema": [{"name": name, "type": type_} for name, type_ in zip(names, types)]}) + b"\n"
+    async for rows in stream_batches(user_id):
+        columns = [[] for _ in names]
+        for row in rows:
+            for column, value in zip(columns, flatten_row(row, hole_count)):
+                column.append(value)
+        yield fast_json.dumps({"row_count": len(rows), "columns": dict(zip(names, columns))}) + b"\n"
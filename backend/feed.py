@@ -0,0 +1,119 @@
+import os
+from typing import List, Optional
+
+from sqlalchemy import select, update, union, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import User, Scorecard, Friendship, FeedEntry
+from jobs import JobQueue, job_queue
+
+# Authors with more friends than this are not fanned out on write; their
+# friends pull those rounds when reading the feed instead
+FEED_FANOUT_MAX_FRIENDS = int(os.getenv("FEED_FANOUT_MAX_FRIENDS", "1000"))
+# Latest rounds copied into each other's timelines when two users become friends
+FEED_BACKFILL_ROUNDS = int(os.getenv("FEED_BACKFILL_ROUNDS", "20"))
+
+FEED_COLUMNS = (
+    Scorecard.id,
+    Scorecard.user_id,
+    User.username,
+    User.full_name,
+    Scorecard.course_id,
+    Scorecard.course_name,
+    Scorecard.date_played,
+    Scorecard.total_score,
+    Scorecard.total_par,
+    Scorecard.relative_to_par,
+    Scorecard.created_at,
+)
+
+async def queue_fan_out(db: AsyncSession, author_id: int, scorecard_ids: List[int]) -> None:
+    # Fan-out is the one write per round that grows with the author's friend
+    # count, so it runs as a job after the round commits. Friends see the
+    # round in their feed once it has run.
+    if scorecard_ids:
+        await job_queue.enqueue(db, "feed_fanout", {"author_id": author_id, "scorecard_ids": scorecard_ids})
+
+async def fan_out_scorecards(db: AsyncSession, author_id: int, scorecard_ids: List[int]) -> None:
+    # Push new rounds into every friend's timeline with one INSERT ... SELECT,
+    # unless the author is over FEED_FANOUT_MAX_FRIENDS. Friendships are
+    # bidirectional, so the author's own rows list the readers.
+    author_friends = select(User.friend_count).where(User.id == author_id).scalar_subquery()
+    await db.execute(
+        insert(FeedEntry)
+        .from_select(
+            ["owner_id", "scorecard_id"],
+            select(Friendship.friend_id, Scorecard.id)
+            .join(Scorecard, Scorecard.user_id == Friendship.user_id)
+            .where(
+                Friendship.user_id == author_id,
+                Scorecard.id.in_(scorecard_ids),
+                author_friends <= FEED_FANOUT_MAX_FRIENDS,
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+
+async def record_friendship(db: AsyncSession, user_id: int, friend_id: int) -> None:
+    # Bookkeeping for a new bidirectional friendship: degree counts now, since
+    # fan-out depends on them, and the timeline backfill as a background job
+    await db.execute(
+        update(User)
+        .where(User.id.in_([user_id, friend_id]))
+        .values(friend_count=User.friend_count + 1)
+    )
+    await job_queue.enqueue(db, "feed_backfill", {"user_id": user_id, "friend_id": friend_id})
+
+async def backfill_friendship_feeds(db: AsyncSession, user_id: int, friend_id: int) -> None:
+    # Each side's latest rounds copied into the other's timeline. Rounds
+    # posted since the friendship were already fanned out; conflicts skip them.
+    for owner_id, author_id in ((user_id, friend_id), (friend_id, user_id)):
+        await db.execute(
+            insert(FeedEntry)
+            .from_select(
+                ["owner_id", "scorecard_id"],
+                select(literal(owner_id), Scorecard.id)
+                .where(Scorecard.user_id == author_id)
+                .order_by(Scorecard.id.desc())
+                .limit(FEED_BACKFILL_ROUNDS),
+            )
+            .on_conflict_do_nothing()
+        )
+
+def register_jobs(queue: JobQueue) -> None:
+    queue.handler("feed_fanout")(fan_out_scorecards)
+    queue.handler("feed_backfill")(backfill_friendship_feeds)
+
+async def read_feed(db: AsyncSession, user_id: int, before_id: Optional[int], limit: int) -> list:
+    # Friends' rounds, newest first, as one statement: the materialized
+    # timeline merged with rounds pulled from high-degree friends. Each branch
+    # is limited before the merge so a page never reads more than it needs.
+    timeline = (
+        select(FeedEntry.scorecard_id.label("scorecard_id"))
+        .where(FeedEntry.owner_id == user_id)
+        .order_by(FeedEntry.scorecard_id.desc())
+        .limit(limit)
+    )
+    pulled = (
+        select(Scorecard.id.label("scorecard_id"))
+        .join(Friendship, Friendship.friend_id == Scorecard.user_id)
+        .join(User, User.id == Friendship.friend_id)
+        .where(Friendship.user_id == user_id, User.friend_count > FEED_FANOUT_MAX_FRIENDS)
+        .order_by(Scorecard.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        timeline = timeline.where(FeedEntry.scorecard_id < before_id)
+        pulled = pulled.where(Scorecard.id < before_id)
+    timeline, pulled = timeline.subquery(), pulled.subquery()
+    feed_ids = union(select(timeline.c.scorecard_id), select(pulled.c.scorecard_id)).subquery()
+
+    result = await db.execute(
+        select(*FEED_COLUMNS)
+        .join(feed_ids, feed_ids.c.scorecard_id == Scorecard.id)
+        .join(User, User.id == Scorecard.user_id)
+        .order_by(Scorecard.id.desc())
+        .limit(limit)
+    )
+    return result.all()
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import string
+from array import array
+from functools import lru_cache
+from typing import List, Optional, Set
+
+from sqlalchemy import select, update
+
+from database import async_session, FriendCodeSequence, ReservedFriendCode
+
+FRIEND_CODE_ALPHABET = string.ascii_uppercase + string.digits
+FRIEND_CODE_LENGTH = 6
+FRIEND_CODE_SPACE = len(FRIEND_CODE_ALPHABET) ** FRIEND_CODE_LENGTH
+# Counter values each worker reserves per round trip
+FRIEND_CODE_BLOCK_SIZE = int(os.getenv("FRIEND_CODE_BLOCK_SIZE", "100"))
+
+FEISTEL_ROUNDS = 4
+HALF_BITS = 16
+HALF_MASK = (1 << HALF_BITS) - 1
+
+def new_key() -> str:
+    return secrets.token_hex(16)
+
+@lru_cache(maxsize=4)
+def _round_tables(key: bytes) -> List[array]:
+    # Each round function maps a 16-bit half to 16 keyed-hash bits; tabulating
+    # all 65536 inputs once per key turns every round into a list lookup
+    return [
+        array("H", (
+            int.from_bytes(
+                hashlib.blake2b(bytes((i,)) + half.to_bytes(2, "big"), key=key, digest_size=2).digest(), "big"
+            )
+            for half in range(1 << HALF_BITS)
+        ))
+        for i in range(FEISTEL_ROUNDS)
+    ]
+
+def permute(value: int, key: bytes) -> int:
+    # Balanced Feistel network over 32 bits, cycle-walked down to
+    # FRIEND_CODE_SPACE (about half of 2^32), so it is a bijection on
+    # [0, FRIEND_CODE_SPACE) and consecutive counters give unrelated codes
+    tables = _round_tables(key)
+    while True:
+        left, right = value >> HALF_BITS, value & HALF_MASK
+        for table in tables:
+            left, right = right, left ^ table[right]
+        value = (left << HALF_BITS) | right
+        if value < FRIEND_CODE_SPACE:
+            return value
+
+def unpermute(value: int, key: bytes) -> int:
+    tables = _round_tables(key)
+    while True:
+        left, right = value >> HALF_BITS, value & HALF_MASK
+        for table in reversed(tables):
+            left, right = right ^ table[left], left
+        value = (left << HALF_BITS) | right
+        if value < FRIEND_CODE_SPACE:
+            return value
+
+def value_to_code(value: int, key: bytes) -> str:
+    n = permute(value, key)
+    chars = []
+    for _ in range(FRIEND_CODE_LENGTH):
+        n, digit = divmod(n, len(FRIEND_CODE_ALPHABET))
+        chars.append(FRIEND_CODE_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+def code_to_value(code: str, key: bytes) -> Optional[int]:
+    # Counter value that produces code, or None if code is outside the alphabet
+    if len(code) != FRIEND_CODE_LENGTH:
+        return None
+    n = 0
+    for char in code:
+        digit = FRIEND_CODE_ALPHABET.find(char)
+        if digit < 0:
+            return None
+        n = n * len(FRIEND_CODE_ALPHABET) + digit
+    return unpermute(n, key)
+
+class FriendCodeAllocator:
+    # Hands out codes from a block of counter values reserved with a single
+    # UPDATE ... RETURNING. Workers get disjoint blocks and the permutation
+    # is a bijection, so a code is never handed out twice and registration
+    # never looks one up. Values left in a block when a worker stops are
+    # simply skipped.
+
+    def __init__(self, block_size: int = FRIEND_CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._key: Optional[bytes] = None
+        self._next = 0
+        self._end = 0
+        self._reserved: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self.allocated = 0
+        self.blocks = 0
+
+    async def allocate(self) -> str:
+        async with self._lock:
+            while True:
+                if self._next >= self._end:
+                    await self._reserve_block()
+                value = self._next
+                self._next += 1
+                if value not in self._reserved:
+                    self.allocated += 1
+                    return value_to_code(value, self._key)
+
+    async def _reserve_block(self) -> None:
+        # Committed on its own so the block stays this worker's even if the
+        # registration that needed it rolls back
+        async with async_session() as db:
+            result = await db.execute(
+                update(FriendCodeSequence)
+                .where(FriendCodeSequence.id == 1)
+                .values(next_value=FriendCodeSequence.next_value + self.block_size)
+                .returning(FriendCodeSequence.key, FriendCodeSequence.next_value)
+            )
+            key, end = result.one()
+            start = end - self.block_size
+            reserved = await db.execute(
+                select(ReservedFriendCode.value)
+                .where(ReservedFriendCode.value >= start, ReservedFriendCode.value < end)
+            )
+            self._reserved = set(reserved.scalars())
+            await db.commit()
+        if start >= FRIEND_CODE_SPACE:
+            raise RuntimeError("Friend code space exhausted")
+        self._key = bytes.fromhex(key)
+        # Tabulating the rounds takes about half a second; keep it off the loop
+        await asyncio.to_thread(_round_tables, self._key)
+        self._next, self._end = start, min(end, FRIEND_CODE_SPACE)
+        self.blocks += 1
+
+    def metrics(self) -> dict:
+        return {
+            "allocated": self.allocated,
+            "blocks": self.blocks,
+            "remaining_in_block": self._end - self._next,
+        }
+
+friend_code_allocator = FriendCodeAllocator()
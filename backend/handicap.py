@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import List, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Scorecard, UserHandicap
+
+# World Handicap System-style index: the average of the best differentials
+# among the latest DIFFERENTIAL_WINDOW rounds
+DIFFERENTIAL_WINDOW = 20
+STANDARD_SLOPE = 113
+MAX_HANDICAP_INDEX = 54.0
+HOLES_PER_ROUND = 18
+
+# Rounds in the window -> (how many of the lowest differentials count, adjustment)
+LOWEST_DIFFERENTIALS = {
+    3: (1, -2.0), 4: (1, -1.0), 5: (1, 0.0), 6: (2, -1.0), 7: (2, 0.0), 8: (2, 0.0),
+    9: (3, 0.0), 10: (3, 0.0), 11: (3, 0.0), 12: (4, 0.0), 13: (4, 0.0), 14: (4, 0.0),
+    15: (5, 0.0), 16: (5, 0.0), 17: (6, 0.0), 18: (6, 0.0), 19: (7, 0.0), 20: (8, 0.0),
+}
+
+def score_differential(
+    total_score: int,
+    total_par: int,
+    holes_played: int,
+    course_rating: Optional[float] = None,
+    slope_rating: Optional[int] = None,
+) -> Optional[float]:
+    # (113 / slope) * (score - rating). Par stands in for a missing course
+    # rating and 113 for a missing slope. Only full 18-hole rounds count.
+    if holes_played != HOLES_PER_ROUND:
+        return None
+    rating = course_rating if course_rating is not None else total_par
+    slope = slope_rating or STANDARD_SLOPE
+    return round(STANDARD_SLOPE / slope * (total_score - rating), 1)
+
+def handicap_index(differentials: List[float]) -> Optional[float]:
+    # Index from the latest differentials (at most DIFFERENTIAL_WINDOW of them);
+    # None until there are enough rounds to establish one
+    count = min(len(differentials), DIFFERENTIAL_WINDOW)
+    if count not in LOWEST_DIFFERENTIALS:
+        return None
+    lowest, adjustment = LOWEST_DIFFERENTIALS[count]
+    best = sorted(differentials[-count:])[:lowest]
+    return min(round(sum(best) / lowest + adjustment, 1), MAX_HANDICAP_INDEX)
+
+def _window_entry(date_played: datetime, scorecard_id: int, differential: float) -> list:
+    return [date_played.isoformat(), scorecard_id, differential]
+
+async def _save_window(db: AsyncSession, user_id: int, window: List[list]) -> None:
+    values = {
+        "handicap_index": handicap_index([entry[2] for entry in window]),
+        "differentials": window,
+        "updated_at": datetime.utcnow(),
+    }
+    stmt = insert(UserHandicap).values(user_id=user_id, **values)
+    await db.execute(stmt.on_conflict_do_update(index_elements=[UserHandicap.user_id], set_=values))
+
+async def record_differentials(db: AsyncSession, user_id: int, rounds: List[Mapping]) -> None:
+    # Slide newly inserted rounds into the user's stored window. Rounds older
+    # than everything in a full window can't change the index and are skipped
+    # without a write. Each round maps id, date_played and differential.
+    entries = [
+        _window_entry(r["date_played"], r["id"], r["differential"])
+        for r in rounds
+        if r["differential"] is not None
+    ]
+    if not entries:
+        return
+    result = await db.execute(select(UserHandicap.differentials).where(UserHandicap.user_id == user_id))
+    window = result.scalar_one_or_none() or []
+    if len(window) >= DIFFERENTIAL_WINDOW and all(entry[:2] < window[0][:2] for entry in entries):
+        return
+    window = sorted(window + entries, key=lambda entry: (entry[0], entry[1]))[-DIFFERENTIAL_WINDOW:]
+    await _save_window(db, user_id, window)
+
+async def rebuild_user_handicap(db: AsyncSession, user_id: int) -> None:
+    # Reload the window from the latest rounds; update and delete paths call
+    # this, since a round leaving the window needs the one before it
+    result = await db.execute(
+        select(Scorecard.date_played, Scorecard.id, Scorecard.differential)
+        .where(Scorecard.user_id == user_id, Scorecard.differential.is_not(None))
+        .order_by(Scorecard.date_played.desc(), Scorecard.id.desc())
+        .limit(DIFFERENTIAL_WINDOW)
+    )
+    window = [_window_entry(*row) for row in reversed(result.all())]
+    await _save_window(db, user_id, window)
+
+async def backfill_missing_handicaps(db: AsyncSession) -> int:
+    # Users with rounds from before handicaps were tracked have no window yet
+    result = await db.execute(
+        select(Scorecard.user_id)
+        .where(~select(UserHandicap.user_id).where(UserHandicap.user_id == Scorecard.user_id).exists())
+        .distinct()
+    )
+    user_ids = result.scalars().all()
+    for user_id in user_ids:
+        await rebuild_user_handicap(db, user_id)
+    return len(user_ids)
+
+async def get_handicap(db: AsyncSession, user_id: int) -> dict:
+    result = await db.execute(
+        select(UserHandicap.handicap_index, UserHandicap.differentials).where(UserHandicap.user_id == user_id)
+    )
+    row = result.one_or_none()
+    window = row.differentials if row else []
+    counted, _ = LOWEST_DIFFERENTIALS.get(len(window), (0, 0.0))
+    used = {entry[1] for entry in sorted(window, key=lambda entry: entry[2])[:counted]}
+    return {
+        "handicap_index": row.handicap_index if row else None,
+        "differentials": [
+            {
+                "scorecard_id": scorecard_id,
+                "date_played": date_played,
+                "differential": differential,
+                "counted": scorecard_id in used,
+            }
+            for date_played, scorecard_id, differential in window
+        ],
+    }
+
+async def handicap_history(db: AsyncSession, user_id: int) -> List[dict]:
+    # Index after each counting round, replayed over the same sliding window
+    result = await db.execute(
+        select(Scorecard.id, Scorecard.date_played, Scorecard.differential)
+        .where(Scorecard.user_id == user_id, Scorecard.differential.is_not(None))
+        .order_by(Scorecard.date_played, Scorecard.id)
+    )
+    history = []
+    differentials = []
+    for scorecard_id, date_played, differential in result.all():
+        differentials.append(differential)
+        history.append({
+            "scorecard_id": scorecard_id,
+            "date_played": date_played,
+            "handicap_index": handicap_index(differentials[-DIFFERENTIAL_WINDOW:]),
+        })
+    return history
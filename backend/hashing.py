@@ -0,0 +1,83 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# "thread" is enough because bcrypt releases the GIL; "process" isolates it fully
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Module-level so they can be pickled into a process pool
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordHasher:
+    # Runs bcrypt off the event loop with at most max_workers calls in flight.
+    # Callers beyond that wait on the semaphore and are counted as queued.
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, executor: str = PASSWORD_HASH_EXECUTOR):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.max_workers = max_workers
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password_sync, plain_password, hashed_password)
+
+    def metrics(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import List, Mapping, Optional
+
+from sqlalchemy import select, func, case, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Scorecard, ScorecardHole
+
+# Highest hole number a round may record; also bounds the columns an export
+# flattens holes into
+MAX_HOLE_NUMBER = 36
+
+async def record_hole_scores(db: AsyncSession, user_id: int, rounds: List[Mapping]) -> None:
+    # Write the hole_scores rows for newly inserted rounds with one executemany
+    # INSERT, in the caller's transaction. Each round maps id and holes.
+    rows = [
+        {
+            "scorecard_id": r["id"],
+            "user_id": user_id,
+            "hole_number": hole["hole_number"],
+            "par": hole["par"],
+            "score": hole["score"],
+        }
+        for r in rounds
+        for hole in r["holes"]
+    ]
+    if rows:
+        await db.execute(insert(ScorecardHole), rows)
+
+def _count(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+async def hole_summary(
+    db: AsyncSession,
+    user_id: int,
+    course_id: Optional[int] = None,
+    hole_number: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[dict]:
+    # Per-hole aggregates grouped in SQL. Without a round filter this is
+    # answered from ix_hole_scores_user_hole alone; with one, the matching
+    # rounds come from a scorecards index and their holes from
+    # ix_hole_scores_scorecard_hole.
+    diff = ScorecardHole.score - ScorecardHole.par
+    query = (
+        select(
+            ScorecardHole.hole_number,
+            func.count().label("times_played"),
+            func.round(func.avg(ScorecardHole.score), 2).label("avg_score"),
+            func.round(func.avg(diff), 2).label("avg_to_par"),
+            func.sum(diff).label("total_to_par"),
+            _count(diff <= -2).label("eagles_or_better"),
+            _count(diff == -1).label("birdies"),
+            _count(diff == 0).label("pars"),
+            _count(diff == 1).label("bogeys"),
+            _count(diff >= 2).label("double_bogeys_or_worse"),
+        )
+        .group_by(ScorecardHole.hole_number)
+        .order_by(ScorecardHole.hole_number)
+    )
+    if hole_number is not None:
+        query = query.where(ScorecardHole.hole_number == hole_number)
+
+    if course_id is None and since is None and until is None:
+        query = query.where(ScorecardHole.user_id == user_id)
+    else:
+        query = query.join(Scorecard, Scorecard.id == ScorecardHole.scorecard_id).where(Scorecard.user_id == user_id)
+        if course_id is not None:
+            query = query.where(Scorecard.course_id == course_id)
+        if since is not None:
+            query = query.where(Scorecard.date_played >= since)
+        if until is not None:
+            query = query.where(Scorecard.date_played < until)
+
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings()]
+
+def summarize_holes(holes: List[dict]) -> dict:
+    # Totals across the per-hole rows, e.g. birdies this season for since=Jan 1
+    played = sum(h["times_played"] for h in holes)
+    totals = {
+        key: sum(h[key] for h in holes)
+        for key in ("total_to_par", "eagles_or_better", "birdies", "pars", "bogeys", "double_bogeys_or_worse")
+    }
+    return {
+        "holes_played": played,
+        "avg_to_par": round(totals["total_to_par"] / played, 2) if played else 0.0,
+        **totals,
+    }
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, Job
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at once per process; 0 leaves them for `manage.py run-jobs`
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# Idle workers look for due jobs this often even without a wakeup, which
+# covers retries coming due and jobs enqueued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# A running job whose worker died becomes claimable again after this long
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+# How long shutdown waits for running jobs before cancelling them
+JOB_SHUTDOWN_SECONDS = float(os.getenv("JOB_SHUTDOWN_SECONDS", "10"))
+
+Handler = Callable[..., Awaitable[None]]
+
+class JobQueue:
+    # In-process asyncio workers over the durable jobs table. enqueue() adds
+    # the job in the caller's transaction, so it exists only if the request's
+    # own changes commit, and wakes the workers once they do. Handlers are
+    # called as handler(db, **payload) with a fresh session; the job row is
+    # deleted in that session's transaction, so a job's effects and its
+    # completion commit together. Failures retry with exponential backoff.
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self._handlers: Dict[str, Handler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.running = 0
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def handler(self, kind: str):
+        def register(func: Handler) -> Handler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        kind: str,
+        payload: dict,
+        delay_seconds: float = 0,
+        max_attempts: int = JOB_MAX_ATTEMPTS
+    ) -> None:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.utcnow()
+        await db.execute(insert(Job).values(
+            kind=kind,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=now + timedelta(seconds=delay_seconds),
+            created_at=now,
+        ))
+        event.listen(db.sync_session, "after_commit", self._notify, once=True)
+        self.enqueued += 1
+
+    def _notify(self, session=None) -> None:
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[tuple]:
+        # Oldest due job, pending or with an expired lease. The UPDATE takes
+        # SQLite's write lock before reading, so two workers never claim the
+        # same row.
+        now = datetime.utcnow()
+        due = (
+            select(Job.id)
+            .where(Job.status.in_(("pending", "running")), Job.run_at <= now)
+            .order_by(Job.run_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+        async with async_session() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == due)
+                .values(status="running", attempts=Job.attempts + 1, run_at=now + timedelta(seconds=JOB_LEASE_SECONDS))
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+            )
+            job = result.first()
+            await db.commit()
+        return job
+
+    async def run_one(self) -> bool:
+        # Claim and run one due job; False if there was none
+        job = await self._claim()
+        if job is None:
+            return False
+        self.running += 1
+        try:
+            async with async_session() as db:
+                await self._handlers[job.kind](db, **job.payload)
+                await db.execute(delete(Job).where(Job.id == job.id))
+                await db.commit()
+            self.completed += 1
+        except asyncio.CancelledError:
+            # Shutdown interrupted it: hand it back without using up an attempt
+            await self._update(job.id, status="pending", attempts=job.attempts - 1, run_at=datetime.utcnow())
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:1000]
+            if job.attempts >= job.max_attempts:
+                self.failed += 1
+                logger.exception("Job %s (%s) failed after %d attempts", job.id, job.kind, job.attempts)
+                await self._update(job.id, status="failed", last_error=error)
+            else:
+                self.retried += 1
+                delay = JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+                logger.warning("Job %s (%s) attempt %d failed, retrying in %.1f s: %s",
+                               job.id, job.kind, job.attempts, delay, error)
+                await self._update(
+                    job.id, status="pending", last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay)
+                )
+        finally:
+            self.running -= 1
+        return True
+
+    async def _update(self, job_id: int, **values) -> None:
+        async with async_session() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def run_pending(self) -> int:
+        # Run every due job inline, one at a time; for scripts and manage.py
+        count = 0
+        while await self.run_one():
+            count += 1
+        return count
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                if await self.run_one():
+                    continue
+            except Exception:
+                logger.exception("Job worker error")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def close(self, timeout: float = JOB_SHUTDOWN_SECONDS) -> None:
+        # Stop claiming, give running jobs up to timeout to finish, then
+        # cancel the rest; cancelled jobs go back to pending for the next start
+        self._stopping = True
+        self._wakeup.set()
+        if self._workers:
+            _, unfinished = await asyncio.wait(self._workers, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        self._workers = []
+
+    def metrics(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+job_queue = JobQueue()
@@ -1,30 +1,85 @@
+import asyncio
+import base64
+import json
+import math
 import os
-import secrets
-import string
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Union
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from pydantic import BaseModel, EmailStr
-from sqlalchemy import select, and_, delete
+from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validator
+from sqlalchemy import Text, text, select, insert, and_, delete, tuple_, union_all, literal, type_coerce
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db, init_db, User, Scorecard, Friendship
+import fast_json
+from database import engine, get_db, init_db, async_session, User, Scorecard, Friendship, UserStats
+from hashing import password_hasher
+from user_cache import CurrentUser, user_cache
+from bulk_import import (
+    ImportFormatError, JSON_TYPES, NDJSON_TYPES, CSV_TYPES, parse_json_array, parse_ndjson, parse_csv
+)
+from analytics import load_hole_data, compute_analytics
+from data_versions import get_data_version, bump_data_versions, make_etag, etag_matches
+from courses import course_cache, assign_courses, find_course, search_courses
+from tokens import REFRESH_TOKEN_EXPIRE_DAYS, new_jti, revoked_tokens
+from friend_codes import friend_code_allocator
+from jobs import job_queue
+from export import max_hole_number, stream_csv, stream_columnar
+from rate_limit import auth_rate_limiter
+from coalescing import request_coalescer
+from events import end_streams_on_server_exit, event_bus, user_channel, rounds_channel
+from metrics import MetricsMiddleware, instrument_engine, metrics
+from feed import queue_fan_out, record_friendship, read_feed, register_jobs as register_feed_jobs
+from handicap import score_differential, record_differentials, backfill_missing_handicaps, get_handicap, handicap_history
+from holes import MAX_HOLE_NUMBER, record_hole_scores, hole_summary, summarize_holes
+from stats import record_scorecards, backfill_missing_stats, get_user_stats, get_courses_played
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+DEFAULT_PAGE_SIZE = 10
+STREAM_BATCH_SIZE = 500
+# Clients may store responses but must revalidate them with the ETag
+CACHE_CONTROL = "private, no-cache"
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+DB_HEALTH_TIMEOUT_SECONDS = float(os.getenv("DB_HEALTH_TIMEOUT_SECONDS", "2"))
+# Comment line sent on an idle /events stream so proxies keep it open
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+SCORECARD_SUMMARY_COLUMNS = (
+    Scorecard.id,
+    Scorecard.course_id,
+    Scorecard.course_name,
+    Scorecard.date_played,
+    Scorecard.weather,
+    Scorecard.total_score,
+    Scorecard.total_par,
+    Scorecard.relative_to_par,
+    Scorecard.created_at,
+)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# EventSource can't send headers, so /events also takes the token as ?token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    end_streams_on_server_exit(event_bus)
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
 
-app = FastAPI(title="Golf Tracker API", version="1.0.0")
+app = FastAPI(title="Golf Tracker API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,7 +87,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+register_feed_jobs(job_queue)
 
 # Pydantic models (same as before)
 class UserCreate(BaseModel):
@@ -51,6 +110,13 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -66,9 +132,23 @@ class ScorecardCreate(BaseModel):
     holes: List[HoleScore]
     weather: Optional[str] = None
     notes: Optional[str] = None
+    course_rating: Optional[float] = Field(None, gt=0)
+    slope_rating: Optional[int] = Field(None, ge=55, le=155)
+
+    @field_validator("holes")
+    @classmethod
+    def check_hole_numbers(cls, holes: List[HoleScore]) -> List[HoleScore]:
+        # Checked here rather than on HoleScore, which also reads back older rounds
+        numbers = [hole.hole_number for hole in holes]
+        if any(not 1 <= n <= MAX_HOLE_NUMBER for n in numbers):
+            raise ValueError(f"hole_number must be between 1 and {MAX_HOLE_NUMBER}")
+        if len(set(numbers)) != len(numbers):
+            raise ValueError("Each hole_number may appear only once")
+        return holes
 
 class ScorecardResponse(BaseModel):
     id: int
+    course_id: Optional[int] = None
     course_name: str
     date_played: datetime
     holes: List[HoleScore]
@@ -77,8 +157,31 @@ class ScorecardResponse(BaseModel):
     total_score: int
     total_par: int
     relative_to_par: int
+    course_rating: Optional[float] = None
+    slope_rating: Optional[int] = None
+    differential: Optional[float] = None
     created_at: datetime
 
+class ScorecardSummaryResponse(BaseModel):
+    id: int
+    course_id: Optional[int] = None
+    course_name: str
+    date_played: datetime
+    weather: Optional[str] = None
+    total_score: int
+    total_par: int
+    relative_to_par: int
+    created_at: datetime
+
+class BulkImportError(BaseModel):
+    row: int
+    detail: str
+
+class BulkImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[BulkImportError] = []
+
 class StatsResponse(BaseModel):
     total_rounds: int
     avg_relative_to_par: Optional[float] = None
@@ -95,12 +198,121 @@ class FriendResponse(BaseModel):
     full_name: Optional[str] = None
     friend_code: str
 
+class ParScoring(BaseModel):
+    par: int
+    holes_played: int
+    avg_score: float
+    avg_to_par: float
+
+class HoleAverage(BaseModel):
+    hole_number: int
+    times_played: int
+    avg_score: float
+    avg_to_par: float
+
+class CourseHoleAverages(BaseModel):
+    course_id: int
+    course_name: str
+    rounds: int
+    holes: List[HoleAverage]
+
+class TrendPoint(BaseModel):
+    scorecard_id: int
+    date_played: datetime
+    relative_to_par: int
+    rolling_avg: float
+
+class AnalyticsResponse(BaseModel):
+    total_rounds: int
+    total_holes: int
+    scoring_by_par: List[ParScoring]
+    score_distribution: Dict[str, int]
+    courses: List[CourseHoleAverages]
+    trend: List[TrendPoint]
+    trend_slope_per_round: float
+
+class CourseResponse(BaseModel):
+    id: int
+    name: str
+    hole_pars: Optional[List[int]] = None
+
+class HoleStats(BaseModel):
+    hole_number: int
+    times_played: int
+    avg_score: float
+    avg_to_par: float
+    total_to_par: int
+    eagles_or_better: int
+    birdies: int
+    pars: int
+    bogeys: int
+    double_bogeys_or_worse: int
+
+class HoleTotals(BaseModel):
+    holes_played: int
+    avg_to_par: float
+    total_to_par: int
+    eagles_or_better: int
+    birdies: int
+    pars: int
+    bogeys: int
+    double_bogeys_or_worse: int
+
+class HoleStatsResponse(BaseModel):
+    holes: List[HoleStats]
+    totals: HoleTotals
+
+class HandicapDifferential(BaseModel):
+    scorecard_id: int
+    date_played: datetime
+    differential: float
+    counted: bool
+
+class HandicapPoint(BaseModel):
+    scorecard_id: int
+    date_played: datetime
+    handicap_index: Optional[float] = None
+
+class HandicapResponse(BaseModel):
+    handicap_index: Optional[float] = None
+    differentials: List[HandicapDifferential]
+    history: List[HandicapPoint]
+
+class DashboardResponse(BaseModel):
+    scorecards: List[ScorecardResponse]
+    next_cursor: Optional[str] = None
+    stats: StatsResponse
+    friends: List[FriendResponse]
+
+class FeedItem(BaseModel):
+    id: int
+    user_id: int
+    username: str
+    full_name: Optional[str] = None
+    course_id: Optional[int] = None
+    course_name: str
+    date_played: datetime
+    total_score: int
+    total_par: int
+    relative_to_par: int
+    created_at: datetime
+
+class LeaderboardEntry(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    is_current_user: bool = False
+    total_rounds: int
+    avg_relative_to_par: Optional[float] = None
+    best_round: Optional[dict] = None
+
 # Helper functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt runs on a bounded worker pool so it never blocks the event loop
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -109,12 +321,134 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    # jti identifies the token in the revocation list
+    to_encode.setdefault("jti", new_jti())
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def generate_friend_code() -> str:
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(6))
+def create_refresh_token(username: str) -> str:
+    return create_access_token(
+        data={"sub": username, "type": "refresh"},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+def issue_tokens(username: str) -> dict:
+    access_token = create_access_token(
+        data={"sub": username},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": create_refresh_token(username)}
+
+def credentials_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token: Optional[str], token_type: str = "access") -> dict:
+    # Signature, expiry, token type and revocation; no database access
+    credentials_exception = credentials_error()
+    if not token:
+        raise credentials_exception
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("sub") is None or payload.get("type", "access") != token_type:
+        raise credentials_exception
+    # Tokens issued before jti was added carry none and simply run out
+    jti = payload.get("jti")
+    if jti is not None and revoked_tokens.is_revoked(jti):
+        raise credentials_exception
+    return payload
+
+def encode_cursor(date_played: datetime, scorecard_id: int) -> str:
+    raw = json.dumps([date_played.isoformat(), scorecard_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_played, scorecard_id = json.loads(raw)
+        return datetime.fromisoformat(date_played), int(scorecard_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_feed_cursor(scorecard_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([scorecard_id]).encode()).decode().rstrip("=")
+
+def decode_feed_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (scorecard_id,) = json.loads(raw)
+        return int(scorecard_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def summary_to_response(row) -> ScorecardSummaryResponse:
+    return ScorecardSummaryResponse(**row._mapping)
+
+def scorecard_to_response(sc: Scorecard) -> ScorecardResponse:
+    return ScorecardResponse(
+        id=sc.id,
+        course_id=sc.course_id,
+        course_name=sc.course_name,
+        date_played=sc.date_played,
+        holes=[HoleScore(**hole) for hole in sc.holes],
+        weather=sc.weather,
+        notes=sc.notes,
+        total_score=sc.total_score,
+        total_par=sc.total_par,
+        relative_to_par=sc.relative_to_par,
+        course_rating=sc.course_rating,
+        slope_rating=sc.slope_rating,
+        differential=sc.differential,
+        created_at=sc.created_at
+    )
+
+# ScorecardResponse fields in order, for fast_json to serialize rows as they
+# come back; holes stay raw JSON text so SQLAlchemy doesn't decode them
+SCORECARD_FAST_COLUMNS = tuple(
+    type_coerce(Scorecard.holes, Text).label("holes") if name == "holes" else getattr(Scorecard, name)
+    for name in ScorecardResponse.model_fields
+)
+
+def scorecard_row_to_dict(row) -> dict:
+    values = row._asdict()
+    values["holes"] = fast_json.loads(values["holes"])
+    return values
+
+def scorecard_values(user_id: int, scorecard_in: ScorecardCreate) -> dict:
+    # Column values for a new scorecard, totals summed in a single pass
+    holes_data = []
+    total_score = total_par = 0
+    for hole in scorecard_in.holes:
+        holes_data.append({"hole_number": hole.hole_number, "par": hole.par, "score": hole.score})
+        total_score += hole.score
+        total_par += hole.par
+    return {
+        "user_id": user_id,
+        "course_name": scorecard_in.course_name,
+        "date_played": scorecard_in.date_played,
+        "holes": holes_data,
+        "weather": scorecard_in.weather,
+        "notes": scorecard_in.notes,
+        "total_score": total_score,
+        "total_par": total_par,
+        "relative_to_par": total_score - total_par,
+        "course_rating": scorecard_in.course_rating,
+        "slope_rating": scorecard_in.slope_rating,
+        "differential": score_differential(
+            total_score, total_par, len(holes_data), scorecard_in.course_rating, scorecard_in.slope_rating
+        ),
+        "created_at": datetime.utcnow(),
+    }
+
+def format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+    )
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     result = await db.execute(select(User).where(User.email == email))
@@ -128,43 +462,155 @@ async def get_user_by_friend_code(db: AsyncSession, friend_code: str) -> Optiona
     result = await db.execute(select(User).where(User.friend_code == friend_code))
     return result.scalars().first()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
+def token_expiry(payload: dict) -> datetime:
+    return datetime.fromtimestamp(payload["exp"], timezone.utc).replace(tzinfo=None)
+
+async def authenticate_token(token: Optional[str], db: AsyncSession) -> CurrentUser:
+    return await load_current_user(decode_token(token)["sub"], db)
 
-    user = await get_user_by_username(db, token_data.username)
+async def load_current_user(username: str, db: AsyncSession) -> CurrentUser:
+    # Serve identity fields from the in-process cache when fresh
+    current_user = user_cache.get(username)
+    if current_user is not None:
+        return current_user
+
+    user = await get_user_by_username(db, username)
     if user is None:
-        raise credentials_exception
-    return user
+        raise credentials_error()
+    current_user = CurrentUser.from_user(user)
+    user_cache.set(current_user)
+    return current_user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
+    return await authenticate_token(token, db)
 
-# Startup event to initialize database
-@app.on_event("startup")
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    # Decide If-None-Match from the user's data version before the route runs
+    # any of its own queries
+    version = await get_data_version(db, current_user.id)
+    etag = make_etag(request, current_user.id, version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+async def limit_auth_attempt(request: Request, username: str) -> None:
+    # First thing in the auth routes: a throttled attempt never reaches the
+    # database or bcrypt. Behind a proxy, run uvicorn with --proxy-headers
+    # so request.client is the real client.
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await auth_rate_limiter.check(client_ip, username)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(max(1, math.ceil(min(retry_after, 86400))))},
+        )
+
+# Run around serving by lifespan; scripts driving the app in-process call them directly
 async def startup_event():
     await init_db()
+    async with async_session() as db:
+        await backfill_missing_stats(db)
+        await backfill_missing_handicaps(db)
+        await db.commit()
+    await event_bus.start()
+    await revoked_tokens.start()
+    await job_queue.start()
+    await auth_rate_limiter.store.start()
+
+async def shutdown_event():
+    # Jobs first, while everything they might use is still up
+    await job_queue.close()
+    await auth_rate_limiter.store.close()
+    await revoked_tokens.close()
+    await event_bus.close()
+    password_hasher.shutdown()
 
 # Routes
 @app.get("/")
 async def root():
     return {"message": "Golf Tracker API with Database!", "version": "1.0.0"}
 
+def pool_status() -> dict:
+    # Connection pool occupancy; in-memory SQLite has a static pool with no counters
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"class": type(pool).__name__}
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+async def database_status() -> dict:
+    start = time.perf_counter()
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), DB_HEALTH_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {"status": "unavailable", "error": f"{type(e).__name__}: {e}"}
+    return {"status": "connected", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    database = await database_status()
+    healthy = database["status"] == "connected"
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "healthy" if healthy else "unhealthy",
+            "database": database,
+            "pool": pool_status(),
+            "password_hasher": password_hasher.metrics(),
+            "user_cache": user_cache.metrics(),
+            "course_cache": course_cache.metrics(),
+            "event_bus": event_bus.metrics(),
+            "revoked_tokens": revoked_tokens.metrics(),
+            "friend_codes": friend_code_allocator.metrics(),
+            "jobs": job_queue.metrics(),
+            "rate_limit": auth_rate_limiter.metrics(),
+            "coalescing": request_coalescer.metrics()
+        }
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Prometheus text exposition format
+    gauges = {}
+    for prefix, values in (
+        ("pool", pool_status()),
+        ("password_hasher", password_hasher.metrics()),
+        ("user_cache", user_cache.metrics()),
+        ("course_cache", course_cache.metrics()),
+        ("event_bus", event_bus.metrics()),
+        ("revoked_tokens", revoked_tokens.metrics()),
+        ("friend_codes", friend_code_allocator.metrics()),
+        ("jobs", job_queue.metrics()),
+        ("rate_limit", auth_rate_limiter.metrics()),
+        ("coalescing", request_coalescer.metrics()),
+    ):
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"{prefix}_{name}"] = value
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
 
 # Auth Routes
 @app.post("/auth/register", response_model=UserResponse)
-async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(request: Request, user_in: UserCreate, db: AsyncSession = Depends(get_db)):
+    await limit_auth_attempt(request, user_in.username)
+
+    # Before this session reads anything: a new block of codes is reserved
+    # in a separate transaction, which must not wait on this one
+    friend_code = await friend_code_allocator.allocate()
+
     # Check if user already exists
     existing_email = await get_user_by_email(db, user_in.email)
     if existing_email:
@@ -174,13 +620,8 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    # Generate unique friend code
-    friend_code = generate_friend_code()
-    while await get_user_by_friend_code(db, friend_code):
-        friend_code = generate_friend_code()
-
     # Create user
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await get_password_hash(user_in.password)
     
     db_user = User(
         username=user_in.username,
@@ -194,6 +635,7 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    user_cache.invalidate(db_user.username)
 
     return UserResponse(
         id=db_user.id,
@@ -204,28 +646,61 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
     )
 
 @app.post("/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    await limit_auth_attempt(request, form_data.username)
+
     # Try login with email first, then username
     user = await get_user_by_email(db, form_data.username)
     if not user:
         user = await get_user_by_username(db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(user.username)
+
+@app.post("/auth/refresh", response_model=Token)
+async def refresh_tokens(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Trade a refresh token for a new pair without a password, so no bcrypt.
+    # Each refresh token works once: it is revoked as it is exchanged, and a
+    # second use, even racing on another worker, loses on the unique jti.
+    payload = decode_token(body.refresh_token, "refresh")
+    current_user = await load_current_user(payload["sub"], db)
+    jti = payload.get("jti")
+    if jti is None or not await revoked_tokens.revoke(db, jti, current_user.id, token_expiry(payload)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token already used",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    await db.commit()
+    return issue_tokens(current_user.username)
+
+@app.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    # Revoke the access token, and the refresh token if one is sent, before they expire
+    access = decode_token(token)
+    current_user = await load_current_user(access["sub"], db)
+    tokens = [access]
+    if body is not None and body.refresh_token:
+        refresh = decode_token(body.refresh_token, "refresh")
+        if refresh["sub"] == current_user.username:
+            tokens.append(refresh)
+    for payload in tokens:
+        if payload.get("jti") is not None:
+            await revoked_tokens.revoke(db, payload["jti"], current_user.id, token_expiry(payload))
+    await db.commit()
 
 @app.get("/auth/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: CurrentUser = Depends(get_current_user)):
     return UserResponse(
         id=current_user.id,
         username=current_user.username,
@@ -236,123 +711,430 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # Scorecard Routes
 @app.post("/scorecards", response_model=ScorecardResponse)
-async def create_scorecard(scorecard_in: ScorecardCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Calculate scores
-    holes_data = [hole.model_dump() for hole in scorecard_in.holes]
-    total_score = sum(hole.score for hole in scorecard_in.holes)
-    total_par = sum(hole.par for hole in scorecard_in.holes)
-    relative_to_par = total_score - total_par
+async def create_scorecard(scorecard_in: ScorecardCreate, current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    values = scorecard_values(current_user.id, scorecard_in)
+    await assign_courses(db, [values])
     
-    # Create scorecard in database
-    db_scorecard = Scorecard(
-        user_id=current_user.id,
-        course_name=scorecard_in.course_name,
-        date_played=scorecard_in.date_played,
-        holes=holes_data,
-        weather=scorecard_in.weather,
-        notes=scorecard_in.notes,
-        total_score=total_score,
-        total_par=total_par,
-        relative_to_par=relative_to_par,
-        created_at=datetime.utcnow()
-    )
-    
-    db.add(db_scorecard)
+    # INSERT ... RETURNING id gives back the only server-generated value, so
+    # there is no ORM flush and no refresh SELECT after commit
+    result = await db.execute(insert(Scorecard).returning(Scorecard.id), values)
+    values["id"] = result.scalar_one()
+    # The author's own aggregates commit with the round: the stats_changed
+    # push makes clients reload them at once, and the ETag version must not
+    # move ahead of them. Each is one set-based statement; only the friends'
+    # timelines wait for a job.
+    await record_hole_scores(db, current_user.id, [values])
+    await queue_fan_out(db, current_user.id, [values["id"]])
+    await record_scorecards(db, current_user.id, [values])
+    await record_differentials(db, current_user.id, [values])
+    await bump_data_versions(db, current_user.id)
     await db.commit()
-    await db.refresh(db_scorecard)
+    publish_round(current_user, values)
     
-    return ScorecardResponse(
-        id=db_scorecard.id,
-        course_name=db_scorecard.course_name,
-        date_played=db_scorecard.date_played,
+    # Everything here is already validated; skip building it a second time
+    return ScorecardResponse.model_construct(
+        id=values["id"],
+        course_id=values["course_id"],
+        course_name=values["course_name"],
+        date_played=values["date_played"],
         holes=scorecard_in.holes,
-        weather=db_scorecard.weather,
-        notes=db_scorecard.notes,
-        total_score=db_scorecard.total_score,
-        total_par=db_scorecard.total_par,
-        relative_to_par=db_scorecard.relative_to_par,
-        created_at=db_scorecard.created_at
+        weather=values["weather"],
+        notes=values["notes"],
+        total_score=values["total_score"],
+        total_par=values["total_par"],
+        relative_to_par=values["relative_to_par"],
+        course_rating=values["course_rating"],
+        slope_rating=values["slope_rating"],
+        differential=values["differential"],
+        created_at=values["created_at"]
+    )
+
+def publish_round(author: CurrentUser, values: dict) -> None:
+    # After commit: the round to the author's friends, a refresh hint to the author
+    item = FeedItem(
+        id=values["id"],
+        user_id=author.id,
+        username=author.username,
+        full_name=author.full_name,
+        course_id=values["course_id"],
+        course_name=values["course_name"],
+        date_played=values["date_played"],
+        total_score=values["total_score"],
+        total_par=values["total_par"],
+        relative_to_par=values["relative_to_par"],
+        created_at=values["created_at"]
     )
+    event_bus.publish(rounds_channel(author.id), {"type": "friend_round", "data": item.model_dump(mode="json")})
+    event_bus.publish(user_channel(author.id), {"type": "stats_changed", "data": {}})
 
-@app.get("/scorecards", response_model=List[ScorecardResponse])
-async def get_scorecards(current_user: User = Depends(get_current_user), limit: int = 10, db: AsyncSession = Depends(get_db)):
-    # Get scorecards from database
+async def insert_scorecard_batch(db: AsyncSession, user_id: int, batch: List[dict]) -> None:
+    # One executemany INSERT ... RETURNING for the batch, one for its holes,
+    # one feed fan-out, then one aggregate and one handicap update
+    await assign_courses(db, batch)
     result = await db.execute(
-        select(Scorecard)
-        .where(Scorecard.user_id == current_user.id)
-        .order_by(Scorecard.date_played.desc())
-        .limit(limit)
+        insert(Scorecard).returning(Scorecard.id, sort_by_parameter_order=True),
+        batch
+    )
+    for values, scorecard_id in zip(batch, result.scalars()):
+        values["id"] = scorecard_id
+    await record_hole_scores(db, user_id, batch)
+    await queue_fan_out(db, user_id, [values["id"] for values in batch])
+    await record_scorecards(db, user_id, batch)
+    await record_differentials(db, user_id, batch)
+
+@app.post("/scorecards/bulk", response_model=BulkImportResponse)
+async def bulk_import_scorecards(request: Request, current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Body is a JSON array, NDJSON or CSV depending on Content-Type. Rows are
+    # validated as they stream in and inserted in batches in one transaction
+    # once the body is complete; invalid rows are reported without aborting
+    # the rest.
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in JSON_TYPES:
+        records = parse_json_array(await request.body())
+    elif content_type in NDJSON_TYPES:
+        records = parse_ndjson(request.stream())
+    elif content_type in CSV_TYPES:
+        records = parse_csv(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Expected application/json, application/x-ndjson or text/csv")
+
+    errors = []
+    rows = []
+    try:
+        async for row_number, record in records:
+            if row_number > BULK_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"Imports are limited to {BULK_MAX_ROWS} rows")
+            if isinstance(record, ImportFormatError):
+                errors.append(BulkImportError(row=row_number, detail=str(record)))
+                continue
+            try:
+                scorecard_in = ScorecardCreate.model_validate(record)
+            except ValidationError as e:
+                errors.append(BulkImportError(row=row_number, detail=format_validation_error(e)))
+                continue
+            rows.append(scorecard_values(current_user.id, scorecard_in))
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The first INSERT takes SQLite's write lock until commit, so nothing is
+    # written while a slow client is still sending; other writers only wait
+    # for the inserts themselves. BULK_MAX_ROWS bounds what is held meanwhile.
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        await insert_scorecard_batch(db, current_user.id, rows[start:start + BULK_BATCH_SIZE])
+    imported = len(rows)
+    if imported:
+        await bump_data_versions(db, current_user.id)
+    await db.commit()
+    if imported:
+        event_bus.publish(rounds_channel(current_user.id), {
+            "type": "friend_rounds_imported",
+            "data": {"user_id": current_user.id, "username": current_user.username, "imported": imported},
+        })
+        event_bus.publish(user_channel(current_user.id), {"type": "stats_changed", "data": {}})
+
+    return BulkImportResponse(imported=imported, failed=len(errors), errors=errors)
+
+async def stream_scorecards_ndjson(query, to_response):
+    # Own session: the request-scoped one may be closed before the body is sent
+    async with async_session() as db:
+        result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in result:
+            if fast_json.FAST_JSON:
+                yield fast_json.dumps(to_response(row)) + b"\n"
+            else:
+                yield to_response(row).model_dump_json() + "\n"
+
+def scorecards_query(user_id: int, cursor: Optional[str], fields: str):
+    # Select plain columns so rows skip the ORM; summary mode never touches holes.
+    # With FAST_JSON rows become plain dicts instead of response models.
+    fast = fast_json.FAST_JSON
+    if fields == "summary":
+        columns = SCORECARD_SUMMARY_COLUMNS
+        to_response = fast_json.row_to_dict if fast else summary_to_response
+    elif fields == "full":
+        if fast:
+            columns, to_response = SCORECARD_FAST_COLUMNS, scorecard_row_to_dict
+        else:
+            columns, to_response = Scorecard.__table__.columns, scorecard_to_response
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported fields")
+
+    # Keyset pagination on (date_played, id), newest first
+    query = (
+        select(*columns)
+        .where(Scorecard.user_id == user_id)
+        .order_by(Scorecard.date_played.desc(), Scorecard.id.desc())
     )
-    scorecards = result.scalars().all()
+    if cursor:
+        query = query.where(tuple_(Scorecard.date_played, Scorecard.id) < tuple_(*decode_cursor(cursor)))
+    return query, to_response
+
+async def list_scorecards(db: AsyncSession, query, to_response, limit: Optional[int]) -> tuple:
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
     
-    response_list = []
-    for sc in scorecards:
-        holes_objects = [HoleScore(**hole) for hole in sc.holes]
-        response_list.append(ScorecardResponse(
-            id=sc.id,
-            course_name=sc.course_name,
-            date_played=sc.date_played,
-            holes=holes_objects,
-            weather=sc.weather,
-            notes=sc.notes,
-            total_score=sc.total_score,
-            total_par=sc.total_par,
-            relative_to_par=sc.relative_to_par,
-            created_at=sc.created_at
-        ))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date_played, last.id)
     
-    return response_list
+    return [to_response(row) for row in rows], next_cursor
 
-@app.get("/scorecards/stats", response_model=StatsResponse)
-async def get_golf_stats(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Get all scorecards for user
-    result = await db.execute(
-        select(Scorecard).where(Scorecard.user_id == current_user.id)
-    )
-    scorecards = result.scalars().all()
+async def build_stats(db: AsyncSession, user_id: int) -> StatsResponse:
+    # Read the incrementally maintained aggregates instead of scanning every round
+    user_stats = await get_user_stats(db, user_id)
     
-    if not scorecards:
+    if not user_stats.total_rounds:
         return StatsResponse(
             total_rounds=0,
             courses_played={}
         )
     
-    # Calculate statistics
-    total_rounds = len(scorecards)
-    relative_scores = [sc.relative_to_par for sc in scorecards]
-    avg_relative_to_par = sum(relative_scores) / len(relative_scores)
-    
-    # Find best and worst rounds
-    best_round = min(scorecards, key=lambda x: x.relative_to_par)
-    worst_round = max(scorecards, key=lambda x: x.relative_to_par)
-    
-    # Count courses played
-    courses_played = {}
-    for sc in scorecards:
-        course = sc.course_name
-        courses_played[course] = courses_played.get(course, 0) + 1
+    avg_relative_to_par = user_stats.sum_relative_to_par / user_stats.total_rounds
+    courses_played = await get_courses_played(db, user_id)
     
     return StatsResponse(
-        total_rounds=total_rounds,
+        total_rounds=user_stats.total_rounds,
         avg_relative_to_par=round(avg_relative_to_par, 2),
         best_round={
-            "course_name": best_round.course_name,
-            "date_played": best_round.date_played.isoformat(),
-            "relative_to_par": best_round.relative_to_par,
-            "total_score": best_round.total_score
+            "course_name": user_stats.best_course_name,
+            "date_played": user_stats.best_date_played.isoformat(),
+            "relative_to_par": user_stats.best_relative_to_par,
+            "total_score": user_stats.best_total_score
         },
         worst_round={
-            "course_name": worst_round.course_name,
-            "date_played": worst_round.date_played.isoformat(),
-            "relative_to_par": worst_round.relative_to_par,
-            "total_score": worst_round.total_score
+            "course_name": user_stats.worst_course_name,
+            "date_played": user_stats.worst_date_played.isoformat(),
+            "relative_to_par": user_stats.worst_relative_to_par,
+            "total_score": user_stats.worst_total_score
         },
         courses_played=courses_played
     )
 
+@app.get(
+    "/scorecards",
+    response_model=List[Union[ScorecardResponse, ScorecardSummaryResponse]],
+    dependencies=[Depends(conditional_get)]
+)
+async def get_scorecards(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: str = "full",
+    format: str = "json",
+    db: AsyncSession = Depends(get_db)
+):
+    query, to_response = scorecards_query(current_user.id, cursor, fields)
+
+    if format == "ndjson":
+        # Stream the whole history (or up to limit) without building a list
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(
+            stream_scorecards_ndjson(query, to_response),
+            media_type="application/x-ndjson",
+            headers={name: response.headers[name] for name in ("ETag", "Cache-Control")}
+        )
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+    scorecards, next_cursor = await list_scorecards(db, query, to_response, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if fast_json.FAST_JSON:
+        return fast_json.json_response(scorecards, response)
+    return scorecards
+
+@app.get("/scorecards/stats", response_model=StatsResponse, dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_golf_stats(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await build_stats(db, current_user.id)
+
+@app.get("/scorecards/analytics", response_model=AnalyticsResponse, dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_scorecard_analytics(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    window: int = Query(5, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    # Hole-level analytics computed with NumPy grouped reductions over every hole played
+    rounds, holes = await load_hole_data(db, current_user.id)
+    return compute_analytics(rounds, holes, window)
+
+@app.get("/scorecards/holes", response_model=HoleStatsResponse, dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_hole_stats(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    course_name: Optional[str] = None,
+    hole_number: Optional[int] = Query(None, ge=1),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # Per-hole scoring from hole_scores, e.g. ?course_name=Augusta&hole_number=7
+    # or ?since=2026-01-01 for this season's birdie count
+    course_id = None
+    if course_name is not None:
+        course = await find_course(db, course_name)
+        if course is None:
+            return HoleStatsResponse(holes=[], totals=summarize_holes([]))
+        course_id = course.id
+    holes = await hole_summary(db, current_user.id, course_id, hole_number, since, until)
+    return HoleStatsResponse(holes=holes, totals=summarize_holes(holes))
+
+EXPORT_FILENAMES = {"csv": "scorecards.csv", "ndjson": "scorecards.ndjson", "columnar": "scorecards.columnar.ndjson"}
+
+@app.get("/scorecards/export")
+async def export_scorecards(
+    format: str = "csv",
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # The whole history as a download, streamed from the database in batches,
+    # so memory stays flat however many rounds there are. csv and columnar
+    # flatten holes into hole_<n>_par / hole_<n>_score columns; ndjson has
+    # the /scorecards shape.
+    if format not in EXPORT_FILENAMES:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    if format == "ndjson":
+        query, to_response = scorecards_query(current_user.id, None, "full")
+        body, media_type = stream_scorecards_ndjson(query, to_response), "application/x-ndjson"
+    else:
+        hole_count = await max_hole_number(db, current_user.id)
+        if format == "csv":
+            body, media_type = stream_csv(current_user.id, hole_count), "text/csv"
+        else:
+            body, media_type = stream_columnar(current_user.id, hole_count), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{EXPORT_FILENAMES[format]}"'}
+    )
+
+@app.get("/handicap", response_model=HandicapResponse, dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_user_handicap(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Current index and window come from user_handicaps; history replays every counting round
+    handicap = await get_handicap(db, current_user.id)
+    return HandicapResponse(**handicap, history=await handicap_history(db, current_user.id))
+
+@app.get("/dashboard", response_model=DashboardResponse, dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_dashboard(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Everything Dashboard.jsx loads, in one request and one session
+    query, to_response = scorecards_query(current_user.id, None, "full")
+    scorecards, next_cursor = await list_scorecards(db, query, to_response, None)
+    stats = await build_stats(db, current_user.id)
+    friends = await list_friends(db, current_user.id)
+    if fast_json.FAST_JSON:
+        return fast_json.json_response({
+            "scorecards": scorecards,
+            "next_cursor": next_cursor,
+            "stats": stats.model_dump(mode="json"),
+            "friends": [friend.model_dump(mode="json") for friend in friends],
+        }, response)
+    return DashboardResponse(
+        scorecards=scorecards,
+        next_cursor=next_cursor,
+        stats=stats,
+        friends=friends
+    )
+
+# Course Routes
+@app.get("/courses", response_model=List[CourseResponse])
+async def search_course_catalog(
+    q: str = "",
+    limit: int = Query(10, ge=1, le=50),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Autocomplete: courses whose normalized name starts with q
+    courses = await search_courses(db, q, limit)
+    return [CourseResponse(id=c.id, name=c.name, hole_pars=c.hole_pars) for c in courses]
+
+# Feed Routes
+@app.get("/feed", response_model=List[FeedItem])
+async def get_feed(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # Friends' rounds, newest posted first, keyset-paginated like /scorecards
+    before_id = decode_feed_cursor(cursor) if cursor else None
+    rows = await read_feed(db, current_user.id, before_id, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_feed_cursor(rows[-1].id)
+    if fast_json.FAST_JSON:
+        return fast_json.json_response([fast_json.row_to_dict(row) for row in rows], response)
+    return [FeedItem(**row._mapping) for row in rows]
+
+# Event Routes
+async def stream_events(channels: List[str]):
+    # Server-Sent Events; a friend added mid-stream also subscribes to their
+    # rounds. Subscribing here, once the response is being sent, means a
+    # response that never starts leaves no subscription behind. The stream
+    # ends when the event bus does, at shutdown; clients then reconnect.
+    subscription = event_bus.subscribe(channels)
+    try:
+        yield f"retry: {int(EVENTS_HEARTBEAT_SECONDS * 1000)}\n\n"
+        while True:
+            event = await subscription.get(EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                if subscription.ended:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if event["type"] == "friend_added":
+                subscription.add(rounds_channel(event["data"]["id"]))
+            yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        subscription.close()
+
+@app.get("/events")
+async def get_events(
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    # Push friend_round, friend_rounds_imported, friend_added and
+    # stats_changed events so clients can stop polling. Uses its own
+    # short-lived session: a get_db session would hold a pooled connection
+    # for as long as the stream stays open.
+    async with async_session() as db:
+        current_user = await authenticate_token(header_token or token, db)
+        result = await db.execute(select(Friendship.friend_id).where(Friendship.user_id == current_user.id))
+        friend_ids = result.scalars().all()
+    channels = [user_channel(current_user.id)] + [rounds_channel(friend_id) for friend_id in friend_ids]
+    return StreamingResponse(
+        stream_events(channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Friend Routes
 @app.post("/friends", response_model=FriendResponse)
-async def add_friend(friend_req: FriendRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def add_friend(friend_req: FriendRequest, current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if friend_req.friend_code == current_user.friend_code:
         raise HTTPException(status_code=400, detail="Cannot add yourself as a friend")
     
@@ -385,31 +1167,39 @@ async def add_friend(friend_req: FriendRequest, current_user: User = Depends(get
     )
     
     db.add_all([friendship1, friendship2])
-    await db.commit()
+    try:
+        # Autoflush inserts the friendships before the bookkeeping statements run
+        await record_friendship(db, current_user.id, friend_user.id)
+        await bump_data_versions(db, current_user.id, friend_user.id)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request created the pair first (ux_friendships_user_friend)
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Already friends with this user")
     
-    return FriendResponse(
+    friend = FriendResponse(
         id=friend_user.id,
         username=friend_user.username,
         full_name=friend_user.full_name,
         friend_code=friend_user.friend_code
     )
-
-@app.get("/friends", response_model=List[FriendResponse])
-async def get_friends(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    # Get friend IDs
-    result = await db.execute(
-        select(Friendship.friend_id).where(Friendship.user_id == current_user.id)
+    me = FriendResponse(
+        id=current_user.id,
+        username=current_user.username,
+        full_name=current_user.full_name,
+        friend_code=current_user.friend_code
     )
-    friend_ids = result.scalars().all()
-    
-    if not friend_ids:
-        return []
-    
-    # Get friend users
+    event_bus.publish(user_channel(current_user.id), {"type": "friend_added", "data": friend.model_dump(mode="json")})
+    event_bus.publish(user_channel(friend_user.id), {"type": "friend_added", "data": me.model_dump(mode="json")})
+    return friend
+
+async def list_friends(db: AsyncSession, user_id: int) -> List[FriendResponse]:
     result = await db.execute(
-        select(User).where(User.id.in_(friend_ids))
+        select(User.id, User.username, User.full_name, User.friend_code)
+        .join(Friendship, Friendship.friend_id == User.id)
+        .where(Friendship.user_id == user_id)
+        .order_by(Friendship.id)
     )
-    friends = result.scalars().all()
     
     return [
         FriendResponse(
@@ -417,5 +1207,69 @@ async def get_friends(current_user: User = Depends(get_current_user), db: AsyncS
             username=f.username,
             full_name=f.full_name,
             friend_code=f.friend_code
-        ) for f in friends
+        ) for f in result.all()
     ]
+
+@app.get("/friends", response_model=List[FriendResponse], dependencies=[Depends(conditional_get)])
+@request_coalescer.coalesce
+async def get_friends(
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await list_friends(db, current_user.id)
+
+@app.get("/friends/leaderboard", response_model=List[LeaderboardEntry])
+async def get_friends_leaderboard(current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # One query over the maintained user_stats aggregates for the user and all friends
+    def leaderboard_columns(is_current_user: bool):
+        return (
+            User.id,
+            User.username,
+            User.full_name,
+            literal(is_current_user).label("is_current_user"),
+            UserStats.total_rounds,
+            UserStats.sum_relative_to_par,
+            UserStats.best_course_name,
+            UserStats.best_date_played,
+            UserStats.best_relative_to_par,
+            UserStats.best_total_score,
+        )
+
+    friends = (
+        select(*leaderboard_columns(False))
+        .select_from(Friendship)
+        .join(User, User.id == Friendship.friend_id)
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .where(Friendship.user_id == current_user.id)
+    )
+    me = (
+        select(*leaderboard_columns(True))
+        .select_from(User)
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .where(User.id == current_user.id)
+    )
+    result = await db.execute(union_all(friends, me))
+    
+    entries = []
+    for row in result.all():
+        entry = LeaderboardEntry(
+            id=row.id,
+            username=row.username,
+            full_name=row.full_name,
+            is_current_user=bool(row.is_current_user),
+            total_rounds=row.total_rounds or 0
+        )
+        if entry.total_rounds:
+            entry.avg_relative_to_par = round(row.sum_relative_to_par / row.total_rounds, 2)
+            entry.best_round = {
+                "course_name": row.best_course_name,
+                "date_played": row.best_date_played.isoformat(),
+                "relative_to_par": row.best_relative_to_par,
+                "total_score": row.best_total_score
+            }
+        entries.append(entry)
+    
+    # Players with rounds first, lowest average to par on top
+    entries.sort(key=lambda e: (e.avg_relative_to_par is None, e.avg_relative_to_par or 0, e.username))
+    return entries
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+
+from sqlalchemy import select, text
+
+from database import init_db, async_session, engine, rebuild_hole_scores, User
+from feed import register_jobs as register_feed_jobs
+from handicap import rebuild_user_handicap
+from jobs import job_queue
+from stats import rebuild_all_stats
+
+async def rebuild_stats() -> None:
+    await init_db()
+    async with async_session() as db:
+        count = await rebuild_all_stats(db)
+        await db.commit()
+    print(f"Rebuilt stats for {count} users")
+
+async def rebuild_holes() -> None:
+    await init_db()
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_hole_scores)
+        count = (await conn.execute(text("SELECT count(*) FROM hole_scores"))).scalar_one()
+    print(f"Rebuilt {count} hole_scores rows")
+
+async def rebuild_handicaps() -> None:
+    await init_db()
+    async with async_session() as db:
+        user_ids = (await db.execute(select(User.id))).scalars().all()
+        for user_id in user_ids:
+            await rebuild_user_handicap(db, user_id)
+        await db.commit()
+    print(f"Rebuilt handicaps for {len(user_ids)} users")
+
+async def run_jobs() -> None:
+    await init_db()
+    register_feed_jobs(job_queue)
+    count = await job_queue.run_pending()
+    print(f"Ran {count} due jobs")
+
+COMMANDS = {
+    "rebuild-stats": (rebuild_stats, "Recompute user_stats and course_stats from scorecards"),
+    "rebuild-handicaps": (rebuild_handicaps, "Recompute user_handicaps from the latest score differentials"),
+    "rebuild-hole-scores": (rebuild_holes, "Recompute hole_scores from the scorecards' holes JSON"),
+    "run-jobs": (run_jobs, "Run every due background job once, e.g. with JOB_CONCURRENCY=0"),
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Golf Tracker maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args()
+
+    command, _ = COMMANDS[args.command]
+    asyncio.run(command())
+
+if __name__ == "__main__":
+    main()
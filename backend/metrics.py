@@ -0,0 +1,197 @@
+import contextvars
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger("golf.metrics")
+
+# Requests slower than this are logged with their slowest statements
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv("SLOW_REQUEST_TOP_QUERIES", "3"))
+# Long-lived streams would swamp the latency histogram
+UNTIMED_ROUTES = {"/events", "/metrics"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+class RequestStats:
+    # SQL issued while serving one request, filled in by the engine hooks
+    __slots__ = ("statements", "db_seconds", "queries")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.queries: List[Tuple[float, str]] = []
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts: Dict[tuple, List[int]] = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums: Dict[tuple, float] = defaultdict(float)
+
+    def observe(self, labels: tuple, value: float) -> None:
+        counts = self.counts[labels]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[labels] += value
+
+    def render(self, name: str, label_names: tuple) -> List[str]:
+        lines = []
+        for labels, counts in sorted(self.counts.items()):
+            label_text = _labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = _labels(label_names + ("le",), labels + (bound,))
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{label_text} {self.sums[labels]:.6f}")
+            lines.append(f"{name}_count{label_text} {cumulative}")
+        return lines
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}" if pairs else ""
+
+class Metrics:
+    def __init__(self):
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.request_statements = Histogram(STATEMENT_BUCKETS)
+        self.requests: Dict[tuple, int] = defaultdict(int)
+        self.db_statements: Dict[tuple, int] = defaultdict(int)
+        self.db_seconds: Dict[tuple, float] = defaultdict(float)
+        self.slow_requests = 0
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        self.requests[(method, route, status)] += 1
+        self.request_latency.observe((method, route), seconds)
+        self.request_statements.observe((method, route), stats.statements)
+        self.db_statements[(method, route)] += stats.statements
+        self.db_seconds[(method, route)] += stats.db_seconds
+        if seconds * 1000 >= SLOW_REQUEST_MS:
+            self.slow_requests += 1
+            top = sorted(stats.queries, reverse=True)[:SLOW_REQUEST_TOP_QUERIES]
+            logger.warning(
+                "Slow request %s %s -> %s in %.1f ms (%d statements, %.1f ms in DB)%s",
+                method, route, status, seconds * 1000, stats.statements, stats.db_seconds * 1000,
+                "".join(f"\n    {duration * 1000:8.1f} ms  {' '.join(sql.split())[:200]}" for duration, sql in top),
+            )
+
+    def render(self, gauges: Dict[str, float]) -> str:
+        route_labels = ("method", "route")
+        lines = [
+            "# HELP golf_http_requests_total Requests served, by route and status",
+            "# TYPE golf_http_requests_total counter",
+        ]
+        lines += [
+            f"golf_http_requests_total{_labels(route_labels + ('status',), key)} {count}"
+            for key, count in sorted(self.requests.items())
+        ]
+        lines += [
+            "# HELP golf_http_request_duration_seconds Request latency by route",
+            "# TYPE golf_http_request_duration_seconds histogram",
+        ]
+        lines += self.request_latency.render("golf_http_request_duration_seconds", route_labels)
+        lines += [
+            "# HELP golf_db_statements_per_request SQL statements issued per request",
+            "# TYPE golf_db_statements_per_request histogram",
+        ]
+        lines += self.request_statements.render("golf_db_statements_per_request", route_labels)
+        lines += [
+            "# HELP golf_db_statements_total SQL statements issued, by route",
+            "# TYPE golf_db_statements_total counter",
+        ]
+        lines += [
+            f"golf_db_statements_total{_labels(route_labels, key)} {count}"
+            for key, count in sorted(self.db_statements.items())
+        ]
+        lines += [
+            "# HELP golf_db_seconds_total Time spent executing SQL, by route",
+            "# TYPE golf_db_seconds_total counter",
+        ]
+        lines += [
+            f"golf_db_seconds_total{_labels(route_labels, key)} {seconds:.6f}"
+            for key, seconds in sorted(self.db_seconds.items())
+        ]
+        lines += [
+            "# HELP golf_slow_requests_total Requests slower than SLOW_REQUEST_MS",
+            "# TYPE golf_slow_requests_total counter",
+            f"golf_slow_requests_total {self.slow_requests}",
+        ]
+        for name, value in sorted(gauges.items()):
+            lines += [f"# TYPE golf_{name} gauge", f"golf_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def instrument_engine(engine) -> None:
+    # Count and time every statement against the request that issued it
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        record_statement(conn, statement)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def stop_timer_on_error(context):
+        # after_cursor_execute never runs for a statement that raised; without
+        # this its start time would stay on the pooled connection for good
+        if context.connection is not None and context.connection.info.get("query_start"):
+            record_statement(context.connection, context.statement)
+
+def record_statement(conn, statement: Optional[str]) -> None:
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += duration
+        stats.queries.append((duration, statement or ""))
+
+class MetricsMiddleware:
+    # Plain ASGI middleware, so streaming responses pass through untouched
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # The router stores the matched route in scope; unmatched paths
+            # share one label so random URLs can't grow the metric set
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            if path not in UNTIMED_ROUTES:
+                metrics.record(scope["method"], path, status, elapsed, stats)
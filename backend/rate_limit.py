@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "local" keeps buckets in this process, so each uvicorn worker allows the
+# full rate; "shared" keeps them in rate_limit_store.py for all workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "tcp://127.0.0.1:8766")
+RATE_LIMIT_STORE_TIMEOUT_SECONDS = float(os.getenv("RATE_LIMIT_STORE_TIMEOUT_SECONDS", "0.5"))
+# Burst size and sustained attempts per minute for each client IP and for
+# each account name tried, across /auth/login and /auth/register
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "5"))
+# Buckets kept per process; the least recently used go first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+def refill(tokens: float, updated: float, now: float, burst: int, per_second: float) -> float:
+    return min(burst, tokens + (now - updated) * per_second)
+
+class LocalBucketStore:
+    # Token buckets in an LRU dict: key -> (tokens, last update). A bucket
+    # evicted while drained comes back full, so the size bound trades a
+    # little precision for memory under a flood of distinct keys.
+
+    backend = "local"
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.evictions = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def take(self, key: str, burst: int, per_second: float) -> float:
+        return self.take_now(key, burst, per_second)
+
+    def take_now(self, key: str, burst: int, per_second: float) -> float:
+        # Take one token; 0 if there was one, else seconds until there is
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = refill(tokens, updated, now, burst, per_second)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            retry_after = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            retry_after = (1 - tokens) / per_second if per_second > 0 else float("inf")
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return retry_after
+
+    def metrics(self) -> dict:
+        return {"backend": self.backend, "keys": len(self._buckets), "evictions": self.evictions}
+
+class SharedBucketStore(LocalBucketStore):
+    # Asks rate_limit_store.py, one JSON line per take, so every worker
+    # draws on the same buckets. While the store is unreachable or slow the
+    # local buckets inherited from LocalBucketStore stand in, and a
+    # reconnect is tried at most once a second.
+
+    backend = "shared"
+
+    def __init__(self, url: str = RATE_LIMIT_STORE_URL, timeout: float = RATE_LIMIT_STORE_TIMEOUT_SECONDS):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port
+        self.timeout = timeout
+        self.reconnect_seconds = 1.0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+        self._next_connect = 0.0
+        self.fallbacks = 0
+
+    async def close(self) -> None:
+        self._disconnect()
+
+    def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def take(self, key: str, burst: int, per_second: float) -> float:
+        try:
+            return await asyncio.wait_for(self._request(key, burst, per_second), self.timeout)
+        except (OSError, ValueError, KeyError, asyncio.TimeoutError) as e:
+            # A timeout mid-exchange would leave a stale reply on the stream
+            self._disconnect()
+            self._next_connect = time.monotonic() + self.reconnect_seconds
+            if self.fallbacks == 0 or isinstance(e, asyncio.TimeoutError):
+                logger.warning("Rate limit store %s:%s unavailable: %r", self.host, self.port, e)
+            self.fallbacks += 1
+            return self.take_now(key, burst, per_second)
+
+    async def _request(self, key: str, burst: int, per_second: float) -> float:
+        async with self._lock:
+            if self._writer is None:
+                if time.monotonic() < self._next_connect:
+                    raise ConnectionError("waiting to reconnect")
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            request = {"key": key, "burst": burst, "per_second": per_second}
+            self._writer.write(json.dumps(request).encode() + b"\n")
+            await self._writer.drain()
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError("store closed the connection")
+            return float(json.loads(line)["retry_after"])
+
+    def metrics(self) -> dict:
+        return {**super().metrics(), "connected": self._writer is not None, "fallbacks": self.fallbacks}
+
+def create_bucket_store(backend: str = RATE_LIMIT_BACKEND) -> LocalBucketStore:
+    if backend == "local":
+        return LocalBucketStore()
+    if backend == "shared":
+        return SharedBucketStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+class RateLimiter:
+    # One bucket per client IP and one per account name. check() returns 0
+    # when the attempt may go ahead, else the seconds to wait; callers run
+    # it before touching the database or bcrypt, so a rejected attempt costs
+    # a dict lookup or one round trip to the store.
+
+    def __init__(self, store: LocalBucketStore, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected_ip = 0
+        self.rejected_user = 0
+
+    async def check(self, client_ip: str, username: str) -> float:
+        if not self.enabled:
+            return 0.0
+        retry_after = await self.store.take(f"ip:{client_ip}", RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE / 60)
+        if retry_after:
+            self.rejected_ip += 1
+            return retry_after
+        retry_after = await self.store.take(
+            f"user:{username.strip().lower()}", RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_MINUTE / 60
+        )
+        if retry_after:
+            self.rejected_user += 1
+            return retry_after
+        self.allowed += 1
+        return 0.0
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "allowed": self.allowed,
+            "rejected_ip": self.rejected_ip,
+            "rejected_user": self.rejected_user,
+            **self.store.metrics(),
+        }
+
+auth_rate_limiter = RateLimiter(create_bucket_store())
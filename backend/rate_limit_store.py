@@ -0,0 +1,42 @@
+"""Minimal shared token-bucket store for running several uvicorn workers with RATE_LIMIT_BACKEND=shared.
+
+Each request line is {"key", "burst", "per_second"}; the reply takes one
+token from that bucket and is {"retry_after": seconds}, 0 when allowed.
+Buckets live only in memory; it stands in for Redis or a similar store in
+local and single-host deployments.
+
+    python rate_limit_store.py        # listens on RATE_LIMIT_STORE_URL
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import urlparse
+
+from rate_limit import RATE_LIMIT_STORE_URL, LocalBucketStore
+
+logger = logging.getLogger("rate_limit_store")
+
+buckets = LocalBucketStore()
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while line := await reader.readline():
+            request = json.loads(line)
+            retry_after = buckets.take_now(request["key"], int(request["burst"]), float(request["per_second"]))
+            writer.write(json.dumps({"retry_after": retry_after}).encode() + b"\n")
+            await writer.drain()
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Dropping client: %r", e)
+    finally:
+        writer.close()
+
+async def serve(url: str = RATE_LIMIT_STORE_URL) -> None:
+    parsed = urlparse(url)
+    server = await asyncio.start_server(handle_client, parsed.hostname, parsed.port)
+    logger.info("Rate limit store listening on %s:%s", parsed.hostname, parsed.port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
@@ -0,0 +1,155 @@
+from collections import Counter
+from typing import List, Mapping, Optional
+
+from sqlalchemy import select, func, case, or_, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import User, Scorecard, Course, UserStats, CourseStats
+
+# Columns copied from a scorecard into the best_*/worst_* slots of UserStats
+ROUND_FIELDS = {
+    "scorecard_id": "id",
+    "course_name": "course_name",
+    "date_played": "date_played",
+    "relative_to_par": "relative_to_par",
+    "total_score": "total_score",
+}
+
+def _round_columns(prefix: str, round_: Optional[Mapping]) -> dict:
+    return {
+        f"{prefix}_{field}": round_[key] if round_ is not None else None
+        for field, key in ROUND_FIELDS.items()
+    }
+
+async def record_scorecards(db: AsyncSession, user_id: int, rounds: List[Mapping]) -> None:
+    # Fold newly inserted (and flushed) rounds into the user's aggregates with
+    # one upsert per table. Runs in the caller's transaction so the aggregates
+    # commit with the rounds. Each round maps the ROUND_FIELDS keys (id included)
+    # and course_id.
+    if not rounds:
+        return
+    # min/max keep the first of equal rounds, matching rebuild_user_stats' id order
+    best_round = min(rounds, key=lambda r: r["relative_to_par"])
+    worst_round = max(rounds, key=lambda r: r["relative_to_par"])
+    stmt = insert(UserStats).values(
+        user_id=user_id,
+        total_rounds=len(rounds),
+        sum_relative_to_par=sum(r["relative_to_par"] for r in rounds),
+        **_round_columns("best", best_round),
+        **_round_columns("worst", worst_round),
+    )
+    is_better = or_(
+        UserStats.best_relative_to_par.is_(None),
+        stmt.excluded.best_relative_to_par < UserStats.best_relative_to_par,
+    )
+    is_worse = or_(
+        UserStats.worst_relative_to_par.is_(None),
+        stmt.excluded.worst_relative_to_par > UserStats.worst_relative_to_par,
+    )
+    set_ = {
+        "total_rounds": UserStats.total_rounds + stmt.excluded.total_rounds,
+        "sum_relative_to_par": UserStats.sum_relative_to_par + stmt.excluded.sum_relative_to_par,
+    }
+    for prefix, condition in (("best", is_better), ("worst", is_worse)):
+        for field in ROUND_FIELDS:
+            column = f"{prefix}_{field}"
+            set_[column] = case(
+                (condition, stmt.excluded[column]),
+                else_=getattr(UserStats, column),
+            )
+    await db.execute(stmt.on_conflict_do_update(index_elements=[UserStats.user_id], set_=set_))
+
+    course_counts = Counter(r["course_id"] for r in rounds)
+    course_stmt = insert(CourseStats)
+    await db.execute(
+        course_stmt.on_conflict_do_update(
+            index_elements=[CourseStats.user_id, CourseStats.course_id],
+            set_={"rounds_played": CourseStats.rounds_played + course_stmt.excluded.rounds_played},
+        ),
+        [
+            {"user_id": user_id, "course_id": course_id, "rounds_played": count}
+            for course_id, count in course_counts.items()
+        ],
+    )
+
+async def rebuild_user_stats(db: AsyncSession, user_id: int) -> None:
+    # Recompute a user's aggregates from their scorecards. Update and delete
+    # paths call this, since removing a best/worst round can't be undone
+    # incrementally.
+    await db.execute(delete(CourseStats).where(CourseStats.user_id == user_id))
+    await db.execute(delete(UserStats).where(UserStats.user_id == user_id))
+
+    result = await db.execute(
+        select(func.count(Scorecard.id), func.coalesce(func.sum(Scorecard.relative_to_par), 0))
+        .where(Scorecard.user_id == user_id)
+    )
+    total_rounds, sum_relative_to_par = result.one()
+
+    round_columns = (Scorecard.id, Scorecard.course_name, Scorecard.date_played,
+                     Scorecard.relative_to_par, Scorecard.total_score)
+    result = await db.execute(
+        select(*round_columns)
+        .where(Scorecard.user_id == user_id)
+        .order_by(Scorecard.relative_to_par.asc(), Scorecard.id.asc())
+        .limit(1)
+    )
+    best_round = result.mappings().first()
+    result = await db.execute(
+        select(*round_columns)
+        .where(Scorecard.user_id == user_id)
+        .order_by(Scorecard.relative_to_par.desc(), Scorecard.id.asc())
+        .limit(1)
+    )
+    worst_round = result.mappings().first()
+
+    await db.execute(insert(UserStats).values(
+        user_id=user_id,
+        total_rounds=total_rounds,
+        sum_relative_to_par=sum_relative_to_par,
+        **_round_columns("best", best_round),
+        **_round_columns("worst", worst_round),
+    ))
+
+    await db.execute(
+        insert(CourseStats).from_select(
+            ["user_id", "course_id", "rounds_played"],
+            select(Scorecard.user_id, Scorecard.course_id, func.count(Scorecard.id))
+            .where(Scorecard.user_id == user_id)
+            .group_by(Scorecard.user_id, Scorecard.course_id),
+        )
+    )
+
+async def rebuild_all_stats(db: AsyncSession) -> int:
+    result = await db.execute(select(User.id))
+    user_ids = result.scalars().all()
+    for user_id in user_ids:
+        await rebuild_user_stats(db, user_id)
+    return len(user_ids)
+
+async def backfill_missing_stats(db: AsyncSession) -> int:
+    # Databases created before the aggregate tables existed have rounds with no
+    # UserStats row; record_scorecards relies on a missing row meaning zero rounds.
+    result = await db.execute(
+        select(Scorecard.user_id)
+        .where(~select(UserStats.user_id).where(UserStats.user_id == Scorecard.user_id).exists())
+        .distinct()
+    )
+    user_ids = result.scalars().all()
+    for user_id in user_ids:
+        await rebuild_user_stats(db, user_id)
+    return len(user_ids)
+
+async def get_user_stats(db: AsyncSession, user_id: int) -> UserStats:
+    user_stats = await db.get(UserStats, user_id)
+    if user_stats is None:
+        return UserStats(user_id=user_id, total_rounds=0, sum_relative_to_par=0)
+    return user_stats
+
+async def get_courses_played(db: AsyncSession, user_id: int) -> dict:
+    result = await db.execute(
+        select(Course.name, CourseStats.rounds_played)
+        .join(Course, Course.id == CourseStats.course_id)
+        .where(CourseStats.user_id == user_id, CourseStats.rounds_played > 0)
+    )
+    return {course_name: rounds_played for course_name, rounds_played in result.all()}
@@ -0,0 +1,74 @@
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The app binds its engine at import, so the scratch database and settings
+# must be in place before main is imported anywhere in the suite
+TMP_DIR = tempfile.mkdtemp(prefix="golf-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+# Jobs and revocation syncs are driven by the tests that need them
+os.environ["JOB_CONCURRENCY"] = "0"
+os.environ["REVOCATION_SYNC_SECONDS"] = "3600"
+# Every test client shares one IP; tests/test_rate_limit.py swaps in enabled limiters
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from database import engine
+
+HOLES = [{"hole_number": n, "par": 4, "score": 4 + n % 2} for n in range(1, 19)]
+PASSWORD = "test-password"
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes minutes; deselect with -m 'not slow'")
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # One event loop for the whole session: the engine and app globals live on it
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+async def client(anyio_backend):
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    await main.shutdown_event()
+    await engine.dispose()
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+async def register(client: httpx.AsyncClient, prefix: str = "user") -> dict:
+    # A fresh user; the database is shared by the whole session
+    username = f"{prefix}{uuid.uuid4().hex[:8]}"
+    response = await client.post("/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": PASSWORD,
+    })
+    assert response.status_code == 200, response.text
+    user = response.json()
+    response = await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    tokens = response.json()
+    user["tokens"] = tokens
+    user["headers"] = {"Authorization": f"Bearer {tokens['access_token']}"}
+    return user
+
+@pytest.fixture
+async def user(client) -> dict:
+    return await register(client)
+
+async def post_round(client: httpx.AsyncClient, user: dict, date_played: str, **fields) -> dict:
+    response = await client.post("/scorecards", headers=user["headers"], json={
+        "course_name": "Test Links", "date_played": date_played, "holes": HOLES, **fields,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def befriend(client: httpx.AsyncClient, user: dict, friend: dict) -> None:
+    response = await client.post("/friends", headers=user["headers"], json={"friend_code": friend["friend_code"]})
+    assert response.status_code == 200, response.text
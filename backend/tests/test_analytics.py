@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import post_round, register
+
+pytestmark = pytest.mark.anyio
+
+def nine_holes(scores: list) -> list:
+    pars = [4, 3, 5, 4, 4, 3, 5, 4, 4]
+    return [{"hole_number": n, "par": par, "score": score} for n, (par, score) in enumerate(zip(pars, scores), start=1)]
+
+async def test_empty_history(client, user):
+    analytics = (await client.get("/scorecards/analytics", headers=user["headers"])).json()
+    assert analytics["total_rounds"] == analytics["total_holes"] == 0
+    assert analytics["courses"] == analytics["trend"] == analytics["scoring_by_par"] == []
+    assert set(analytics["score_distribution"].values()) == {0}
+
+async def test_hole_stats_group_by_par_course_and_hole(client, user):
+    # Posted out of date order: the trend follows date_played, holes follow their round
+    rounds = [
+        ("2024-05-03T08:00:00", "North Links", [4, 3, 5, 4, 4, 3, 5, 4, 4]),
+        ("2024-05-01T08:00:00", "North Links", [5, 2, 6, 4, 6, 3, 3, 4, 7]),
+        ("2024-05-02T08:00:00", "South Links", [3, 4, 5, 5, 4, 3, 5, 4, 4]),
+    ]
+    created = [await post_round(client, user, date, course_name=course, holes=nine_holes(scores))
+               for date, course, scores in rounds]
+    response = await client.get("/scorecards/analytics", headers=user["headers"], params={"window": 2})
+    analytics = response.json()
+
+    assert analytics["total_rounds"] == 3 and analytics["total_holes"] == 27
+    assert analytics["score_distribution"] == {
+        "eagle_or_better": 1, "birdie": 2, "par": 18, "bogey": 4, "double_bogey": 1, "triple_or_worse": 1,
+    }
+    assert analytics["scoring_by_par"] == [
+        {"par": 3, "holes_played": 6, "avg_score": 3.0, "avg_to_par": 0.0},
+        {"par": 4, "holes_played": 15, "avg_score": 4.4, "avg_to_par": 0.4},
+        {"par": 5, "holes_played": 6, "avg_score": 4.83, "avg_to_par": -0.17},
+    ]
+
+    north, south = sorted(analytics["courses"], key=lambda course: course["course_name"])
+    assert (north["course_name"], north["rounds"], south["rounds"]) == ("North Links", 2, 1)
+    assert [h["hole_number"] for h in north["holes"]] == list(range(1, 10))
+    assert north["holes"][0] == {"hole_number": 1, "times_played": 2, "avg_score": 4.5, "avg_to_par": 0.5}
+    assert north["holes"][8] == {"hole_number": 9, "times_played": 2, "avg_score": 5.5, "avg_to_par": 1.5}
+    assert south["holes"][0] == {"hole_number": 1, "times_played": 1, "avg_score": 3.0, "avg_to_par": -1.0}
+
+    by_date = [created[1], created[2], created[0]]
+    assert [point["scorecard_id"] for point in analytics["trend"]] == [sc["id"] for sc in by_date]
+    assert [point["relative_to_par"] for point in analytics["trend"]] == [4, 1, 0]
+    assert [point["rolling_avg"] for point in analytics["trend"]] == [4.0, 2.5, 0.5]
+    assert analytics["trend_slope_per_round"] == -2.0
+
+async def test_other_users_holes_are_not_counted(client, user):
+    other = await register(client)
+    await post_round(client, other, "2024-05-01T08:00:00", holes=nine_holes([9] * 9))
+    await post_round(client, user, "2024-05-01T08:00:00", holes=nine_holes([4, 3, 5, 4, 4, 3, 5, 4, 4]))
+    analytics = (await client.get("/scorecards/analytics", headers=user["headers"])).json()
+    assert analytics["total_holes"] == 9
+    assert analytics["score_distribution"]["par"] == 9
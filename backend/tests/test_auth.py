@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import register
+from database import async_session
+from tokens import RevocationList, new_jti, revoked_tokens
+
+pytestmark = pytest.mark.anyio
+
+async def test_refresh_token_works_once(client, user):
+    refresh_token = user["tokens"]["refresh_token"]
+    response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    tokens = response.json()
+    me = await client.get("/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert me.json()["username"] == user["username"]
+
+    response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+    # The pair it was exchanged for still works
+    response = await client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+
+async def test_access_token_is_not_a_refresh_token(client, user):
+    response = await client.post("/auth/refresh", json={"refresh_token": user["tokens"]["access_token"]})
+    assert response.status_code == 401
+
+async def test_logout_revokes_both_tokens(client):
+    user = await register(client)
+    response = await client.post("/auth/logout", headers=user["headers"],
+                                 json={"refresh_token": user["tokens"]["refresh_token"]})
+    assert response.status_code == 204
+    assert (await client.get("/auth/me", headers=user["headers"])).status_code == 401
+    response = await client.post("/auth/refresh", json={"refresh_token": user["tokens"]["refresh_token"]})
+    assert response.status_code == 401
+
+async def test_other_workers_see_revocations_after_the_newest_is_pruned(client, user):
+    # Another worker's list, in sync with everything revoked so far
+    other_worker = RevocationList()
+    now = datetime.utcnow()
+    async with async_session() as db:
+        await revoked_tokens.revoke(db, new_jti(), user["id"], now - timedelta(seconds=1))
+        await db.commit()
+        await other_worker.sync(db)
+        # The newest row has expired; pruning it must not free its id
+        await revoked_tokens.prune(db)
+        await db.commit()
+
+        jti = new_jti()
+        await revoked_tokens.revoke(db, jti, user["id"], now + timedelta(minutes=30))
+        await db.commit()
+        await other_worker.sync(db)
+    assert other_worker.is_revoked(jti)
+
+async def test_revocation_applies_only_once_committed(client, user):
+    revocations = RevocationList()
+    expires_at = datetime.utcnow() + timedelta(minutes=30)
+    rolled_back, committed = new_jti(), new_jti()
+    async with async_session() as db:
+        assert await revocations.revoke(db, rolled_back, user["id"], expires_at)
+        assert not revocations.is_revoked(rolled_back)
+        await db.rollback()
+        assert await revocations.revoke(db, committed, user["id"], expires_at)
+        await db.commit()
+        assert revocations.is_revoked(committed)
+        # Nor does the rolled-back one come back from the table
+        await revocations.sync(db)
+    assert not revocations.is_revoked(rolled_back)
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import main
+from conftest import HOLES, post_round, register
+
+pytestmark = pytest.mark.anyio
+
+def ndjson_row(day: int, course_name: str = "Bulk Links") -> bytes:
+    return json.dumps({
+        "course_name": course_name, "date_played": f"2024-02-{day:02d}T08:00:00", "holes": HOLES,
+    }).encode() + b"\n"
+
+async def test_rows_import_and_bad_rows_are_reported(client, user):
+    body = ndjson_row(1) + b"{not json\n" + ndjson_row(2) + b'{"course_name": "No holes"}\n'
+    response = await client.post("/scorecards/bulk", headers={**user["headers"], "Content-Type": "application/x-ndjson"},
+                                 content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert [error["row"] for error in result["errors"]] == [2, 4]
+    stats = (await client.get("/scorecards/stats", headers=user["headers"])).json()
+    assert stats["total_rounds"] == 2
+
+async def test_too_many_rows_imports_nothing(client, user, monkeypatch):
+    monkeypatch.setattr(main, "BULK_MAX_ROWS", 2)
+    monkeypatch.setattr(main, "BULK_BATCH_SIZE", 1)
+    response = await client.post("/scorecards/bulk", headers={**user["headers"], "Content-Type": "application/x-ndjson"},
+                                 content=ndjson_row(1) + ndjson_row(2) + ndjson_row(3))
+    assert response.status_code == 413
+    assert (await client.get("/scorecards", headers=user["headers"])).json() == []
+
+async def test_slow_upload_does_not_block_other_writers(client, user, monkeypatch):
+    # Batches of one: the old handler inserted row 1 and then waited on the
+    # client with SQLite's write lock held
+    monkeypatch.setattr(main, "BULK_BATCH_SIZE", 1)
+    other = await register(client)
+    sent_first_rows = asyncio.Event()
+    finish_upload = asyncio.Event()
+
+    async def slow_body():
+        yield ndjson_row(1) + ndjson_row(2)
+        sent_first_rows.set()
+        await finish_upload.wait()
+        yield ndjson_row(3)
+
+    upload = asyncio.ensure_future(client.post(
+        "/scorecards/bulk", headers={**user["headers"], "Content-Type": "application/x-ndjson"}, content=slow_body()
+    ))
+    await sent_first_rows.wait()
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    await post_round(client, other, "2024-02-10T08:00:00")
+    assert time.perf_counter() - start < 1
+    finish_upload.set()
+    response = await upload
+    assert response.status_code == 200 and response.json()["imported"] == 3
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import main
+from coalescing import RequestCoalescer
+from conftest import post_round
+
+pytestmark = pytest.mark.anyio
+
+class Computation:
+    # Counts its runs and holds each one until released
+    def __init__(self, result="result"):
+        self.result = result
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+async def test_followers_share_the_leaders_result():
+    coalescer, compute = RequestCoalescer(), Computation()
+    requests = [asyncio.ensure_future(coalescer.run("key", compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await asyncio.gather(*requests) == ["result"] * 3
+    assert compute.runs == 1
+    assert coalescer.metrics() == {"in_flight": 0, "computed": 1, "coalesced": 2}
+    # Done computations are not reused
+    assert await coalescer.run("key", compute) == "result" and compute.runs == 2
+
+async def test_different_keys_compute_separately():
+    coalescer, compute = RequestCoalescer(), Computation()
+    requests = [asyncio.ensure_future(coalescer.run(key, compute)) for key in ("a", "b")]
+    await asyncio.sleep(0)
+    compute.release.set()
+    await asyncio.gather(*requests)
+    assert compute.runs == 2 and coalescer.coalesced == 0
+
+async def test_leader_error_reaches_every_follower():
+    coalescer, compute = RequestCoalescer(), Computation(ValueError("boom"))
+    requests = [asyncio.ensure_future(coalescer.run("key", compute)) for _ in range(2)]
+    await asyncio.sleep(0)
+    compute.release.set()
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert compute.runs == 1 and coalescer.metrics()["in_flight"] == 0
+
+async def test_follower_recomputes_when_the_leader_is_cancelled():
+    coalescer, compute = RequestCoalescer(), Computation()
+    leader = asyncio.ensure_future(coalescer.run("key", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(coalescer.run("key", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await follower == "result"
+    assert leader.cancelled() and compute.runs == 2
+
+async def test_cancelled_follower_leaves_the_leader_running():
+    coalescer, compute = RequestCoalescer(), Computation()
+    leader = asyncio.ensure_future(coalescer.run("key", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(coalescer.run("key", compute))
+    await asyncio.sleep(0)
+    follower.cancel()
+    await asyncio.sleep(0)
+    compute.release.set()
+    assert await leader == "result"
+    assert follower.cancelled() and compute.runs == 1
+
+async def test_identical_requests_in_flight_share_one_build(client, user, monkeypatch):
+    await post_round(client, user, "2024-03-01T08:00:00")
+    build_stats, release, builds = main.build_stats, asyncio.Event(), []
+
+    async def held_build_stats(db, user_id):
+        builds.append(user_id)
+        await release.wait()
+        return await build_stats(db, user_id)
+
+    monkeypatch.setattr(main, "build_stats", held_build_stats)
+    requests = [asyncio.ensure_future(client.get("/scorecards/stats", headers=user["headers"])) for _ in range(2)]
+    while not builds:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    release.set()
+    first, second = await asyncio.gather(*requests)
+    assert builds == [user["id"]]
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() and first.json()["total_rounds"] == 1
@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import HOLES, post_round
+from courses import assign_courses, course_cache, find_course
+from database import async_session
+
+pytestmark = pytest.mark.anyio
+
+async def test_course_names_are_normalized_to_one_catalog_entry(client, user):
+    first = await post_round(client, user, "2024-08-01T08:00:00", course_name="Royal  Links")
+    second = await post_round(client, user, "2024-08-02T08:00:00", course_name="royal links ")
+    assert first["course_id"] == second["course_id"]
+    assert second["course_name"] == "Royal Links"
+
+async def test_rolled_back_course_is_never_cached(client, user):
+    # A rollback frees the course's id, and SQLite hands it to the next new course
+    async with async_session() as db:
+        rounds = [{"course_name": "Ghost Links", "holes": HOLES}]
+        await assign_courses(db, rounds)
+        ghost_id = rounds[0]["course_id"]
+        assert await find_course(db, "Ghost Links") is not None
+        await db.rollback()
+    assert course_cache.get("ghost links") is None
+
+    other = await post_round(client, user, "2024-08-03T08:00:00", course_name="Other Links")
+    ghost = await post_round(client, user, "2024-08-04T08:00:00", course_name="Ghost Links")
+    assert other["course_id"] == ghost_id
+    assert ghost["course_id"] != other["course_id"]
+    stats = (await client.get("/scorecards/stats", headers=user["headers"])).json()
+    assert stats["courses_played"] == {"Other Links": 1, "Ghost Links": 1}
+
+async def test_committed_course_is_cached(client, user):
+    await post_round(client, user, "2024-08-05T08:00:00", course_name="Cached Links")
+    course = course_cache.get("cached links")
+    assert course is not None and course.name == "Cached Links"
@@ -0,0 +1,102 @@
+import asyncio
+import signal
+
+import pytest
+
+import main
+from conftest import befriend, post_round, register
+from events import BrokerEventBus, LocalEventBus, end_streams_on_server_exit, event_bus, rounds_channel, user_channel
+
+pytestmark = pytest.mark.anyio
+
+async def test_subscribers_get_their_channels_events():
+    bus = LocalEventBus()
+    subscription = bus.subscribe(["user:1", "rounds:2"])
+    bus.publish("rounds:2", {"type": "friend_round"})
+    bus.publish("rounds:3", {"type": "friend_round"})
+    assert await subscription.get(1) == {"type": "friend_round"}
+    assert await subscription.get(0.01) is None and not subscription.ended
+    subscription.close()
+    assert bus.metrics()["subscriptions"] == 0
+
+async def test_ending_streams_wakes_every_subscription():
+    bus = LocalEventBus()
+    waiting = bus.subscribe(["user:1"])
+    full = bus.subscribe(["user:2"])
+    for i in range(full.queue.maxsize):
+        bus.publish("user:2", {"n": i})
+    reader = asyncio.ensure_future(waiting.get(30))
+    await asyncio.sleep(0)
+    bus.end_streams()
+    assert await asyncio.wait_for(reader, 1) is None and waiting.ended
+    # A full queue gives up its oldest event for the end marker
+    events = [await full.get(1) for _ in range(full.queue.maxsize)]
+    assert events[0] == {"n": 1} and events[-1] is None and full.ended
+    # Nothing new outlives the shutdown either
+    assert bus.subscribe(["user:3"]).ended
+
+async def test_unstarted_response_leaves_no_subscription(client, user):
+    subscriptions = event_bus.metrics()["subscriptions"]
+    response = await main.get_events(token=user["tokens"]["access_token"], header_token=None)
+    assert event_bus.metrics()["subscriptions"] == subscriptions
+    await response.body_iterator.aclose()
+
+async def test_stream_delivers_events_and_ends_at_shutdown(client, user):
+    friend = await register(client)
+    await befriend(client, user, friend)
+    stream = asyncio.ensure_future(client.get("/events", params={"token": user["tokens"]["access_token"]}))
+    while user_channel(user["id"]) not in event_bus._subscribers:
+        await asyncio.sleep(0.01)
+    scorecard = await post_round(client, friend, "2024-04-01T08:00:00")
+    try:
+        event_bus.end_streams()
+        response = await asyncio.wait_for(stream, 5)
+    finally:
+        await event_bus.start()
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert f'"id": {scorecard["id"]}' in response.text
+    assert "event: friend_round" in response.text
+    assert user_channel(user["id"]) not in event_bus._subscribers
+    assert rounds_channel(friend["id"]) not in event_bus._subscribers
+
+async def test_server_exit_signal_ends_streams():
+    # Stands in for uvicorn's handle_exit, which the hook chains onto
+    exits = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: exits.append(signum))
+    try:
+        bus = LocalEventBus()
+        end_streams_on_server_exit(bus)
+        end_streams_on_server_exit(bus)
+        subscription = bus.subscribe(["user:1"])
+        signal.raise_signal(signal.SIGTERM)
+        assert exits == [signal.SIGTERM]
+        assert await subscription.get(1) is None and subscription.ended
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+async def test_slow_broker_fills_the_outbox_not_the_socket_buffer():
+    # A broker that never reads: drain() blocks, the outbox fills, the rest drops
+    stalled = asyncio.Event()
+
+    async def never_read(reader, writer):
+        await stalled.wait()
+        writer.close()
+
+    server = await asyncio.start_server(never_read, "127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    bus = BrokerEventBus(f"tcp://{host}:{port}", outbox_size=5)
+    await bus.start()
+    try:
+        while not bus.metrics()["connected"]:
+            await asyncio.sleep(0.01)
+        event = {"type": "big", "data": "x" * 65536}
+        for _ in range(400):
+            bus.publish("user:1", event)
+            await asyncio.sleep(0)
+        assert bus.metrics()["outbox"] == 5 and bus.dropped > 0
+        assert bus._writer.transport.get_write_buffer_size() < 4 * 65536
+    finally:
+        stalled.set()
+        await bus.close()
+        server.close()
+        await server.wait_closed()
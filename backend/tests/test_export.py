@@ -0,0 +1,159 @@
+import asyncio
+import csv
+import io
+import json
+import sqlite3
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from conftest import HOLES, post_round, register
+from database import engine
+
+pytestmark = pytest.mark.anyio
+
+# A history ten times the baseline user's must export within
+# EXPORT_MEMORY_GROWTH_MB of the baseline's peak; buffering it would take
+# over 10 MB of rows. The full-size history, marked slow, only has to stay
+# under the ceiling.
+EXPORT_TEST_ROUNDS = 10_000
+EXPORT_BASELINE_ROUNDS = 1_000
+EXPORT_FULL_HISTORY_ROUNDS = 100_000
+EXPORT_MEMORY_GROWTH_MB = 2
+EXPORT_MEMORY_CEILING_MB = 16
+
+def seed_rounds(user_id: int, rounds: int) -> None:
+    # Straight through sqlite3: posting 10k rounds would dominate the suite
+    conn = sqlite3.connect(engine.url.database)
+    start = datetime(2000, 1, 1)
+    holes = json.dumps(HOLES)
+    total_score, total_par = sum(h["score"] for h in HOLES), sum(h["par"] for h in HOLES)
+    with conn:
+        first_id = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM scorecards").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO scorecards (id, user_id, course_name, date_played, holes, total_score, total_par, "
+            "relative_to_par, created_at) VALUES (?, ?, 'Seeded Links', ?, ?, ?, ?, ?, ?)",
+            (
+                (first_id + i, user_id, (start + timedelta(hours=i)).isoformat(sep=" "), holes,
+                 total_score, total_par, total_score - total_par, start.isoformat(sep=" "))
+                for i in range(rounds)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO hole_scores (scorecard_id, user_id, hole_number, par, score) VALUES (?, ?, ?, ?, ?)",
+            ((first_id + i, user_id, h["hole_number"], h["par"], h["score"]) for i in range(rounds) for h in HOLES),
+        )
+    conn.close()
+
+async def download(path: str, headers: dict) -> tuple:
+    # httpx's ASGI transport buffers the whole body, which is what this
+    # measures; count the bytes and let each chunk go
+    query_headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": url_path, "raw_path": url_path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"test"), *query_headers],
+        "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    received = {"status": None, "bytes": 0, "lines": 0}
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # The request once, then block: Starlette polls receive for a disconnect
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["lines"] += body.count(b"\n")
+            if not message.get("more_body", False):
+                finished.set()
+
+    await main.app(scope, receive, send)
+    return received["status"], received["bytes"], received["lines"]
+
+@pytest.fixture(scope="module")
+async def histories(client):
+    users = {}
+    for rounds in (EXPORT_BASELINE_ROUNDS, EXPORT_TEST_ROUNDS):
+        users[rounds] = await register(client, "export")
+        seed_rounds(users[rounds]["id"], rounds)
+    return users
+
+async def export_peak_mb(user: dict, format: str) -> tuple:
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        status, _, lines = await download(f"/scorecards/export?format={format}", user["headers"])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert status == 200
+    return (peak - baseline) / 2 ** 20, lines
+
+@pytest.mark.parametrize("format, header_lines, rows_per_line", [("csv", 1, 1), ("ndjson", 0, 1), ("columnar", 1, 1000)])
+async def test_export_memory_does_not_grow_with_history(histories, format, header_lines, rows_per_line):
+    baseline_peak, _ = await export_peak_mb(histories[EXPORT_BASELINE_ROUNDS], format)
+    peak, lines = await export_peak_mb(histories[EXPORT_TEST_ROUNDS], format)
+    assert lines == header_lines + EXPORT_TEST_ROUNDS // rows_per_line
+    assert peak < baseline_peak + EXPORT_MEMORY_GROWTH_MB
+    assert peak < EXPORT_MEMORY_CEILING_MB
+
+@pytest.fixture(scope="module")
+async def full_history(client):
+    user = await register(client, "export")
+    seed_rounds(user["id"], EXPORT_FULL_HISTORY_ROUNDS)
+    return user
+
+@pytest.mark.slow
+@pytest.mark.parametrize("format, header_lines, rows_per_line", [("csv", 1, 1), ("ndjson", 0, 1), ("columnar", 1, 1000)])
+async def test_full_history_export_stays_under_the_memory_ceiling(full_history, format, header_lines, rows_per_line):
+    peak, lines = await export_peak_mb(full_history, format)
+    assert lines == header_lines + EXPORT_FULL_HISTORY_ROUNDS // rows_per_line
+    assert peak < EXPORT_MEMORY_CEILING_MB
+
+async def test_csv_flattens_holes_into_columns(client, user):
+    await post_round(client, user, "2024-09-01T08:00:00", notes="windy,\nthen rain")
+    response = await client.get("/scorecards/export", headers=user["headers"], params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["notes"] == "windy,\nthen rain"
+    assert [(int(rows[0][f"hole_{n}_par"]), int(rows[0][f"hole_{n}_score"])) for n in range(1, 19)] == [
+        (h["par"], h["score"]) for h in HOLES
+    ]
+    assert response.headers["content-disposition"] == 'attachment; filename="scorecards.csv"'
+
+async def test_export_skips_hole_numbers_it_has_no_column_for(client):
+    # A round saved before hole numbers were validated
+    user = await register(client)
+    holes = [{"hole_number": 1, "par": 4, "score": 5}, {"hole_number": 2, "par": 3, "score": 3},
+             {"hole_number": 0, "par": 5, "score": 9}, {"hole_number": 2, "par": 5, "score": 9}]
+    conn = sqlite3.connect(engine.url.database)
+    with conn:
+        conn.execute(
+            "INSERT INTO scorecards (user_id, course_name, date_played, holes, total_score, total_par, "
+            "relative_to_par, created_at) VALUES (?, 'Legacy Links', '2020-01-01 08:00:00', ?, 26, 17, 9, "
+            "'2020-01-01 08:00:00')", (user["id"], json.dumps(holes)),
+        )
+        scorecard_id = conn.execute("SELECT max(id) FROM scorecards").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO hole_scores (scorecard_id, user_id, hole_number, par, score) VALUES (?, ?, ?, ?, ?)",
+            [(scorecard_id, user["id"], h["hole_number"], h["par"], h["score"]) for h in holes],
+        )
+    conn.close()
+    response = await client.get("/scorecards/export", headers=user["headers"], params={"format": "csv"})
+    row = next(csv.DictReader(io.StringIO(response.text)))
+    assert (row["hole_1_par"], row["hole_1_score"], row["hole_2_par"], row["hole_2_score"]) == ("4", "5", "3", "3")
+    assert "hole_0_par" not in row and "hole_3_par" not in row
@@ -0,0 +1,50 @@
+import pytest
+
+import fast_json
+from conftest import befriend, post_round, register
+
+pytestmark = pytest.mark.anyio
+
+PATHS = [
+    "/scorecards",
+    "/scorecards?fields=summary",
+    "/scorecards?limit=2",
+    "/scorecards?fields=summary&limit=2",
+    "/dashboard",
+]
+
+@pytest.fixture
+async def golfer(client) -> dict:
+    golfer, friend = await register(client), await register(client)
+    await befriend(client, golfer, friend)
+    await post_round(client, golfer, "2024-07-01T08:00:00")
+    await post_round(client, golfer, "2024-07-02T08:30:00", course_name="Königsbrück Golfclub")
+    await post_round(client, golfer, "2024-07-03T09:15:00", course_name="Dunes \"Old\" Course")
+    return golfer
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+@pytest.mark.parametrize("path", PATHS)
+async def test_fast_json_matches_the_response_models(client, golfer, monkeypatch, backend, path):
+    if backend == "json":
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    responses = {}
+    for fast in (False, True):
+        monkeypatch.setattr(fast_json, "FAST_JSON", fast)
+        response = await client.get(path, headers=golfer["headers"])
+        assert response.status_code == 200, response.text
+        responses[fast] = response
+    slow, fast = responses[False], responses[True]
+    assert fast.content == slow.content
+    for header in ("ETag", "Cache-Control", "X-Next-Cursor", "Content-Type"):
+        assert fast.headers.get(header) == slow.headers.get(header)
+    assert slow.headers["ETag"]
+
+@pytest.mark.parametrize("path", ["/scorecards", "/dashboard"])
+async def test_fast_json_honours_if_none_match(client, golfer, monkeypatch, path):
+    etag = (await client.get(path, headers=golfer["headers"])).headers["ETag"]
+    monkeypatch.setattr(fast_json, "FAST_JSON", True)
+    response = await client.get(path, headers={**golfer["headers"], "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy import select
+
+import feed
+import main
+from conftest import befriend, post_round, register
+from database import async_session, FeedEntry
+
+pytestmark = pytest.mark.anyio
+
+async def feed_ids(client, user: dict, **params) -> list:
+    response = await client.get("/feed", headers=user["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return [item["id"] for item in response.json()]
+
+async def timeline(owner_id: int) -> list:
+    async with async_session() as db:
+        result = await db.execute(
+            select(FeedEntry.scorecard_id).where(FeedEntry.owner_id == owner_id).order_by(FeedEntry.scorecard_id)
+        )
+        return result.scalars().all()
+
+async def test_new_round_fans_out_to_every_friend_only(client):
+    author, first, second, stranger = [await register(client) for _ in range(4)]
+    await befriend(client, first, author)
+    await befriend(client, second, author)
+    await main.job_queue.run_pending()
+
+    scorecard = await post_round(client, author, "2024-05-01T08:00:00")
+    await main.job_queue.run_pending()
+    assert await timeline(first["id"]) == [scorecard["id"]]
+    assert await timeline(second["id"]) == [scorecard["id"]]
+    assert await timeline(stranger["id"]) == []
+    # A round is in friends' feeds, not the author's own
+    assert await timeline(author["id"]) == []
+    assert await feed_ids(client, first) == [scorecard["id"]]
+
+async def test_friendship_backfills_both_timelines_after_the_job(client, monkeypatch):
+    monkeypatch.setattr(feed, "FEED_BACKFILL_ROUNDS", 2)
+    user, friend = await register(client), await register(client)
+    user_rounds = [await post_round(client, user, f"2024-05-0{day}T08:00:00") for day in (1, 2)]
+    friend_rounds = [await post_round(client, friend, f"2024-05-0{day}T08:00:00") for day in (1, 2, 3)]
+    await main.job_queue.run_pending()
+
+    await befriend(client, user, friend)
+    assert await feed_ids(client, user) == []
+    await main.job_queue.run_pending()
+    # Only the latest FEED_BACKFILL_ROUNDS of each side are copied
+    assert await feed_ids(client, user) == [r["id"] for r in reversed(friend_rounds[1:])]
+    assert await feed_ids(client, friend) == [r["id"] for r in reversed(user_rounds)]
+
+async def test_backfill_skips_rounds_already_fanned_out(client):
+    user, friend = await register(client), await register(client)
+    await befriend(client, user, friend)
+    scorecard = await post_round(client, friend, "2024-05-01T08:00:00")
+    # Fan-out and backfill both queued; whichever runs second conflicts and skips
+    await main.job_queue.run_pending()
+    assert await timeline(user["id"]) == [scorecard["id"]]
+    async with async_session() as db:
+        await feed.backfill_friendship_feeds(db, user["id"], friend["id"])
+        await db.commit()
+    assert await timeline(user["id"]) == [scorecard["id"]]
+
+async def test_high_degree_author_is_pulled_instead_of_fanned_out(client, monkeypatch):
+    monkeypatch.setattr(feed, "FEED_FANOUT_MAX_FRIENDS", 0)
+    author, reader = await register(client), await register(client)
+    await befriend(client, reader, author)
+    await main.job_queue.run_pending()
+    scorecard = await post_round(client, author, "2024-05-01T08:00:00")
+    await main.job_queue.run_pending()
+    assert await timeline(reader["id"]) == []
+    assert await feed_ids(client, reader) == [scorecard["id"]]
+
+async def test_feed_pages_follow_the_cursor_newest_first(client):
+    reader, first, second = [await register(client) for _ in range(3)]
+    await befriend(client, reader, first)
+    await befriend(client, reader, second)
+    posted = []
+    for day in range(1, 6):
+        posted.append(await post_round(client, first if day % 2 else second, f"2024-06-0{day}T08:00:00"))
+    await main.job_queue.run_pending()
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/feed", headers=reader["headers"], params=params)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [[posted[4]["id"], posted[3]["id"]], [posted[2]["id"], posted[1]["id"]], [posted[0]["id"]]]
+
+async def test_last_full_page_has_no_cursor(client):
+    reader, author = await register(client), await register(client)
+    await befriend(client, reader, author)
+    for day in (1, 2):
+        await post_round(client, author, f"2024-06-0{day}T08:00:00")
+    await main.job_queue.run_pending()
+    response = await client.get("/feed", headers=reader["headers"], params={"limit": 2})
+    assert len(response.json()) == 2 and "X-Next-Cursor" not in response.headers
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJ4Il0"])
+async def test_bad_feed_cursor_is_rejected(client, user, cursor):
+    response = await client.get("/feed", headers=user["headers"], params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,108 @@
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, update
+
+import friend_codes
+from database import async_session, engine, reserve_legacy_friend_codes, FriendCodeSequence, ReservedFriendCode, User
+from friend_codes import (
+    FRIEND_CODE_ALPHABET, FRIEND_CODE_SPACE, FriendCodeAllocator, code_to_value, permute, unpermute, value_to_code,
+)
+
+pytestmark = pytest.mark.anyio
+
+KEY = bytes(range(16))
+
+def test_permutation_round_trips_across_the_domain():
+    step = FRIEND_CODE_SPACE // 997
+    values = [0, 1, FRIEND_CODE_SPACE - 1] + list(range(2, FRIEND_CODE_SPACE, step))
+    permuted = [permute(value, KEY) for value in values]
+    assert all(0 <= p < FRIEND_CODE_SPACE for p in permuted)
+    assert len(set(permuted)) == len(values)
+    assert [unpermute(p, KEY) for p in permuted] == values
+    # Consecutive counters do not give neighbouring codes
+    assert len({p // 1000 for p in permuted[3:50]}) == 47
+
+def test_permutation_is_a_bijection_on_a_small_domain(monkeypatch):
+    # An 8-bit Feistel network with stand-in round tables, cycle-walked down
+    # to 200: every value lands in range and the domain maps onto itself
+    monkeypatch.setattr(friend_codes, "HALF_BITS", 4)
+    monkeypatch.setattr(friend_codes, "HALF_MASK", 0xF)
+    monkeypatch.setattr(friend_codes, "FRIEND_CODE_SPACE", 200)
+    rng = random.Random(7)
+    tables = [[rng.randrange(16) for _ in range(16)] for _ in range(friend_codes.FEISTEL_ROUNDS)]
+    monkeypatch.setattr(friend_codes, "_round_tables", lambda key: tables)
+    permuted = [permute(value, KEY) for value in range(200)]
+    assert sorted(permuted) == list(range(200))
+    assert [unpermute(p, KEY) for p in permuted] == list(range(200))
+    assert permuted != list(range(200))
+
+def test_codes_round_trip_to_their_counter_value():
+    for value in (0, 1, 12345, FRIEND_CODE_SPACE - 1):
+        code = value_to_code(value, KEY)
+        assert len(code) == 6 and set(code) <= set(FRIEND_CODE_ALPHABET)
+        assert code_to_value(code, KEY) == value
+    # Another key gives other codes
+    assert value_to_code(12345, KEY) != value_to_code(12345, bytes(16))
+
+@pytest.mark.parametrize("code", ["", "ABC12", "ABC1234", "abc123", "ABC-12", "ÄBC123"])
+def test_malformed_codes_have_no_value(code):
+    assert code_to_value(code, KEY) is None
+
+async def sequence() -> tuple:
+    async with async_session() as db:
+        row = (await db.execute(select(FriendCodeSequence.key, FriendCodeSequence.next_value))).one()
+    return bytes.fromhex(row.key), row.next_value
+
+async def set_next_value(next_value: int) -> None:
+    async with async_session() as db:
+        await db.execute(update(FriendCodeSequence).values(next_value=next_value))
+        await db.commit()
+
+async def test_blocks_are_reserved_and_refilled(client):
+    key, start = await sequence()
+    allocator = FriendCodeAllocator(block_size=2)
+    codes = [await allocator.allocate() for _ in range(5)]
+    assert [code_to_value(code, key) for code in codes] == list(range(start, start + 5))
+    assert allocator.metrics() == {"allocated": 5, "blocks": 3, "remaining_in_block": 1}
+    # Another worker's block starts after this one's
+    other = FriendCodeAllocator(block_size=2)
+    assert code_to_value(await other.allocate(), key) == start + 6
+    assert (await sequence())[1] == start + 8
+
+async def test_reserved_values_are_skipped(client):
+    key, start = await sequence()
+    async with async_session() as db:
+        await db.execute(insert(ReservedFriendCode), [{"value": start}, {"value": start + 2}])
+        await db.commit()
+    allocator = FriendCodeAllocator(block_size=4)
+    codes = [await allocator.allocate() for _ in range(3)]
+    assert [code_to_value(code, key) for code in codes] == [start + 1, start + 3, start + 4]
+
+async def test_existing_users_codes_are_reserved_by_the_migration(client):
+    key, start = await sequence()
+    # A code handed out at random before the allocator, which it would reach next
+    legacy_code = value_to_code(start, key)
+    async with async_session() as db:
+        await db.execute(insert(User), {
+            "username": f"legacy{start}", "email": f"legacy{start}@example.com", "friend_code": legacy_code,
+            "hashed_password": "x", "created_at": datetime.utcnow(),
+        })
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.run_sync(reserve_legacy_friend_codes)
+    allocator = FriendCodeAllocator(block_size=2)
+    assert await allocator.allocate() == value_to_code(start + 1, key)
+
+async def test_exhausted_code_space_is_an_error(client):
+    _, start = await sequence()
+    allocator = FriendCodeAllocator(block_size=2)
+    await set_next_value(FRIEND_CODE_SPACE - 1)
+    try:
+        # The last value, then a block wholly past the end
+        assert code_to_value(await allocator.allocate(), (await sequence())[0]) == FRIEND_CODE_SPACE - 1
+        with pytest.raises(RuntimeError, match="exhausted"):
+            await allocator.allocate()
+    finally:
+        await set_next_value(start)
@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import post_round
+from handicap import DIFFERENTIAL_WINDOW, handicap_index, score_differential
+
+pytestmark = pytest.mark.anyio
+
+def holes_scoring(over_par: int) -> list:
+    # 18 par-4 holes, the first over_par of them bogeyed
+    return [{"hole_number": n, "par": 4, "score": 5 if n <= over_par else 4} for n in range(1, 19)]
+
+def test_score_differential_uses_rating_and_slope():
+    assert score_differential(85, 72, 18, course_rating=72.5, slope_rating=125) == 11.3
+    # Par and the standard slope stand in for a missing rating and slope
+    assert score_differential(80, 72, 18) == 8.0
+    assert score_differential(40, 36, 9) is None
+
+def test_handicap_index_follows_the_lowest_differentials_table():
+    assert handicap_index([10.0, 12.0]) is None
+    assert handicap_index([10.0, 12.0, 14.0]) == 8.0
+    assert handicap_index([10.0, 12.0, 14.0, 9.0, 11.0, 13.0]) == 8.5
+    window = [float(d) for d in range(1, 21)]
+    assert handicap_index(window) == 4.5
+    # Only the latest 20 count: an older excellent round has aged out
+    assert handicap_index([-5.0] + window) == 4.5
+    assert handicap_index([60.0] * 20) == 54.0
+
+async def test_index_tracks_the_sliding_window(client, user):
+    differentials = []
+    for day in range(1, DIFFERENTIAL_WINDOW + 4):
+        over_par = day % 10
+        await post_round(client, user, f"2024-01-{day:02d}T08:00:00", holes=holes_scoring(over_par))
+        differentials.append(float(over_par))
+    handicap = (await client.get("/handicap", headers=user["headers"])).json()
+    assert handicap["handicap_index"] == handicap_index(differentials[-DIFFERENTIAL_WINDOW:])
+    assert len(handicap["differentials"]) == DIFFERENTIAL_WINDOW
+    assert sum(entry["counted"] for entry in handicap["differentials"]) == 8
+    assert [point["handicap_index"] for point in handicap["history"]] == [
+        handicap_index(differentials[:i][-DIFFERENTIAL_WINDOW:]) for i in range(1, len(differentials) + 1)
+    ]
+
+    # A round older than the whole window leaves the index alone
+    await post_round(client, user, "2023-06-01T08:00:00", holes=holes_scoring(0))
+    again = (await client.get("/handicap", headers=user["headers"])).json()
+    assert again["handicap_index"] == handicap["handicap_index"]
+    assert again["differentials"] == handicap["differentials"]
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+import manage
+from conftest import post_round, register
+from database import async_session, engine, backfill_hole_scores, ScorecardHole
+
+pytestmark = pytest.mark.anyio
+
+PARS = [4, 3, 5]
+
+def holes(scores: list) -> list:
+    return [{"hole_number": n, "par": par, "score": score} for n, (par, score) in enumerate(zip(PARS, scores), start=1)]
+
+def hole_row(hole_number, played, avg_score, avg_to_par, total_to_par,
+             eagles=0, birdies=0, pars=0, bogeys=0, doubles=0) -> dict:
+    return {
+        "hole_number": hole_number, "times_played": played, "avg_score": avg_score, "avg_to_par": avg_to_par,
+        "total_to_par": total_to_par, "eagles_or_better": eagles, "birdies": birdies, "pars": pars,
+        "bogeys": bogeys, "double_bogeys_or_worse": doubles,
+    }
+
+async def hole_scores(user_id: int) -> list:
+    async with async_session() as db:
+        result = await db.execute(
+            select(ScorecardHole.scorecard_id, ScorecardHole.hole_number, ScorecardHole.par, ScorecardHole.score)
+            .where(ScorecardHole.user_id == user_id)
+            .order_by(ScorecardHole.scorecard_id, ScorecardHole.hole_number)
+        )
+        return [tuple(row) for row in result.all()]
+
+def expected_rows(*rounds) -> list:
+    return [(r["id"], h["hole_number"], h["par"], h["score"]) for r in rounds for h in r["holes"]]
+
+async def hole_stats(client, user: dict, **params) -> dict:
+    response = await client.get("/scorecards/holes", headers=user["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def test_posted_and_imported_rounds_write_one_row_per_hole(client, user):
+    posted = await post_round(client, user, "2024-01-05T08:00:00", holes=holes([4, 3, 5]))
+    body = json.dumps({"course_name": "Bulk Links", "date_played": "2024-01-06T08:00:00", "holes": holes([5, 2, 6])})
+    response = await client.post("/scorecards/bulk", headers={**user["headers"], "Content-Type": "application/x-ndjson"},
+                                 content=body.encode() + b"\n")
+    assert response.json()["imported"] == 1
+    imported = [sc for sc in (await client.get("/scorecards", headers=user["headers"])).json() if sc["id"] != posted["id"]]
+    assert await hole_scores(user["id"]) == expected_rows(posted, *imported)
+
+async def test_rebuild_recomputes_hole_scores_from_the_rounds(client, user):
+    first = await post_round(client, user, "2024-01-05T08:00:00", holes=holes([4, 3, 5]))
+    second = await post_round(client, user, "2024-01-06T08:00:00", holes=holes([6, 3, 4]))
+    async with async_session() as db:
+        await db.execute(delete(ScorecardHole).where(ScorecardHole.scorecard_id == first["id"]))
+        await db.execute(insert(ScorecardHole).values(
+            scorecard_id=second["id"], user_id=user["id"], hole_number=9, par=4, score=9,
+        ))
+        await db.commit()
+    await manage.rebuild_holes()
+    assert await hole_scores(user["id"]) == expected_rows(first, second)
+
+async def test_backfill_adds_only_rounds_without_hole_scores(client, user):
+    first = await post_round(client, user, "2024-01-05T08:00:00", holes=holes([4, 3, 5]))
+    second = await post_round(client, user, "2024-01-06T08:00:00", holes=holes([6, 3, 4]))
+    async with async_session() as db:
+        await db.execute(delete(ScorecardHole).where(ScorecardHole.scorecard_id == first["id"]))
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.run_sync(backfill_hole_scores)
+    assert await hole_scores(user["id"]) == expected_rows(first, second)
+
+@pytest.fixture
+async def golfer(client) -> dict:
+    golfer = await register(client)
+    # Hole diffs: 0/-1/+2, then +1/0/-2 at East Links; +2/+1/0 at West Links
+    await post_round(client, golfer, "2024-01-10T08:00:00", course_name="East Links", holes=holes([4, 2, 7]))
+    await post_round(client, golfer, "2024-03-10T08:00:00", course_name="East Links", holes=holes([5, 3, 3]))
+    await post_round(client, golfer, "2024-03-20T08:00:00", course_name="West Links", holes=holes([6, 4, 5]))
+    # Another user's round at the same course never counts
+    other = await register(client)
+    await post_round(client, other, "2024-03-15T08:00:00", course_name="East Links", holes=holes([9, 9, 9]))
+    return golfer
+
+async def test_holes_are_aggregated_across_every_round(client, golfer):
+    stats = await hole_stats(client, golfer)
+    assert stats["holes"] == [
+        hole_row(1, 3, 5.0, 1.0, 3, pars=1, bogeys=1, doubles=1),
+        hole_row(2, 3, 3.0, 0.0, 0, birdies=1, pars=1, bogeys=1),
+        hole_row(3, 3, 5.0, 0.0, 0, eagles=1, pars=1, doubles=1),
+    ]
+    assert stats["totals"] == {
+        "holes_played": 9, "avg_to_par": 0.33, "total_to_par": 3, "eagles_or_better": 1, "birdies": 1,
+        "pars": 3, "bogeys": 2, "double_bogeys_or_worse": 2,
+    }
+
+async def test_holes_filter_by_course(client, golfer):
+    stats = await hole_stats(client, golfer, course_name="east links")
+    assert stats["holes"] == [
+        hole_row(1, 2, 4.5, 0.5, 1, pars=1, bogeys=1),
+        hole_row(2, 2, 2.5, -0.5, -1, birdies=1, pars=1),
+        hole_row(3, 2, 5.0, 0.0, 0, eagles=1, doubles=1),
+    ]
+    stats = await hole_stats(client, golfer, course_name="West Links", hole_number=2)
+    assert stats["holes"] == [hole_row(2, 1, 4.0, 1.0, 1, bogeys=1)]
+    assert stats["totals"]["holes_played"] == 1 and stats["totals"]["bogeys"] == 1
+
+async def test_holes_filter_by_date_range(client, golfer):
+    stats = await hole_stats(client, golfer, since="2024-03-01T00:00:00")
+    assert stats["holes"] == [
+        hole_row(1, 2, 5.5, 1.5, 3, bogeys=1, doubles=1),
+        hole_row(2, 2, 3.5, 0.5, 1, pars=1, bogeys=1),
+        hole_row(3, 2, 4.0, -1.0, -2, eagles=1, pars=1),
+    ]
+    stats = await hole_stats(client, golfer, until="2024-03-01T00:00:00", hole_number=3)
+    assert stats["holes"] == [hole_row(3, 1, 7.0, 2.0, 2, doubles=1)]
+
+async def test_unknown_course_has_no_holes(client, golfer):
+    stats = await hole_stats(client, golfer, course_name="Nowhere Links")
+    assert stats["holes"] == []
+    assert stats["totals"]["holes_played"] == 0 and stats["totals"]["avg_to_par"] == 0.0
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+import jobs
+import main
+from conftest import befriend, post_round, register
+from database import async_session, Job
+from jobs import JobQueue
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def queue(client):
+    # A queue of its own claims any due job, so drain the app's first
+    await main.job_queue.run_pending()
+    return JobQueue(concurrency=0)
+
+async def job_rows(kind: str) -> list:
+    async with async_session() as db:
+        return (await db.execute(select(Job).where(Job.kind == kind))).scalars().all()
+
+async def test_job_runs_only_if_its_transaction_commits(queue):
+    runs = []
+
+    @queue.handler("record")
+    async def record(db, value):
+        runs.append(value)
+
+    async with async_session() as db:
+        await queue.enqueue(db, "record", {"value": 1})
+        await db.rollback()
+    async with async_session() as db:
+        await queue.enqueue(db, "record", {"value": 2})
+        await db.commit()
+    assert await queue.run_pending() == 1
+    assert runs == [2] and await job_rows("record") == []
+
+async def test_unknown_kind_is_refused(queue):
+    async with async_session() as db:
+        with pytest.raises(ValueError):
+            await queue.enqueue(db, "no_such_job", {})
+
+async def test_failing_job_retries_then_stays_failed(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 0)
+    attempts = []
+
+    @queue.handler("flaky")
+    async def flaky(db):
+        attempts.append(len(attempts) + 1)
+        raise RuntimeError(f"attempt {len(attempts)}")
+
+    async with async_session() as db:
+        await queue.enqueue(db, "flaky", {}, max_attempts=3)
+        await db.commit()
+    assert await queue.run_pending() == 3
+    assert attempts == [1, 2, 3]
+    [job] = await job_rows("flaky")
+    assert (job.status, job.attempts, job.last_error) == ("failed", 3, "RuntimeError: attempt 3")
+    assert queue.metrics()["retried"] == 2 and queue.metrics()["failed"] == 1
+    # Failed jobs are kept but never claimed again
+    assert await queue.run_pending() == 0
+
+async def test_retry_waits_for_its_backoff(queue):
+    @queue.handler("fails_once")
+    async def fails_once(db):
+        raise RuntimeError("not yet")
+
+    async with async_session() as db:
+        await queue.enqueue(db, "fails_once", {})
+        await db.commit()
+    assert await queue.run_pending() == 1
+    [job] = await job_rows("fails_once")
+    assert job.status == "pending" and job.attempts == 1
+    assert await queue.run_pending() == 0
+    async with async_session() as db:
+        await db.delete(job)
+        await db.commit()
+
+async def test_started_workers_run_jobs_after_commit(queue):
+    done = []
+    queue.concurrency = 1
+
+    @queue.handler("wake")
+    async def wake(db):
+        done.append(True)
+
+    await queue.start()
+    try:
+        async with async_session() as db:
+            await queue.enqueue(db, "wake", {})
+            await db.commit()
+        for _ in range(100):
+            if done:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.close()
+    assert done == [True]
+
+async def test_new_round_reaches_friends_feeds_through_a_job(client, queue):
+    author, reader = await register(client), await register(client)
+    await befriend(client, reader, author)
+    await main.job_queue.run_pending()
+    scorecard = await post_round(client, author, "2024-04-01T08:00:00")
+    assert (await client.get("/feed", headers=reader["headers"])).json() == []
+    assert [job.payload for job in await job_rows("feed_fanout")] == [
+        {"author_id": author["id"], "scorecard_ids": [scorecard["id"]]}
+    ]
+    await main.job_queue.run_pending()
+    assert [item["id"] for item in (await client.get("/feed", headers=reader["headers"])).json()] == [scorecard["id"]]
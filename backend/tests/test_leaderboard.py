@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import delete
+
+from conftest import befriend, post_round, register
+from database import async_session, UserStats
+from stats import rebuild_user_stats
+
+pytestmark = pytest.mark.anyio
+
+def round_holes(relative_to_par: int) -> list:
+    # 18 par-4 holes, the first |relative_to_par| one stroke over or under
+    step = 1 if relative_to_par > 0 else -1
+    return [{"hole_number": n, "par": 4, "score": 4 + (step if n <= abs(relative_to_par) else 0)} for n in range(1, 19)]
+
+async def play(client, user: dict, day: int, relative_to_par: int, course_name: str = "Ladder Links") -> None:
+    await post_round(client, user, f"2024-10-{day:02d}T08:00:00", course_name=course_name,
+                     holes=round_holes(relative_to_par))
+
+async def leaderboard(client, user: dict) -> list:
+    response = await client.get("/friends/leaderboard", headers=user["headers"])
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.fixture
+async def players(client) -> dict:
+    me, leader, idle, stranger = [await register(client) for _ in range(4)]
+    await befriend(client, me, leader)
+    await befriend(client, idle, me)
+    await play(client, me, 1, 2, "Best Links")
+    await play(client, me, 2, 4)
+    await play(client, leader, 1, 1)
+    await play(client, leader, 2, 5)
+    await play(client, leader, 3, 0, "Level Links")
+    await play(client, stranger, 1, -5)
+    return {"me": me, "leader": leader, "idle": idle, "stranger": stranger}
+
+async def test_friends_are_ranked_by_average_with_idle_players_last(client, players):
+    me, leader, idle = players["me"], players["leader"], players["idle"]
+    entries = await leaderboard(client, me)
+    assert [(e["id"], e["is_current_user"], e["total_rounds"], e["avg_relative_to_par"]) for e in entries] == [
+        (leader["id"], False, 3, 2.0),
+        (me["id"], True, 2, 3.0),
+        (idle["id"], False, 0, None),
+    ]
+    assert entries[0]["best_round"] == {
+        "course_name": "Level Links", "date_played": "2024-10-03T08:00:00", "relative_to_par": 0, "total_score": 72,
+    }
+    assert entries[1]["best_round"]["course_name"] == "Best Links"
+    assert entries[2]["best_round"] is None
+
+async def test_leaderboard_is_seen_from_each_players_side(client, players):
+    entries = await leaderboard(client, players["leader"])
+    assert [(e["id"], e["is_current_user"]) for e in entries] == [
+        (players["leader"]["id"], True), (players["me"]["id"], False),
+    ]
+    stranger = await leaderboard(client, players["stranger"])
+    assert [(e["id"], e["avg_relative_to_par"]) for e in stranger] == [(players["stranger"]["id"], -5.0)]
+
+async def test_new_round_moves_the_leaderboard(client, players):
+    me = players["me"]
+    await play(client, me, 3, -6)
+    entries = await leaderboard(client, me)
+    assert [(e["id"], e["avg_relative_to_par"]) for e in entries[:2]] == [(me["id"], 0.0), (players["leader"]["id"], 2.0)]
+    assert entries[0]["best_round"]["relative_to_par"] == -6
+
+async def test_rebuilt_stats_give_the_same_leaderboard(client, players):
+    before = await leaderboard(client, players["me"])
+    user_ids = [players["me"]["id"], players["leader"]["id"]]
+    async with async_session() as db:
+        await db.execute(delete(UserStats).where(UserStats.user_id.in_(user_ids)))
+        await db.commit()
+    assert [e["total_rounds"] for e in await leaderboard(client, players["me"])] == [0, 0, 0]
+    async with async_session() as db:
+        for user_id in user_ids:
+            await rebuild_user_stats(db, user_id)
+        await db.commit()
+    assert await leaderboard(client, players["me"]) == before
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import engine
+from metrics import RequestStats, current_request, metrics
+
+pytestmark = pytest.mark.anyio
+
+async def test_failed_statements_are_timed_and_leave_nothing_behind(client):
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        async with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM no_such_table"))
+            await conn.execute(text("SELECT 1"))
+            raw = await conn.get_raw_connection()
+            assert raw.info.get("query_start") == []
+    finally:
+        current_request.reset(token)
+    assert stats.statements == 4
+    assert [statement for _, statement in stats.queries][:1] == ["SELECT * FROM no_such_table"]
+
+async def test_requests_are_counted_by_route_template(client, user):
+    for _ in range(2):
+        await client.get("/scorecards/stats", headers=user["headers"])
+    body = (await client.get("/metrics")).text
+    assert 'golf_http_requests_total{method="GET",route="/scorecards/stats",status="200"}' in body
+    assert 'golf_db_statements_per_request_count{method="GET",route="/scorecards/stats"}' in body
+    assert "golf_pool_" in body
+    # /metrics itself is not timed
+    assert 'route="/metrics"' not in body
+    assert metrics.requests[("GET", "/scorecards/stats", 200)] >= 2
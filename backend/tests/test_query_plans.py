@@ -0,0 +1,19 @@
+import pytest
+
+import check_query_plans
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(scope="module")
+async def exercised(client):
+    # Drive every route once; the tests below read what was captured
+    await check_query_plans.exercise_routes(client)
+
+async def test_every_route_was_exercised(exercised):
+    assert set(check_query_plans.STATEMENT_BUDGETS) <= set(check_query_plans.statement_counts)
+
+async def test_no_query_falls_back_to_a_table_scan(exercised):
+    assert check_query_plans.find_scans() == []
+
+async def test_routes_stay_within_statement_budgets(exercised):
+    assert check_query_plans.find_over_budget() == []
@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+import rate_limit_store
+from rate_limit import LocalBucketStore, RateLimiter, SharedBucketStore
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("rate_limit.time.monotonic", lambda: now[0])
+    return now
+
+async def test_bucket_refills_at_its_rate(clock):
+    store = LocalBucketStore()
+    assert [await store.take("k", 2, 0.5) for _ in range(2)] == [0.0, 0.0]
+    # Empty: one token takes 1 / 0.5 seconds to come back
+    assert await store.take("k", 2, 0.5) == 2.0
+    clock[0] += 1.5
+    assert await store.take("k", 2, 0.5) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert await store.take("k", 2, 0.5) == 0.0
+    # Never refills past the burst
+    clock[0] += 3600
+    assert [await store.take("k", 2, 0.5) for _ in range(3)] == [0.0, 0.0, 2.0]
+
+async def test_least_recently_used_bucket_is_evicted(clock):
+    store = LocalBucketStore(max_keys=2)
+    await store.take("a", 1, 0.1)
+    await store.take("b", 1, 0.1)
+    await store.take("c", 1, 0.1)
+    assert store.metrics() == {"backend": "local", "keys": 2, "evictions": 1}
+    # "a" comes back full
+    assert await store.take("a", 1, 0.1) == 0.0
+    assert await store.take("c", 1, 0.1) == pytest.approx(10.0)
+
+async def test_user_and_ip_buckets_are_separate(clock, monkeypatch):
+    monkeypatch.setattr("rate_limit.RATE_LIMIT_IP_BURST", 3)
+    monkeypatch.setattr("rate_limit.RATE_LIMIT_USER_BURST", 2)
+    limiter = RateLimiter(LocalBucketStore(), enabled=True)
+    assert [await limiter.check("10.0.0.1", "Alice") for _ in range(2)] == [0.0, 0.0]
+    # Same account from another address, spelled differently: the account's bucket is empty
+    assert await limiter.check("10.0.0.2", " alice ") > 0
+    assert limiter.rejected_user == 1
+    # The first address still has one attempt, for a different account
+    assert await limiter.check("10.0.0.1", "bob") == 0.0
+    assert await limiter.check("10.0.0.1", "carol") > 0
+    assert limiter.rejected_ip == 1
+    assert limiter.allowed == 3
+
+async def test_disabled_limiter_allows_everything():
+    limiter = RateLimiter(LocalBucketStore(), enabled=False)
+    assert all([await limiter.check("10.0.0.1", "alice") == 0.0 for _ in range(100)])
+
+async def test_throttled_login_is_a_429_with_retry_after(client, user, monkeypatch):
+    monkeypatch.setattr(main, "auth_rate_limiter", RateLimiter(LocalBucketStore(), enabled=True))
+    monkeypatch.setattr("rate_limit.RATE_LIMIT_USER_BURST", 1)
+    monkeypatch.setattr("rate_limit.RATE_LIMIT_USER_PER_MINUTE", 2)
+    form = {"username": user["username"], "password": "wrong"}
+    assert (await client.post("/auth/login", data=form)).status_code == 401
+    response = await client.post("/auth/login", data=form)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+    # Throttled before the password is checked
+    response = await client.post("/auth/login", data={**form, "password": "test-password"})
+    assert response.status_code == 429
+
+@pytest.fixture
+async def store_address():
+    server = await asyncio.start_server(rate_limit_store.handle_client, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[:2]
+    server.close()
+    await server.wait_closed()
+
+async def test_store_replies_with_retry_after_per_line(store_address):
+    reader, writer = await asyncio.open_connection(*store_address)
+    request = json.dumps({"key": "line", "burst": 1, "per_second": 0.25}).encode() + b"\n"
+    writer.write(request * 2)
+    await writer.drain()
+    replies = [json.loads(await reader.readline()) for _ in range(2)]
+    assert replies[0] == {"retry_after": 0.0}
+    assert replies[1]["retry_after"] == pytest.approx(4.0, abs=0.01)
+    writer.close()
+
+async def test_shared_store_buckets_span_workers(store_address):
+    url = "tcp://%s:%s" % store_address
+    workers = [SharedBucketStore(url), SharedBucketStore(url)]
+    try:
+        assert await workers[0].take("shared:a", 2, 0.01) == 0.0
+        assert await workers[1].take("shared:a", 2, 0.01) == 0.0
+        assert await workers[0].take("shared:a", 2, 0.01) > 0
+        assert all(worker.metrics()["connected"] and worker.fallbacks == 0 for worker in workers)
+    finally:
+        for worker in workers:
+            await worker.close()
+
+async def test_unreachable_store_falls_back_to_local_buckets(store_address, clock):
+    # Nothing listens on port 1
+    store = SharedBucketStore("tcp://127.0.0.1:1")
+    assert await store.take("down:k", 1, 0.5) == 0.0
+    assert await store.take("down:k", 1, 0.5) == 2.0
+    assert store.fallbacks == 2 and not store.metrics()["connected"]
+
+    # Back up: no reconnect until the delay has passed, then the store answers
+    store.host, store.port = store_address
+    assert await store.take("down:k", 1, 0.5) == 2.0
+    assert store.fallbacks == 3
+    clock[0] += store.reconnect_seconds
+    assert await store.take("down:k", 1, 0.5) == 0.0
+    assert store.fallbacks == 3 and store.metrics()["connected"]
+    await store.close()
+
+async def test_slow_store_times_out_to_local_buckets():
+    async def never_reply(reader, writer):
+        await reader.read()
+        writer.close()
+
+    server = await asyncio.start_server(never_reply, "127.0.0.1", 0)
+    store = SharedBucketStore("tcp://%s:%s" % server.sockets[0].getsockname()[:2], timeout=0.05)
+    try:
+        assert await store.take("slow:k", 1, 0.5) == 0.0
+        assert store.fallbacks == 1 and not store.metrics()["connected"]
+    finally:
+        await store.close()
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import HOLES, post_round
+
+pytestmark = pytest.mark.anyio
+
+async def test_create_scorecard_returns_what_a_read_returns(client, user):
+    created = await post_round(client, user, "2024-04-01T08:00:00", weather="sunny")
+    assert created["total_score"] == sum(h["score"] for h in HOLES)
+    assert created["total_par"] == sum(h["par"] for h in HOLES)
+    assert created["relative_to_par"] == created["total_score"] - created["total_par"]
+
+    response = await client.get("/scorecards", headers=user["headers"])
+    assert response.json() == [created]
+
+async def test_keyset_pages_cover_history_once_newest_first(client, user):
+    # Two rounds share each date, so the id tiebreak in the cursor matters
+    for day in range(1, 6):
+        for _ in range(2):
+            await post_round(client, user, f"2024-05-0{day}T08:00:00")
+    expected = [sc["id"] for sc in (await client.get("/scorecards", headers=user["headers"],
+                                                     params={"limit": 100})).json()]
+    assert len(expected) == 10
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/scorecards", headers=user["headers"], params=params)
+        assert response.status_code == 200
+        seen += [sc["id"] for sc in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+    rounds = (await client.get("/scorecards", headers=user["headers"], params={"limit": 100})).json()
+    assert [(sc["date_played"], sc["id"]) for sc in rounds] == sorted(
+        ((sc["date_played"], sc["id"]) for sc in rounds), reverse=True
+    )
+
+async def test_ndjson_streams_the_whole_history(client, user):
+    for day in range(1, 4):
+        await post_round(client, user, f"2024-06-0{day}T08:00:00")
+    response = await client.get("/scorecards", headers=user["headers"], params={"format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(response.text.splitlines()) == 3
+    response = await client.get("/scorecards", headers=user["headers"], params={"format": "ndjson", "limit": 2})
+    assert len(response.text.splitlines()) == 2
+
+@pytest.mark.parametrize("limit", [0, -3])
+@pytest.mark.parametrize("format", ["json", "ndjson"])
+async def test_out_of_range_limit_is_rejected(client, user, limit, format):
+    response = await client.get("/scorecards", headers=user["headers"], params={"limit": limit, "format": format})
+    assert response.status_code == 422
+
+async def test_large_limit_is_not_capped(client, user):
+    for day in range(1, 4):
+        await post_round(client, user, f"2024-08-0{day}T08:00:00")
+    response = await client.get("/scorecards", headers=user["headers"], params={"limit": 500})
+    assert response.status_code == 200 and len(response.json()) == 3
+
+async def test_malformed_cursor_is_a_bad_request(client, user):
+    response = await client.get("/scorecards", headers=user["headers"], params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+async def test_unchanged_list_revalidates_with_304(client, user):
+    await post_round(client, user, "2024-07-01T08:00:00")
+    response = await client.get("/scorecards", headers=user["headers"])
+    etag = response.headers["ETag"]
+    response = await client.get("/scorecards", headers={**user["headers"], "If-None-Match": etag})
+    assert response.status_code == 304
+    await post_round(client, user, "2024-07-02T08:00:00")
+    response = await client.get("/scorecards", headers={**user["headers"], "If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()) == 2
+
+@pytest.mark.parametrize("hole_numbers", [[1, 2, 0], [1, 2, 2], [1, 37]])
+async def test_out_of_range_or_repeated_hole_numbers_are_rejected(client, user, hole_numbers):
+    holes = [{"hole_number": n, "par": 4, "score": 4} for n in hole_numbers]
+    response = await client.post("/scorecards", headers=user["headers"], json={
+        "course_name": "Odd Links", "date_played": "2024-09-02T08:00:00", "holes": holes,
+    })
+    assert response.status_code == 422
+    assert (await client.get("/scorecards", headers=user["headers"])).json() == []
+
+async def test_nine_and_thirty_six_hole_rounds_are_accepted(client, user):
+    for count in (9, 36):
+        await post_round(client, user, f"2024-09-{count % 30 + 1:02d}T08:00:00",
+                         holes=[{"hole_number": n, "par": 4, "score": 5} for n in range(count, 0, -1)])
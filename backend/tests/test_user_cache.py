@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import update
+
+from conftest import register
+from database import async_session, User
+from user_cache import CurrentUser, UserCache, user_cache
+
+pytestmark = pytest.mark.anyio
+
+def identity(username: str, user_id: int = 1) -> CurrentUser:
+    return CurrentUser(id=user_id, username=username, email=f"{username}@example.com",
+                       full_name=None, friend_code="ABC123")
+
+def test_hit_miss_and_invalidate():
+    cache = UserCache(ttl_seconds=60, max_size=10)
+    assert cache.get("alice") is None
+    cache.set(identity("alice"))
+    assert cache.get("alice") == identity("alice")
+    cache.invalidate("alice")
+    assert cache.get("alice") is None
+    assert cache.metrics() == {"size": 0, "hits": 1, "misses": 2, "evictions": 0}
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("user_cache.time.monotonic", lambda: now[0])
+    cache = UserCache(ttl_seconds=60, max_size=10)
+    cache.set(identity("alice"))
+    now[0] += 59
+    assert cache.get("alice") is not None
+    now[0] += 2
+    assert cache.get("alice") is None
+
+def test_least_recently_used_is_evicted_first():
+    cache = UserCache(ttl_seconds=60, max_size=2)
+    cache.set(identity("alice", 1))
+    cache.set(identity("bob", 2))
+    cache.get("alice")
+    cache.set(identity("carol", 3))
+    assert cache.get("bob") is None
+    assert cache.get("alice") is not None and cache.get("carol") is not None
+    assert cache.metrics()["evictions"] == 1
+
+async def test_fresh_entry_skips_the_user_lookup(client):
+    user = await register(client)
+    await client.get("/auth/me", headers=user["headers"])
+    hits = user_cache.hits
+    async with async_session() as db:
+        await db.execute(update(User).where(User.username == user["username"]).values(full_name="Renamed"))
+        await db.commit()
+
+    # Still the cached identity until the entry is invalidated
+    response = await client.get("/auth/me", headers=user["headers"])
+    assert response.json()["full_name"] is None
+    assert user_cache.hits == hits + 1
+
+    user_cache.invalidate(user["username"])
+    response = await client.get("/auth/me", headers=user["headers"])
+    assert response.json()["full_name"] == "Renamed"
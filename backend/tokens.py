@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# How often each worker pulls revocations made by the other workers
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+REVOCATION_PRUNE_SECONDS = float(os.getenv("REVOCATION_PRUNE_SECONDS", "3600"))
+
+def new_jti() -> str:
+    return uuid.uuid4().hex
+
+class RevocationList:
+    # In-memory copy of revoked_tokens, so checking a token is a set lookup
+    # rather than a query. Revocations made by this worker apply as soon as
+    # their transaction commits; other workers' arrive with the next sync, at
+    # most sync_seconds later.
+    # Entries are dropped once the token would have expired anyway.
+
+    def __init__(self, sync_seconds: float = REVOCATION_SYNC_SECONDS, prune_seconds: float = REVOCATION_PRUNE_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.prune_seconds = prune_seconds
+        self._expires: Dict[str, datetime] = {}
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+        if jti in self._expires:
+            self.rejected += 1
+            return True
+        return False
+
+    async def revoke(self, db: AsyncSession, jti: str, user_id: int, expires_at: datetime) -> bool:
+        # False if the token was already revoked, by any worker. The caller
+        # commits; refresh relies on this to let each refresh token work once.
+        result = await db.execute(
+            insert(RevokedToken)
+            .values(jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["jti"])
+            .returning(RevokedToken.id)
+        )
+        if result.scalar_one_or_none() is None:
+            return False
+        self._pending(db)[jti] = expires_at
+        return True
+
+    def _pending(self, db: AsyncSession) -> Dict[str, datetime]:
+        # Revocations in this session's open transaction; a rollback must not
+        # leave this worker refusing a token the others still accept
+        pending = db.info.get("pending_revocations")
+        if pending is None:
+            pending = db.info["pending_revocations"] = {}
+            event.listen(db.sync_session, "after_commit", self._apply_pending, once=True)
+            event.listen(db.sync_session, "after_rollback", self._drop_pending, once=True)
+        return pending
+
+    def _apply_pending(self, session) -> None:
+        self._expires.update(session.info.pop("pending_revocations", {}))
+
+    def _drop_pending(self, session) -> None:
+        session.info.pop("pending_revocations", None)
+
+    async def sync(self, db: AsyncSession) -> None:
+        result = await db.execute(
+            select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.id > self._last_id)
+            .order_by(RevokedToken.id)
+        )
+        for row in result:
+            self._expires[row.jti] = row.expires_at
+            self._last_id = row.id
+        now = datetime.utcnow()
+        for jti in [jti for jti, expires_at in self._expires.items() if expires_at <= now]:
+            del self._expires[jti]
+        self.syncs += 1
+
+    async def prune(self, db: AsyncSession) -> None:
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+        self._last_prune = time.monotonic()
+
+    async def start(self) -> None:
+        async with async_session() as db:
+            await self.prune(db)
+            await self.sync(db)
+            await db.commit()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                async with async_session() as db:
+                    await self.sync(db)
+                    if time.monotonic() - self._last_prune >= self.prune_seconds:
+                        await self.prune(db)
+                        await db.commit()
+            except Exception:
+                self.sync_errors += 1
+                logger.exception("Syncing revoked tokens failed")
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._expires),
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+        }
+
+revoked_tokens = RevocationList()
@@ -0,0 +1,82 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from database import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+@dataclass(frozen=True)
+class CurrentUser:
+    # Identity fields of an authenticated user, detached from any session
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    friend_code: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            friend_code=user.friend_code
+        )
+
+class UserCache:
+    # Bounded LRU with a TTL, keyed by username. The cache is per process, so
+    # explicit invalidation only reaches this worker; the TTL bounds how stale
+    # other workers can be.
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_size: int = USER_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username: str) -> Optional[CurrentUser]:
+        entry = self._entries.get(username)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[username]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return user
+
+    def set(self, user: CurrentUser) -> None:
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        self._entries[user.username] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        # Call on any profile change or delete of this user
+        self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+user_cache = UserCache()
@@ -78,18 +78,28 @@ const Dashboard = () => {
     loadDashboardData();
   }, []);
 
+  // Server pushes replace polling: refresh when our data changes
+  useEffect(() => {
+    const refresh = () => loadDashboardData();
+    const events = apiService.openEventStream({
+      stats_changed: refresh,
+      friend_added: refresh,
+      friend_round: (event) => {
+        const round = JSON.parse(event.data);
+        showToast(`${round.full_name || round.username} posted a round at ${round.course_name}`, 'info');
+      },
+    });
+    return () => events.close();
+  }, []);
+
   const loadDashboardData = async () => {
     try {
       setLoading(true);
-      const [scorecardsData, statsData, friendsData] = await Promise.all([
-        apiService.getScorecards(),
-        apiService.getStats(),
-        apiService.getFriends(),
-      ]);
+      const dashboardData = await apiService.getDashboard();
       
-      setScorecards(scorecardsData);
-      setStats(statsData);
-      setFriends(friendsData);
+      setScorecards(dashboardData.scorecards);
+      setStats(dashboardData.stats);
+      setFriends(dashboardData.friends);
     } catch (error) {
       showToast('Failed to load dashboard data', 'error');
     } finally {
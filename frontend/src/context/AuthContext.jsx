@@ -21,7 +21,7 @@ export const AuthProvider = ({ children }) => {
       apiService.getCurrentUser()
         .then(setUser)
         .catch(() => {
-          localStorage.removeItem('token');
+          apiService.clearTokens();
         })
         .finally(() => setLoading(false));
     } else {
@@ -41,7 +41,7 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
+    apiService.logout();
     setUser(null);
   };
 
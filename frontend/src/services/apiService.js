@@ -1,7 +1,7 @@
 const API_BASE_URL = 'http://localhost:8000';
 
 class ApiService {
-  async request(config) {
+  async request(config, retried = false) {
     const { endpoint, options = {} } = config;
     const token = localStorage.getItem('token');
     
@@ -17,7 +17,11 @@ class ApiService {
     
     if (!response.ok) {
       if (response.status === 401) {
-        localStorage.removeItem('token');
+        // Expired access token: swap the refresh token for a new pair once
+        if (!retried && await this.refresh()) {
+          return this.request(config, true);
+        }
+        this.clearTokens();
         window.location.reload();
       }
       const error = await response.json();
@@ -43,10 +47,61 @@ class ApiService {
     }
 
     const result = await response.json();
-    localStorage.setItem('token', result.access_token);
+    this.storeTokens(result);
     return result;
   }
 
+  storeTokens(result) {
+    localStorage.setItem('token', result.access_token);
+    localStorage.setItem('refreshToken', result.refresh_token);
+  }
+
+  clearTokens() {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+  }
+
+  async refresh() {
+    // Concurrent 401s share one refresh: each refresh token works only once
+    if (!this.refreshing) {
+      this.refreshing = this.exchangeRefreshToken().finally(() => {
+        this.refreshing = null;
+      });
+    }
+    return this.refreshing;
+  }
+
+  async exchangeRefreshToken() {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (!refreshToken) {
+      return false;
+    }
+    const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!response.ok) {
+      return false;
+    }
+    this.storeTokens(await response.json());
+    return true;
+  }
+
+  async logout() {
+    // Revoke both tokens server-side; local state is cleared regardless
+    const token = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refreshToken');
+    this.clearTokens();
+    if (token) {
+      await fetch(`${API_BASE_URL}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => {});
+    }
+  }
+
   async register(userData) {
     return this.request({
       endpoint: '/auth/register',
@@ -57,6 +112,10 @@ class ApiService {
     });
   }
 
+  async getDashboard() {
+    return this.request({ endpoint: '/dashboard' });
+  }
+
   async getCurrentUser() {
     return this.request({ endpoint: '/auth/me' });
   }
@@ -75,6 +134,57 @@ class ApiService {
     });
   }
 
+  async searchCourses(query, limit = 10) {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    return this.request({ endpoint: `/courses?${params}` });
+  }
+
+  openEventStream(listeners) {
+    // EventSource can't send an Authorization header, so the token rides in
+    // the URL. Once it expires a reconnect gets a 401, which closes the
+    // stream for good: refresh the token and open a new one, backing off
+    // while the server keeps refusing.
+    let source = null;
+    let timer = null;
+    let stopped = false;
+    let retryDelay = 1000;
+
+    const open = () => {
+      const token = localStorage.getItem('token');
+      const params = new URLSearchParams({ token: token || '' });
+      source = new EventSource(`${API_BASE_URL}/events?${params}`);
+      Object.entries(listeners).forEach(([type, listener]) => source.addEventListener(type, listener));
+      source.addEventListener('open', () => {
+        retryDelay = 1000;
+      });
+      source.addEventListener('error', async () => {
+        // A dropped connection is retried by EventSource itself; only a
+        // refused one ends up CLOSED
+        if (stopped || source.readyState !== EventSource.CLOSED) {
+          return;
+        }
+        source.close();
+        // request() may already have refreshed the token meanwhile
+        if (localStorage.getItem('token') === token && !(await this.refresh())) {
+          return;
+        }
+        if (!stopped) {
+          timer = setTimeout(open, retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+      });
+    };
+
+    open();
+    return {
+      close: () => {
+        stopped = true;
+        clearTimeout(timer);
+        source.close();
+      },
+    };
+  }
+
   async getStats() {
     return this.request({ endpoint: '/scorecards/stats' });
   }
@@ -83,6 +193,10 @@ class ApiService {
     return this.request({ endpoint: '/friends' });
   }
 
+  async getFriendsLeaderboard() {
+    return this.request({ endpoint: '/friends/leaderboard' });
+  }
+
   async addFriend(friendCode) {
     return this.request({
       endpoint: '/friends',